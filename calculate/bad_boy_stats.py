@@ -8,10 +8,11 @@ import re
 import string
 from collections import OrderedDict
 
-import requests
 from bs4 import BeautifulSoup
 
 from report.logger import get_logger
+from utils.data_storage import get_data_storage
+from utils.http_client import get_http_client
 
 logger = get_logger(__name__, propagate=True)
 
@@ -82,7 +83,7 @@ class BadBoyStats(object):
                 logger.debug("Retrieving bad boy data from the web.")
 
                 usa_today_nfl_arrest_url = "https://www.usatoday.com/sports/nfl/arrests/"
-                r = requests.get(usa_today_nfl_arrest_url)
+                r = get_http_client().get(usa_today_nfl_arrest_url)
                 data = r.text
                 soup = BeautifulSoup(data, "html.parser")
                 cdata = re.search("var sitedata = (.*);", soup.find(text=re.compile("CDATA"))).group(1)
@@ -116,7 +117,7 @@ class BadBoyStats(object):
                                                                                  'searches={"Team":"' + team + '"}'
                     )
 
-                    r = requests.post(usa_today_nfl_arrest_url, data=body, headers=headers)
+                    r = get_http_client().post(usa_today_nfl_arrest_url, data=body, headers=headers)
                     resp_json = r.json()
 
                     arrests_data = resp_json["data"]["Result"]
@@ -156,7 +157,7 @@ class BadBoyStats(object):
                                 'searches={"Team":"' + team + '"}'
                             )
 
-                            r = requests.post(usa_today_nfl_arrest_url, data=body, headers=headers)
+                            r = get_http_client().post(usa_today_nfl_arrest_url, data=body, headers=headers)
                             resp_json = r.json()
 
                             arrests_data = resp_json["data"]["Result"]
@@ -203,20 +204,17 @@ class BadBoyStats(object):
 
     def open_bad_boy_data(self):
         logger.debug("Loading saved bay boy data.")
-        if os.path.exists(self.bad_boy_data_file_path):
-            with open(self.bad_boy_data_file_path, "r", encoding="utf-8") as bad_boy_in:
-                self.bad_boy_data = dict(json.load(bad_boy_in))
+        if get_data_storage().exists(self.bad_boy_data_file_path):
+            self.bad_boy_data = dict(get_data_storage().load(self.bad_boy_data_file_path))
 
     def save_bad_boy_data(self):
         if self.save_data:
             logger.debug("Saving bad boy data and raw player crime data.")
             # save report bad boy data locally
-            with open(self.bad_boy_data_file_path, "w", encoding="utf-8") as bad_boy_out:
-                json.dump(self.bad_boy_data, bad_boy_out, ensure_ascii=False, indent=2)
+            get_data_storage().save(self.bad_boy_data_file_path, self.bad_boy_data)
 
             # save raw player crime data locally
-            with open(self.raw_bad_boy_data_file_path, "w", encoding="utf-8") as bad_boy_raw_out:
-                json.dump(self.raw_bad_boy_data, bad_boy_raw_out, ensure_ascii=False, indent=2)
+            get_data_storage().save(self.raw_bad_boy_data_file_path, self.raw_bad_boy_data)
 
     def add_entry(self, team_abbr, arrests):
 
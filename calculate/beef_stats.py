@@ -5,9 +5,9 @@ import json
 import os
 from collections import OrderedDict
 
-import requests
-
 from report.logger import get_logger
+from utils.data_storage import get_data_storage
+from utils.http_client import get_http_client
 
 logger = get_logger(__name__, propagate=False)
 
@@ -55,11 +55,12 @@ class BeefStats(object):
             if not self.beef_data:
                 logger.debug("Retrieving beef data from the web.")
 
-                fox_sports_nfl_teams_data = requests.get(self.teams_url, params=self.fox_sports_public_api_key).json()
+                fox_sports_nfl_teams_data = get_http_client().get(
+                    self.teams_url, params=self.fox_sports_public_api_key).json()
 
                 for team in fox_sports_nfl_teams_data.get("page"):
                     team_url = team.get("links").get("api").get("athletes")
-                    team_roster = requests.get(team_url, self.fox_sports_public_api_key).json()
+                    team_roster = get_http_client().get(team_url, params=self.fox_sports_public_api_key).json()
                     for player_json in team_roster.get("page"):
                         player_full_name = player_json.get("firstName") + " " + player_json.get("lastName")
                         self.add_entry(player_full_name, player_json, team)
@@ -83,15 +84,13 @@ class BeefStats(object):
 
     def open_beef_data(self):
         logger.debug("Loading saved beef data.")
-        if os.path.exists(self.beef_data_file_path):
-            with open(self.beef_data_file_path, "r", encoding="utf-8") as beef_in:
-                self.beef_data = dict(json.load(beef_in))
+        if get_data_storage().exists(self.beef_data_file_path):
+            self.beef_data = dict(get_data_storage().load(self.beef_data_file_path))
 
     def save_beef_data(self):
         if self.save_data:
             logger.debug("Saving beef data.")
-            with open(self.beef_data_file_path, "w", encoding="utf-8") as beef_out:
-                json.dump(self.beef_data, beef_out, ensure_ascii=False, indent=2)
+            get_data_storage().save(self.beef_data_file_path, self.beef_data)
 
     def add_entry(self, player_full_name, player_json=None, team_json=None):
 
@@ -140,7 +139,7 @@ class BeefStats(object):
         self.beef_data[player_full_name] = player_beef_dict
         return player_beef_dict
 
-    def get_player_beef_stat(self, player_first_name, player_last_name, player_team_abbr, key_str):
+    def get_player_beef_stat(self, player_first_name, player_last_name, player_team_abbr, key_str=""):
 
         team_abbr = player_team_abbr.upper() if player_team_abbr else "?"
         if player_last_name:
@@ -152,7 +151,7 @@ class BeefStats(object):
             player_full_name = team_abbr
 
         if player_full_name in self.beef_data.keys():
-            return self.beef_data[player_full_name][key_str]
+            return self.beef_data[player_full_name][key_str] if key_str else self.beef_data[player_full_name]
         else:
             logger.debug(
                 "Player not found: {0}. Setting weight and TABBU to 0. Run report with the -r flag "
@@ -163,7 +162,7 @@ class BeefStats(object):
                 "weight": 0,
                 "tabbu": 0,
             }
-            return self.beef_data[player_full_name][key_str]
+            return self.beef_data[player_full_name][key_str] if key_str else self.beef_data[player_full_name]
 
     def get_player_weight(self, player_first_name, player_last_name, team_abbr):
         return self.get_player_beef_stat(player_first_name, player_last_name, team_abbr, "weight")
@@ -4,6 +4,8 @@ __email__ = "wrenjr@yahoo.com"
 import math
 from collections import defaultdict, Counter
 
+import numpy as np
+
 from report.logger import get_logger
 
 logger = get_logger(__name__, propagate=False)
@@ -24,20 +26,37 @@ class CoachingEfficiency(object):
         self.roster_active_slots = self.league.active_positions
         self.roster_bench_slots = self.league.bench_positions
         self.flex_positions_dict = self.league.get_flex_positions_dict()
+        # eligibility of players for roster slots as bitwise ANDs of position bitmasks (bench slots have no bits)
+        self.player_week_table = self.league.get_player_week_table()
+        self.roster_slot_masks = self.player_week_table.get_slot_masks(
+            list(self.roster_slot_counts.keys()) + list(self.flex_positions_dict.keys()))
+        self.optimal_lineup_solver = self.config.get(
+            "Settings", "coaching_efficiency_optimal_lineup", fallback="assignment")
         self.coaching_efficiency_dqs = {}
 
     def get_eligible_positions(self, player):
-        eligible = []
-        for position in self.roster_slot_counts:
-            eligible_positions = player.eligible_positions
-
-            if position in self.roster_bench_slots:
-                # do not tally eligible player for bench positions
-                pass
-            elif position in eligible_positions:
-                eligible.append(position)
-
-        return eligible
+        # bench slots have no bits, so eligible players are not tallied for bench positions
+        player_mask = self.player_week_table.get_eligible_mask(player.eligible_positions)
+        return [position for position in self.roster_slot_counts if player_mask & self.roster_slot_masks[position]]
+
+    def get_eligible_position_players(self, team_roster, week=None, team_id=None):
+        """Group the players of a roster by the roster slots they are eligible for (in roster order), using the eligible
+        position bitmasks of the player week table rows of the team week when the team week is given.
+        """
+        eligible_position_players = defaultdict(list)
+        rows = self.player_week_table.get_rows(week, team_id) if team_id is not None else slice(0, 0)
+        if rows.stop - rows.start == len(team_roster) and team_roster:
+            eligible = self.player_week_table.eligible[rows]
+            for position in self.roster_slot_counts:
+                slot_mask = self.roster_slot_masks[position]
+                if slot_mask:
+                    eligible_position_players[position] = [
+                        team_roster[index] for index in np.flatnonzero(eligible & slot_mask)]
+        else:
+            for player in team_roster:
+                for position in self.get_eligible_positions(player):
+                    eligible_position_players[position].append(player)
+        return eligible_position_players
 
     @staticmethod
     def get_optimal_players(eligible_players, position, position_count):
@@ -74,14 +93,8 @@ class CoachingEfficiency(object):
     def is_player_eligible(self, player, week, inactives):
         return player.status in self.inactive_statuses or player.bye_week == week or player.full_name in inactives
 
-    def execute_coaching_efficiency(self, team_name, team_roster, team_points, positions_filled_active, week,
-                                    inactive_players, dq_eligible=False):
-        logger.debug("Calculating coaching efficiency for team \"{0}\".".format(team_name))
-
-        eligible_position_players = defaultdict(list)
-        for player in team_roster:
-            for position in self.get_eligible_positions(player):
-                eligible_position_players[position].append(player)
+    def get_greedy_optimal_lineup(self, team_roster, week=None, team_id=None):
+        eligible_position_players = self.get_eligible_position_players(team_roster, week, team_id)
 
         optimal_full_lineup = []
         optimal_primary_lineup = []
@@ -103,8 +116,17 @@ class CoachingEfficiency(object):
 
         optimal_full_lineup.extend(optimal_flex_players)
 
+        return optimal_full_lineup
+
+    def execute_coaching_efficiency(self, team_name, team_roster, team_points, positions_filled_active, week,
+                                    inactive_players, dq_eligible=False, team_id=None):
+        logger.debug("Calculating coaching efficiency for team \"{0}\".".format(team_name))
+
         # calculate optimal score
-        optimal_score = sum([x.points for x in optimal_full_lineup])
+        if self.optimal_lineup_solver == "greedy" or team_id is None:
+            optimal_score = sum([x.points for x in self.get_greedy_optimal_lineup(team_roster, week, team_id)])
+        else:
+            optimal_score = self.league.get_optimal_lineups().get_optimal_score(week, team_id)
 
         # calculate coaching efficiency
         try:
@@ -7,11 +7,12 @@ import os
 from collections import OrderedDict
 from datetime import datetime, timedelta
 
-import requests
 from bs4 import BeautifulSoup
 
 from report.logger import get_logger
 from utils.app_config_parser import AppConfigParser
+from utils.data_storage import get_data_storage
+from utils.http_client import get_http_client
 
 logger = get_logger(__name__, propagate=False)
 
@@ -104,7 +105,7 @@ class CovidRisk(object):
                     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) AppleWebKit/605.1.15 (KHTML, " +
                                   "like Gecko) Version/13.0 Safari/605.1.15"
                 }
-                r = requests.get(football_db_endpoint, headers=headers)
+                r = get_http_client().get(football_db_endpoint, headers=headers)
                 data = r.text
                 soup = BeautifulSoup(data, "html.parser")
                 self.covid_data = {}
@@ -188,26 +189,47 @@ class CovidRisk(object):
         else:
             logger.info("{0} players at risk of COVID-19 were loaded".format(len(self.covid_data)))
 
+        # per team index of the COVID-19 list transactions, built once so scoring players only needs lookups
+        self.covid_index_by_team = self.get_covid_index_by_team()
+
+    def get_covid_index_by_team(self):
+        """Index the COVID-19 list transactions of every team by the players currently on the list (placed and never
+        activated), the players on the list at any point, the number of transactions, and the date of the most recent
+        transaction.
+
+        :return: dict of team index dicts by team abbreviation
+        """
+        covid_index_by_team = {}
+        for team_abbr, team_covid_data in self.raw_covid_data.items():
+            added_players = set(
+                transaction.get("player") for transaction in team_covid_data.get("transactions").get("add") or [])
+            removed_players = set(
+                transaction.get("player") for transaction in team_covid_data.get("transactions").get("remove") or [])
+
+            covid_index_by_team[team_abbr] = {
+                "current": added_players - removed_players,
+                "past": added_players | removed_players,
+                "count": team_covid_data.get("count"),
+                "last_date": datetime.strptime(team_covid_data.get("last_date"), "%B %d, %Y")
+            }
+        return covid_index_by_team
+
     def open_covid_data(self):
         logger.debug("Loading saved COVID-19 risk data.")
-        if os.path.exists(self.covid_data_file_path):
-            with open(self.covid_data_file_path, "r", encoding="utf-8") as covid_in:
-                self.covid_data = dict(json.load(covid_in))
+        if get_data_storage().exists(self.covid_data_file_path):
+            self.covid_data = dict(get_data_storage().load(self.covid_data_file_path))
 
-        if os.path.exists(self.raw_covid_data_file_path):
-            with open(self.raw_covid_data_file_path, "r", encoding="utf-8") as covid_raw_in:
-                self.raw_covid_data = dict(json.load(covid_raw_in))
+        if get_data_storage().exists(self.raw_covid_data_file_path):
+            self.raw_covid_data = dict(get_data_storage().load(self.raw_covid_data_file_path))
 
     def save_covid_data(self):
         if self.save_data:
             logger.debug("Saving COVID-19 risk data.")
             # save report covid data locally
-            with open(self.covid_data_file_path, "w", encoding="utf-8") as covid_out:
-                json.dump(self.covid_data, covid_out, ensure_ascii=False, indent=2)
+            get_data_storage().save(self.covid_data_file_path, self.covid_data)
 
             # save raw player covid data locally
-            with open(self.raw_covid_data_file_path, "w", encoding="utf-8") as covid_raw_out:
-                json.dump(self.raw_covid_data, covid_raw_out, ensure_ascii=False, indent=2)
+            get_data_storage().save(self.raw_covid_data_file_path, self.raw_covid_data)
 
     def add_entry(self, player_full_name, player_transaction):
 
@@ -244,21 +266,12 @@ class CovidRisk(object):
                 team_abbr = self.team_abbrev_conversion_dict[team_abbr]
 
         covid_risk_score = 0
-        player_on_covid_list_past = False
-        player_on_covid_list_present = False
-
-        if team_abbr in self.raw_covid_data.keys():
 
-            for transaction in self.raw_covid_data.get(team_abbr).get("transactions").get("add"):
-                if player_full_name == transaction.get("player"):
-                    player_on_covid_list_past = True
-                    player_on_covid_list_present = True
+        team_covid_index = self.covid_index_by_team.get(team_abbr)
+        if team_covid_index is not None:
 
-            if self.raw_covid_data.get(team_abbr).get("transactions").get("remove"):
-                for transaction in self.raw_covid_data.get(team_abbr).get("transactions").get("remove"):
-                    if player_full_name == transaction.get("player"):
-                        player_on_covid_list_past = True
-                        player_on_covid_list_present = False
+            player_on_covid_list_present = player_full_name in team_covid_index["current"]
+            player_on_covid_list_past = player_full_name in team_covid_index["past"]
 
             if player_on_covid_list_present:
                 # add 10 if the player is currently on the Reserve/COVID-19 list
@@ -268,13 +281,9 @@ class CovidRisk(object):
                 covid_risk_score += 5
 
             # add 1 for every other player on the same team who has been on the Reserve/COVID-19 list
-            covid_risk_score += (self.raw_covid_data.get(team_abbr).get("count") - 1)
-
-            selected_nfl_season_week = datetime.strptime(
-                "{0} {1} 1".format(str(self.season), str(self.week + 36)), "%G %V %u")
+            covid_risk_score += (team_covid_index["count"] - 1)
 
-            covid_recency = selected_nfl_season_week - datetime.strptime(
-                self.raw_covid_data.get(team_abbr).get("last_date"), "%B %d, %Y")
+            covid_recency = self.selected_nfl_season_week - team_covid_index["last_date"]
             if covid_recency < timedelta(days=14) and not player_on_covid_list_present:
                 # add 10 if a teammate was on the Reserve/COVID-19 list within the past 14 days (COVID-19 risk window)
                 covid_risk_score += 10
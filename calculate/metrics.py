@@ -2,11 +2,14 @@ __author__ = "Wren J. R. (uberfastman)"
 __email__ = "wrenjr@yahoo.com"
 
 import itertools
-from collections import defaultdict, OrderedDict
+from collections import defaultdict
 from statistics import mean
 
 import numpy as np
 
+from calculate.ranking import MetricRow, Ranking
+from calculate.running_stats import TeamScoreStats
+from calculate.standings import Standings
 from dao.base import BaseLeague, BaseTeam, BaseRecord, BasePlayer
 from report.logger import get_logger
 
@@ -267,8 +270,10 @@ class CalculateMetrics(object):
             ranked_weekly_score = "%.2f" % float(team.points)
             ranked_weekly_bench_score = "%.2f" % float(team.bench_points)
 
-            score_results_data.append(
-                [place, ranked_team_name, ranked_team_manager, ranked_weekly_score, ranked_weekly_bench_score])
+            score_results_data.append(MetricRow(
+                team.team_id,
+                [place, ranked_team_name, ranked_team_manager, ranked_weekly_score, ranked_weekly_bench_score]
+            ))
 
             place += 1
 
@@ -289,8 +294,8 @@ class CalculateMetrics(object):
             else:
                 ranked_coaching_efficiency = "%.2f%%" % float(ranked_coaching_efficiency)
 
-            coaching_efficiency_results_data.append(
-                [place, ranked_team_name, ranked_team_manager, ranked_coaching_efficiency])
+            coaching_efficiency_results_data.append(MetricRow(
+                team.team_id, [place, ranked_team_name, ranked_team_manager, ranked_coaching_efficiency]))
 
             place += 1
 
@@ -308,7 +313,8 @@ class CalculateMetrics(object):
             ranked_luck = "%.2f%%" % team.luck
             weekly_overall_record = team.weekly_overall_record.get_record_str()
 
-            luck_results_data.append([place, ranked_team_name, ranked_team_manager, ranked_luck, weekly_overall_record])
+            luck_results_data.append(MetricRow(
+                team.team_id, [place, ranked_team_name, ranked_team_manager, ranked_luck, weekly_overall_record]))
 
             place += 1
         return luck_results_data
@@ -324,8 +330,8 @@ class CalculateMetrics(object):
             ranked_team_manager = team.manager_str
             ranked_weekly_optimal_score = "%.2f" % float(team.optimal_points)
 
-            optimal_score_results_data.append(
-                [place, ranked_team_name, ranked_team_manager, ranked_weekly_optimal_score])
+            optimal_score_results_data.append(MetricRow(
+                team.team_id, [place, ranked_team_name, ranked_team_manager, ranked_weekly_optimal_score]))
 
             place += 1
 
@@ -344,8 +350,8 @@ class CalculateMetrics(object):
             ranked_offense = team.worst_offense
             ranked_count = "%d" % team.num_offenders
 
-            bad_boy_results_data.append([place, ranked_team_name, ranked_team_manager, ranked_bb_points,
-                                         ranked_offense, ranked_count])
+            bad_boy_results_data.append(MetricRow(team.team_id, [
+                place, ranked_team_name, ranked_team_manager, ranked_bb_points, ranked_offense, ranked_count]))
 
             place += 1
         return bad_boy_results_data
@@ -361,7 +367,8 @@ class CalculateMetrics(object):
             ranked_team_manager = team.manager_str
             ranked_beef_points = "%.3f" % team.tabbu
 
-            beef_results_data.append([place, ranked_team_name, ranked_team_manager, ranked_beef_points])
+            beef_results_data.append(
+                MetricRow(team.team_id, [place, ranked_team_name, ranked_team_manager, ranked_beef_points]))
             place += 1
         return beef_results_data
 
@@ -376,103 +383,89 @@ class CalculateMetrics(object):
             ranked_team_manager = team.manager_str
             ranked_covid_risk = "%d" % team.total_covid_risk
 
-            covid_risk_data.append([ndx, ranked_team_name, ranked_team_manager, ranked_covid_risk])
+            covid_risk_data.append(
+                MetricRow(team.team_id, [ndx, ranked_team_name, ranked_team_manager, ranked_covid_risk]))
             ndx += 1
         return covid_risk_data
 
     def get_ties_count(self, results_data, tie_type, break_ties):
 
-        if tie_type == "power_ranking":
-            groups = [list(group) for key, group in itertools.groupby(results_data, lambda x: x[0])]
-            num_ties = self.count_ties(groups)
-        else:
-            groups = [list(group) for key, group in itertools.groupby(results_data, lambda x: x[3])]
-            num_ties = self.count_ties(groups)
+        # group the (already ranked) results by metric value
+        ranking = Ranking(
+            [team[0] if tie_type == "power_ranking" else team[3] for team in results_data],
+            presorted=True,
+            excluded=["DQ" in team for team in results_data]
+        )
+        num_ties = ranking.num_ties
 
         # if there are ties, record them and break them if possible
         if num_ties > 0:
-            ties_count = 0
-            team_index = 0
-            place = 1
-            while ties_count != num_ties:
-                for group in groups:
-                    group_has_ties = len(group) > 1 and "DQ" not in group[0]
-                    if group_has_ties:
-                        ties_count += sum(range(len(group)))
-
-                    for team in group:
-                        if tie_type == "power_ranking":
-                            results_data[team_index] = [
-                                str(team[0]) + ("*" if group_has_ties else ""),
-                                team[1],
-                                team[2],
-                            ]
-                        elif tie_type == "score" and break_ties:
-                            results_data[team_index] = [
-                                str(place),
-                                team[1],
-                                team[2],
-                                team[3]
-                            ]
-                            if group.index(team) != (len(group) - 1):
-                                place += 1
-                        elif tie_type == "bad_boy":
-                            results_data[team_index] = [
-                                str(place) + ("*" if group_has_ties else ""),
-                                team[1],
-                                team[2],
-                                team[3],
-                                team[4],
-                                team[5]
-                            ]
-                        else:
-                            results_data[team_index] = [
-                                str(place) + ("*" if group_has_ties else ""),
-                                team[1],
-                                team[2],
-                                team[3]
-                            ]
-
-                        if tie_type == "score":
-                            results_data[team_index].append(team[4])
-
-                        team_index += 1
-                    place += 1
+            for team_index, team in enumerate(list(results_data)):
+                tied = "*" if ranking.is_tied[team_index] else ""
+                # tied teams share a place unless score ties are broken
+                place = ranking.dense_ranks[team_index]
+
+                if tie_type == "power_ranking":
+                    results_data[team_index] = team.with_columns([
+                        str(team[0]) + tied,
+                        team[1],
+                        team[2],
+                    ])
+                elif tie_type == "score" and break_ties:
+                    results_data[team_index] = team.with_columns([
+                        str(ranking.ordinal_ranks[team_index]),
+                        team[1],
+                        team[2],
+                        team[3]
+                    ])
+                elif tie_type == "bad_boy":
+                    results_data[team_index] = team.with_columns([
+                        str(place) + tied,
+                        team[1],
+                        team[2],
+                        team[3],
+                        team[4],
+                        team[5]
+                    ])
+                else:
+                    results_data[team_index] = team.with_columns([
+                        str(place) + tied,
+                        team[1],
+                        team[2],
+                        team[3]
+                    ])
+
+                if tie_type == "score":
+                    results_data[team_index].append(team[4])
 
         if tie_type == "bad_boy":
-            groups = [list(group) for key, group in itertools.groupby(results_data, lambda x: x[3])]
-            num_ties = 0
-            for group in groups:
-                if len(group) > 1 and int(group[0][3]) > 0:
-                    num_ties += sum(range(len(group)))
+            # teams without bad boy points are not tied
+            num_ties = Ranking(
+                [team[3] for team in results_data],
+                presorted=True,
+                excluded=[int(team[3]) <= 0 for team in results_data]
+            ).num_ties
 
         return num_ties
 
     @staticmethod
-    def count_ties(groups):
-        num_ties = 0
-        for group in groups:
-            if len(group) > 1 and "DQ" not in group[0]:
-                num_ties += sum(range(len(group)))
-
-        return num_ties
+    def get_num_first_place(results_data, column):
+        """Count the teams tied for first place in (already ranked) results by the values of a column."""
+        return Ranking([team[column] for team in results_data], presorted=True).get_num_first_place()
 
     @staticmethod
     def resolve_score_ties(data_for_scores, break_ties):
 
-        groups = [list(group) for key, group in itertools.groupby(data_for_scores, lambda x: x[3])]
+        # order teams with the same score by bench points
+        ranking = Ranking(
+            [float(team[3]) for team in data_for_scores],
+            tiebreaks=[[float(team[-1]) for team in data_for_scores]]
+        )
 
-        resolved_score_results_data = []
-        place = 1
-        for group in groups:
-            for team in sorted(group, key=lambda x: x[-1], reverse=True):
-                if groups.index(group) != 0:
-                    team[0] = place
-                else:
-                    if break_ties:
-                        team[0] = place
-                resolved_score_results_data.append(team)
-                place += 1
+        resolved_score_results_data = ranking.get_ranked(data_for_scores)
+        for team_index, team in enumerate(resolved_score_results_data):
+            if ranking.groups[team_index] != 0 or break_ties:
+                team[0] = int(ranking.ordinal_ranks[team_index])
 
         return resolved_score_results_data
 
@@ -493,12 +486,10 @@ class CalculateMetrics(object):
 
             season_average_points_by_player_dict = defaultdict(list)
             if break_ties and ties_for_coaching_efficiency > 0 and int(week) == int(week_for_report):
-                for ce_result in data_for_coaching_efficiency:
+                for ce_result in data_for_coaching_efficiency:  # type: MetricRow
                     if ce_result[0] == "1*":
-                        players = []
-                        for team_result in teams_results.values():
-                            if team_result.name == ce_result[1]:
-                                players = teams_results.get(team_result.team_id).roster
+                        team_result = teams_results.get(ce_result.team_id)
+                        players = team_result.roster if team_result else []
 
                         num_players_exceeded_season_avg_points = 0
                         total_percentage_points_players_exceeded_season_avg_points = 0
@@ -544,23 +535,27 @@ class CalculateMetrics(object):
                         ce_result.extend(["N/A", "N/A"])
                         coaching_efficiency_results_data_with_tiebreakers.append(ce_result)
 
-                groups = [list(group) for key, group in
-                          itertools.groupby(coaching_efficiency_results_data_with_tiebreakers, lambda x: x[3])]
+                ce_results = coaching_efficiency_results_data_with_tiebreakers
+                # teams outside the tie for first place have no tiebreakers
+                tiebreaks = [
+                    [0 if team[-2] in ("DQ", "N/A") else team[-2] for team in ce_results],
+                    [0 if team[-1] == "N/A" else team[-1] for team in ce_results]
+                ]
             else:
-                groups = [list(group) for key, group in itertools.groupby(data_for_coaching_efficiency, lambda x: x[3])]
-
-            resolved_coaching_efficiency_results_data = []
-            place = 1
-            for group in groups:
-                for team in sorted(
-                        group,
-                        key=lambda x: (x[-2] if x[-2] != "DQ" else 0, x[-1]),
-                        reverse=True):
-                    if groups.index(group) == 0:
-                        if break_ties:
-                            team[0] = place
-                    resolved_coaching_efficiency_results_data.append(team)
-                    place += 1
+                ce_results = data_for_coaching_efficiency
+                tiebreaks = [
+                    [0 if team[-2] == "DQ" else team[-2] for team in ce_results],
+                    [team[-1] for team in ce_results]
+                ]
+
+            # keep the teams grouped by coaching efficiency in their current order, and order teams within each group
+            groups = Ranking([team[3] for team in ce_results], presorted=True).groups
+            ranking = Ranking(-groups, tiebreaks=tiebreaks)
+
+            resolved_coaching_efficiency_results_data = ranking.get_ranked(ce_results)
+            for team_index, team in enumerate(resolved_coaching_efficiency_results_data):
+                if ranking.groups[team_index] == 0 and break_ties:
+                    team[0] = int(ranking.ordinal_ranks[team_index])
             return resolved_coaching_efficiency_results_data
         else:
             logger.debug(
@@ -570,20 +565,19 @@ class CalculateMetrics(object):
     @staticmethod
     def resolve_season_average_ties(data_for_season_averages, with_percent):
 
-        groups = [list(group) for key, group in itertools.groupby(data_for_season_averages, lambda x: x[2])]
+        # teams with the same (already ranked) season average share a place
+        ranking = Ranking([team[2] for team in data_for_season_averages], presorted=True)
 
         resolved_season_average_results_data = []
-        place = 1
-        for group in groups:
-            for team in sorted(group, key=lambda x: x[-1], reverse=True):
-                team[0] = place
-                if with_percent:
-                    team[2] = "{0}% ({1})".format(str(team[2]), str(place))
-                else:
-                    team[2] = "{0} ({1})".format(str(team[2]), str(place))
+        for team_index, team in enumerate(data_for_season_averages):
+            place = int(ranking.dense_ranks[team_index])
+            team[0] = place
+            if with_percent:
+                team[2] = "{0}% ({1})".format(str(team[2]), str(place))
+            else:
+                team[2] = "{0} ({1})".format(str(team[2]), str(place))
 
-                resolved_season_average_results_data.append(team)
-            place += 1
+            resolved_season_average_results_data.append(team)
 
         return resolved_season_average_results_data
 
@@ -662,134 +656,111 @@ class CalculateMetrics(object):
             # team.power_rank = test_power_rank
 
     @staticmethod
-    def calculate_records(week, league: BaseLeague, custom_weekly_matchups):
-        logger.debug("Calculating league records for week \"{0}\".".format(week))
+    def calculate_season_records(week_for_report, league: BaseLeague):
+        """Calculate the cumulative records and ranks of every team for every week through week_for_report at once, and
+        store them in league.records_by_week.
 
-        standings = league.standings if league.standings else league.current_standings
+        :return: dict by week of BaseRecord by team id (ordered by rank)
+        """
+        standings = Standings(league, week_for_report)
+        league.records_by_week = standings.get_records_by_week()
 
-        records = defaultdict(BaseRecord)
-        for team in standings:  # type: BaseTeam
-            if week == 1:
-                record = BaseRecord(int(week), team_id=team.team_id, team_name=team.name, division=team.division)
-            else:
-                previous_week_record = league.records_by_week[str(int(week) - 1)][team.team_id]  # type: BaseRecord
-                record = BaseRecord(
-                    int(week),
-                    wins=previous_week_record.get_wins(),
-                    ties=previous_week_record.get_ties(),
-                    losses=previous_week_record.get_losses(),
-                    points_for=previous_week_record.get_points_for(),
-                    points_against=previous_week_record.get_points_against(),
-                    streak_type=previous_week_record.get_streak_type(),
-                    streak_len=previous_week_record.get_streak_length(),
-                    team_id=team.team_id,
-                    team_name=team.name,
-                    division=team.division,
-                    division_wins=previous_week_record.get_division_wins(),
-                    division_ties=previous_week_record.get_division_ties(),
-                    division_losses=previous_week_record.get_division_losses(),
-                    division_points_for=previous_week_record.get_division_points_for(),
-                    division_points_against=previous_week_record.get_division_points_against(),
-                    division_streak_type=previous_week_record.get_division_streak_type(),
-                    division_streak_len=previous_week_record.get_division_streak_length()
-                )
+        # teams in the league standings keep their record after the last week
+        last_week_records = league.records_by_week[str(week_for_report)]
+        for team_index, team in enumerate(standings.teams):  # type: int, BaseTeam
+            team.record = last_week_records.get(team.team_id) or standings.get_record(team_index, -1)
 
-            # league.matchups_by_week[str(week)]
-
-            for matchup in custom_weekly_matchups:
-                for team_id, matchup_result in matchup.items():
-                    if str(team_id) == str(team.team_id):
-                        outcome = matchup_result["result"]
-                        if outcome == "W":
-                            record.add_win()
-                            if matchup_result["division"]:
-                                record.add_division_win()
-                        elif outcome == "L":
-                            record.add_loss()
-                            if matchup_result["division"]:
-                                record.add_division_loss()
-                        else:
-                            record.add_tie()
-                            if matchup_result["division"]:
-                                record.add_division_tie()
-                        record.add_points_for(matchup_result["points_for"])
-                        record.add_points_against(matchup_result["points_against"])
-                        if matchup_result["division"]:
-                            record.add_division_points_for(matchup_result["points_for"])
-                            record.add_division_points_against(matchup_result["points_against"])
-                        records[team.team_id] = record
-
-            team.record = record
-
-        ordered_records = OrderedDict()
-        standings_rank = 1
-        for ordered_record in sorted(
-                records.items(),
-                key=lambda x: (-x[1].get_wins(), -x[1].get_losses(), -x[1].get_ties(), -x[1].get_points_for())):
-            ordered_record[1].rank = standings_rank
-            ordered_records[ordered_record[0]] = ordered_record[1]
-            standings_rank += 1
-
-        league.records_by_week[str(week)] = ordered_records
-        return records
+        return league.records_by_week
 
     @staticmethod
-    def calculate_luck(week, league: BaseLeague, custom_weekly_matchups):
-        logger.debug("Calculating luck for week \"{0}\".".format(week))
+    def calculate_all_play_records(scores):
+        """Count the wins, ties, and losses of every team against every other team (all-play) for each week of a team x
+        week score matrix, ranking the scores of each week with a single sort instead of comparing every pair of teams.
 
-        luck_results = defaultdict(defaultdict)
-
-        teams = league.teams_by_week.get(str(week))
-
-        matchups = {
-            str(team_id): value[
-                "result"] for pair in custom_weekly_matchups for team_id, value in list(pair.items())
-        }
-
-        for team_1 in teams.values():  # type: BaseTeam
-            luck_record = BaseRecord()
+        :param scores: NumPy array of scores with one row per team and one column per week (NaN if the team has no score)
+        :return: tuple of (wins, ties, losses) integer arrays shaped like scores
+        """
+        wins = np.zeros(scores.shape, dtype=np.int64)
+        ties = np.zeros(scores.shape, dtype=np.int64)
+        losses = np.zeros(scores.shape, dtype=np.int64)
 
-            for team_2 in teams.values():
-                if team_1.team_id == team_2.team_id:
-                    continue
-                score_1 = team_1.points
-                score_2 = team_2.points
+        for week_index in range(scores.shape[1]):
+            week_scores = scores[:, week_index]
+            has_score = ~np.isnan(week_scores)
+            sorted_scores = np.sort(week_scores[has_score])
 
-                if float(score_1) > float(score_2):
-                    luck_record.add_win()
-                elif float(score_1) < float(score_2):
-                    luck_record.add_loss()
-                else:
-                    luck_record.add_tie()
+            # number of lower scores and of lower or equal scores (including the score of the team itself)
+            num_lower = np.searchsorted(sorted_scores, week_scores[has_score], side="left")
+            num_lower_or_equal = np.searchsorted(sorted_scores, week_scores[has_score], side="right")
 
-            luck_results[team_1.team_id]["luck_record"] = luck_record
+            wins[has_score, week_index] = num_lower
+            ties[has_score, week_index] = num_lower_or_equal - num_lower - 1
+            losses[has_score, week_index] = len(sorted_scores) - num_lower_or_equal
 
-            # calc luck %
-            # TODO: assuming no ties...  how are tiebreakers handled?
-            luck = 0.0
-            # number of teams excluding current team
-            num_teams = float(len(teams)) - 1
+        return wins, ties, losses
 
-            if luck_record.get_wins() != 0 and luck_record.get_losses() != 0:
-                matchup_result = matchups[str(team_1.team_id)]
-                if matchup_result == "W" or matchup_result == "T":
-                    luck = (luck_record.get_losses() + luck_record.get_ties()) / num_teams
-                else:
-                    luck = 0 - (luck_record.get_wins() + luck_record.get_ties()) / num_teams
+    @staticmethod
+    def calculate_season_luck(week_for_report, league: BaseLeague):
+        """Calculate the luck of every team for every week through week_for_report at once, from the all-play records
+        of the team x week score matrix and the result of each team in its actual matchup.
 
-            # noinspection PyTypeChecker
-            luck_results[team_1.team_id]["luck"] = luck * 100
+        :return: dict by week of luck results, each a dict by team id of its "luck" and all-play "luck_record"
+        """
+        logger.debug("Calculating luck for weeks 1 through \"{0}\".".format(week_for_report))
+
+        weeks = [str(week) for week in range(1, int(week_for_report) + 1)]
+
+        # matchup results are keyed by team id strings
+        team_indexes = {}
+        for week in weeks:
+            for team in league.teams_by_week.get(week).values():  # type: BaseTeam
+                team_indexes.setdefault(str(team.team_id), len(team_indexes))
+
+        scores = np.full((len(team_indexes), len(weeks)), np.nan)
+        # whether the team won or tied its actual matchup, and whether it has a matchup result
+        won_or_tied = np.zeros(scores.shape, dtype=bool)
+        has_result = np.zeros(scores.shape, dtype=bool)
+        for week_index, week in enumerate(weeks):
+            for team in league.teams_by_week.get(week).values():  # type: BaseTeam
+                scores[team_indexes[str(team.team_id)], week_index] = float(team.points)
+
+            for pair in league.get_custom_weekly_matchups(week):
+                for team_id, value in pair.items():
+                    if team_id in team_indexes:
+                        has_result[team_indexes[team_id], week_index] = True
+                        won_or_tied[team_indexes[team_id], week_index] = value["result"] in ("W", "T")
+
+        wins, ties, losses = CalculateMetrics.calculate_all_play_records(scores)
+
+        # number of teams excluding current team
+        num_teams = np.maximum(np.sum(~np.isnan(scores), axis=0) - 1, 1)
+
+        # TODO: assuming no ties...  how are tiebreakers handled?
+        luck = np.where(
+            (wins != 0) & (losses != 0) & has_result,
+            np.where(won_or_tied, (losses + ties) / num_teams, -((wins + ties) / num_teams)),
+            0.0
+        ) * 100
+
+        season_luck = {}
+        for week_index, week in enumerate(weeks):
+            luck_results = defaultdict(defaultdict)
+            for team in league.teams_by_week.get(week).values():  # type: BaseTeam
+                team_index = team_indexes[str(team.team_id)]
+                luck_results[team.team_id]["luck_record"] = BaseRecord(
+                    wins=int(wins[team_index, week_index]),
+                    ties=int(ties[team_index, week_index]),
+                    losses=int(losses[team_index, week_index])
+                )
+                luck_results[team.team_id]["luck"] = float(luck[team_index, week_index])
+            season_luck[week] = luck_results
 
-        return luck_results
+        return season_luck
 
     @staticmethod
     def get_ranks_for_metric(data_for_metric, power_ranked_teams, metric_ranking_key):
-        rank = 1
-        for team in data_for_metric:
-            for team_rankings in power_ranked_teams.values():
-                if team[1] == team_rankings["name"]:
-                    team_rankings[metric_ranking_key] = rank
-            rank += 1
+        for rank, team in enumerate(data_for_metric, start=1):  # type: int, MetricRow
+            power_ranked_teams[team.team_id][metric_ranking_key] = rank
 
     def calculate_power_rankings(self, teams_results, data_for_scores, data_for_coaching_efficiency, data_for_luck):
         """ avg of (weekly score rank + weekly coaching efficiency rank + weekly luck rank)
@@ -814,29 +785,11 @@ class CalculateMetrics(object):
         return power_ranked_teams
 
     @staticmethod
-    def calculate_z_scores(weekly_teams_results):
+    def calculate_z_scores(teams_results, team_score_stats: TeamScoreStats):
+        """Calculate the z-scores of the points of every team for a week against its points of the previous weeks, held
+        in running statistics that are then updated with the points of the week (so weeks must be added in order).
+        """
         logger.debug("Calculating z-scores.")
 
-        results = {}
-
-        # can only determine z_score
-        can_calculate = len(weekly_teams_results) > 2
-
-        # iterates through team ids of first week since team ids remain unchanged
-        for team_id in weekly_teams_results[0].keys():
-            z_score = None
-
-            if can_calculate:
-                scores = [week[team_id].points for week in weekly_teams_results]
-
-                scores_excluding_current = scores[:-1]
-                current_score = scores[-1]
-
-                standard_deviation = np.std(scores_excluding_current)
-                mean_score = np.mean(scores_excluding_current)
-                z_score = (float(current_score) - float(mean_score)) / float(
-                    standard_deviation) if standard_deviation != 0 else 0
-
-            results[team_id] = z_score
-
-        return results
+        return team_score_stats.add_week(
+            {team_id: team_result.points for team_id, team_result in teams_results.items()})
@@ -0,0 +1,149 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import numpy as np
+
+from report.logger import get_logger
+
+logger = get_logger(__name__, propagate=False)
+
+# weight added to every eligible player slot pairing so the optimal lineup always fills as many slots as possible, and
+# only then maximizes points (matching the greedy lineup, which fills slots regardless of points)
+filled_slot_weight = 1.0e6
+
+
+def solve_assignments(costs):
+    """Solve a batch of rectangular assignment problems (Hungarian algorithm, with shortest augmenting paths and
+    potentials) of the same shape, assigning every row of each cost matrix to a distinct column with minimal total cost.
+    All problems of the batch are advanced in lockstep, so each step is a single array operation over the whole batch.
+
+    :param costs: 3D NumPy array of shape (problems, rows, columns) with rows <= columns
+    :return: NumPy array of shape (problems, rows) of the assigned column of each row
+    """
+    num_problems, num_rows, num_columns = costs.shape
+    problems = np.arange(num_problems)
+    # potentials of rows and columns, and the (1-based) row assigned to each column (0 for none), where column 0 is a
+    # virtual column holding the row being added
+    row_potentials = np.zeros((num_problems, num_rows + 1))
+    column_potentials = np.zeros((num_problems, num_columns + 1))
+    column_rows = np.zeros((num_problems, num_columns + 1), dtype=np.int64)
+    previous_columns = np.zeros((num_problems, num_columns + 1), dtype=np.int64)
+
+    for row in range(1, num_rows + 1):
+        column_rows[:, 0] = row
+        columns = np.zeros(num_problems, dtype=np.int64)
+        min_reduced_costs = np.full((num_problems, num_columns + 1), np.inf)
+        visited = np.zeros((num_problems, num_columns + 1), dtype=bool)
+        active = np.ones(num_problems, dtype=bool)
+
+        # grow a tree of tight edges from the new row of each problem until it reaches a free column
+        while active.any():
+            visited[problems[active], columns[active]] = True
+            tree_rows = column_rows[problems, columns]
+            unvisited = ~visited & active[:, None]
+            unvisited[:, 0] = False
+
+            reduced_costs = np.full((num_problems, num_columns + 1), np.inf)
+            reduced_costs[:, 1:] = (costs[problems, tree_rows - 1] - row_potentials[problems, tree_rows][:, None] -
+                                    column_potentials[:, 1:])
+            improved = unvisited & (reduced_costs < min_reduced_costs)
+            min_reduced_costs[improved] = reduced_costs[improved]
+            previous_columns[improved] = np.broadcast_to(columns[:, None], improved.shape)[improved]
+
+            candidates = np.where(unvisited, min_reduced_costs, np.inf)
+            next_columns = np.argmin(candidates, axis=1)
+            deltas = np.where(active, candidates[problems, next_columns], 0.0)
+
+            tree = visited & active[:, None]
+            tree_problems, tree_columns = np.nonzero(tree)
+            row_potentials[tree_problems, column_rows[tree_problems, tree_columns]] += deltas[tree_problems]
+            column_potentials -= np.where(tree, deltas[:, None], 0.0)
+            min_reduced_costs -= np.where(unvisited, deltas[:, None], 0.0)
+
+            columns = np.where(active, next_columns, columns)
+            active &= column_rows[problems, columns] != 0
+
+        # augment along the path of each problem back to the virtual column
+        while columns.any():
+            augmenting = columns != 0
+            previous = previous_columns[problems, columns]
+            column_rows[problems[augmenting], columns[augmenting]] = column_rows[
+                problems[augmenting], previous[augmenting]]
+            columns = np.where(augmenting, previous, 0)
+
+    assignments = np.full((num_problems, num_rows), -1, dtype=np.int64)
+    assigned_problems, assigned_columns = np.nonzero(column_rows[:, 1:])
+    assignments[assigned_problems, column_rows[assigned_problems, assigned_columns + 1] - 1] = assigned_columns
+    return assignments
+
+
+def solve_lineups(points, eligibility):
+    """Find the optimal lineups for a batch of rosters with the same roster slots by solving the assignments of players
+    to slots as maximum weight bipartite matchings, with an empty alternative for every slot that no eligible player can
+    fill. Rosters are padded to the same number of players with players eligible for no slot.
+
+    :param points: NumPy array of shape (rosters, players) of the points of each player
+    :param eligibility: boolean NumPy array of shape (rosters, slots, players) of the slots each player can fill
+    :return: NumPy array of shape (rosters, slots) of the player index assigned to each slot (-1 for an empty slot)
+    """
+    num_rosters, num_slots, num_players = eligibility.shape
+    if not num_rosters or not num_slots:
+        return np.full((num_rosters, num_slots), -1, dtype=np.int64)
+
+    weights = np.zeros((num_rosters, num_slots, num_players + num_slots))
+    weights[:, :, :num_players] = np.where(eligibility, filled_slot_weight + points[:, None, :], -filled_slot_weight)
+    assignments = solve_assignments(-weights)
+    return np.where(assignments < num_players, assignments, -1)
+
+
+class OptimalLineups(object):
+    """Optimal lineups of every team for every week of the league, solved in a single batch over the player week table
+    as weighted assignments of rostered players to the active (non-bench) roster slots. Slot eligibility is taken from
+    the eligible position bitmasks of the table, and players eligible for no active slot are left out of each matrix.
+    """
+
+    def __init__(self, league):
+        logger.debug("Solving optimal lineups.")
+
+        self.player_week_table = league.get_player_week_table()
+
+        # one slot per active roster position (flex positions included), in roster position order
+        self.slots = []
+        for position, position_count in league.roster_position_counts.items():
+            if position not in league.bench_positions:
+                self.slots.extend([position] * int(position_count))
+        slot_masks = self.player_week_table.get_slot_masks(league.roster_position_counts.keys())
+        slot_bits = np.array([slot_masks[slot] for slot in self.slots], dtype=np.uint64)
+
+        # (week, team_id) -> (optimal score, table rows of the optimal lineup in slot order)
+        self.lineups = {}
+
+        eligible_slots = (self.player_week_table.eligible[:, None] & slot_bits[None, :]) != 0
+        points = np.nan_to_num(self.player_week_table.points)
+
+        # players of each team week eligible for at least one active slot, padded to the same number of players
+        team_weeks = list(self.player_week_table.team_week_rows.keys())
+        candidate_rows = [
+            np.arange(rows.start, rows.stop)[eligible_slots[rows].any(axis=1)]
+            for rows in self.player_week_table.team_week_rows.values()
+        ]
+        num_candidates = max([len(rows) for rows in candidate_rows], default=0)
+        batch_rows = np.full((len(team_weeks), num_candidates), -1, dtype=np.int64)
+        for team_week_index, rows in enumerate(candidate_rows):
+            batch_rows[team_week_index, :len(rows)] = rows
+        padded = batch_rows < 0
+
+        assignments = solve_lineups(
+            np.where(padded, 0.0, points[batch_rows]),
+            np.where(padded[:, None, :], False, eligible_slots[batch_rows].transpose(0, 2, 1))
+        )
+
+        for team_week, rows, assignment in zip(team_weeks, batch_rows, assignments):
+            lineup_rows = [int(rows[player]) for player in assignment if player >= 0]
+            self.lineups[team_week] = (
+                sum(self.player_week_table.players[row].points for row in lineup_rows),
+                lineup_rows
+            )
+
+    def get_optimal_score(self, week, team_id):
+        return self.lineups.get((int(week), team_id), (0, []))[0]
@@ -0,0 +1,105 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+from calculate.bad_boy_stats import BadBoyStats
+from calculate.beef_stats import BeefStats
+from calculate.covid_risk import CovidRisk
+from dao.base import BasePlayer
+from report.logger import get_logger
+from utils.app_config_parser import AppConfigParser
+
+logger = get_logger(__name__, propagate=False)
+
+
+class PlayerEnrichment(object):
+    """Bad boy, beef, and COVID-19 risk fields of players for the report, computed once per player for the whole run.
+    None of the fields depend on the week, so they are cached by player identity (name, NFL team, and position) and
+    reused for every week and team the player starts for.
+    """
+
+    # enrichment fields and their values for players without enrichment (such as bench players)
+    default_fields = {
+        "bad_boy_crime": str(),
+        "bad_boy_points": int(),
+        "bad_boy_num_offenders": int(),
+        "weight": float(),
+        "tabbu": float(),
+        "covid_risk": int()
+    }
+
+    def __init__(self, config, season, bad_boy_stats=None, beef_stats=None, covid_risk=None):
+        self.config = config  # type: AppConfigParser
+        self.bad_boy_stats = bad_boy_stats  # type: BadBoyStats
+        self.beef_stats = beef_stats  # type: BeefStats
+        self.covid_risk = covid_risk  # type: CovidRisk
+
+        self.include_bad_boy = self.config.getboolean("Report", "league_bad_boy_rankings")
+        self.include_beef = self.config.getboolean("Report", "league_beef_rankings")
+        self.include_covid_risk = self.config.getboolean("Report", "league_covid_risk_rankings") and int(season) >= 2020
+
+        self.enrichment_by_player = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_player_key(player: BasePlayer):
+        return (
+            player.first_name,
+            player.last_name,
+            player.full_name,
+            player.nfl_team_abbr,
+            player.primary_position
+        )
+
+    def get_player_enrichment(self, player: BasePlayer):
+        """Return the enrichment fields of a player, computing them on the first lookup of the player.
+
+        :return: dict of enrichment field values by field name
+        """
+        player_key = self.get_player_key(player)
+        enrichment = self.enrichment_by_player.get(player_key)
+        if enrichment is not None:
+            self.hits += 1
+            return enrichment
+
+        self.misses += 1
+        enrichment = dict(self.default_fields)
+
+        if self.include_bad_boy:
+            player_bad_boy_stats = self.bad_boy_stats.get_player_bad_boy_stats(
+                player.first_name, player.last_name, player.nfl_team_abbr, player.primary_position)
+            enrichment["bad_boy_crime"] = player_bad_boy_stats["worst_offense"]
+            enrichment["bad_boy_points"] = player_bad_boy_stats["total_points"]
+            enrichment["bad_boy_num_offenders"] = (
+                player_bad_boy_stats.get("num_offenders") if player_bad_boy_stats.get("pos") == "DEF" else 0)
+
+        if self.include_beef:
+            player_beef_stats = self.beef_stats.get_player_beef_stat(
+                player.first_name, player.last_name, player.nfl_team_abbr)
+            enrichment["weight"] = player_beef_stats["weight"]
+            enrichment["tabbu"] = player_beef_stats["tabbu"]
+
+        if self.include_covid_risk:
+            enrichment["covid_risk"] = self.covid_risk.get_player_covid_risk(
+                player.full_name, player.nfl_team_abbr, player.primary_position)
+
+        self.enrichment_by_player[player_key] = enrichment
+        return enrichment
+
+    def add_player_enrichment(self, player: BasePlayer, bench_positions):
+        """Set the enrichment fields of a player, leaving the defaults for bench players."""
+        if player.selected_position not in bench_positions:
+            enrichment = self.get_player_enrichment(player)
+        else:
+            enrichment = self.default_fields
+        for field, value in enrichment.items():
+            setattr(player, field, value)
+        return player
+
+    def get_hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def log_hit_rate(self):
+        logger.info("Player enrichment cache: {0} players enriched for {1} lookups ({2:.1%} hit rate).".format(
+            self.misses, self.hits + self.misses, self.get_hit_rate()))
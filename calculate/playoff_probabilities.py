@@ -14,6 +14,7 @@ from utils.app_config_parser import AppConfigParser
 import numpy as np
 
 from report.logger import get_logger
+from utils.data_storage import get_data_storage
 
 logger = get_logger(__name__, propagate=False)
 
@@ -242,21 +243,17 @@ class PlayoffProbabilities(object):
                         self.simulations), ("s" if self.simulations > 1 else ""), str(delta)))
 
                     if self.save_data:
-                        save_dir = os.path.join(self.data_dir, "week_" + str(week_for_report))
-                        if not os.path.exists(save_dir):
-                            os.makedirs(save_dir)
-
-                        with open(os.path.join(save_dir, "playoff_probs_data.json"), "w") as pp_out:
-                            json.dump(self.playoff_probs_data, pp_out, ensure_ascii=False, indent=2)
+                        get_data_storage().save(
+                            os.path.join(self.data_dir, "week_" + str(week_for_report), "playoff_probs_data.json"),
+                            self.playoff_probs_data)
 
                 else:
                     logger.info("Using saved Monte Carlo playoff simulations for playoff probabilities.")
 
                     playoff_probs_data_file_path = os.path.join(
                         self.data_dir, "week_" + str(week_for_report), "playoff_probs_data.json")
-                    if os.path.exists(playoff_probs_data_file_path):
-                        with open(playoff_probs_data_file_path, "r") as pp_in:
-                            self.playoff_probs_data = json.load(pp_in)
+                    if get_data_storage().exists(playoff_probs_data_file_path):
+                        self.playoff_probs_data = get_data_storage().load(playoff_probs_data_file_path)
                     else:
                         raise FileNotFoundError(
                             "FILE {0} DOES NOT EXIST. CANNOT RUN LOCALLY WITHOUT HAVING PREVIOUSLY SAVED DATA!".format(
@@ -3,7 +3,7 @@ __email__ = "wrenjr@yahoo.com"
 
 import copy
 
-from dao.base import BaseLeague, BaseTeam, BasePlayer
+from dao.base import BaseLeague, BaseTeam
 from report.logger import get_logger
 
 logger = get_logger(__name__, propagate=False)
@@ -18,14 +18,7 @@ class PointsByPosition(object):
         self.bench_positions = league.bench_positions
         self.flex_types = list(league.get_flex_positions_dict().keys())
         self.flex_types.remove("FLEX_IDP")  # comment/uncomment line to remove/add FLEX_IDP to team points by position
-
-    def get_points_for_position(self, players, position):
-        total_points_by_position = 0
-        for player in players:  # type: BasePlayer
-            if position in player.eligible_positions and player.selected_position not in self.bench_positions:
-                total_points_by_position += float(player.points)
-
-        return total_points_by_position
+        self.player_week_table = league.get_player_week_table()
 
     @staticmethod
     def calculate_points_by_position_season_averages(season_average_points_by_position_dict):
@@ -50,14 +43,24 @@ class PointsByPosition(object):
 
         return season_average_points_by_position_dict
 
-    def execute_points_by_position(self, team_name, roster):
+    def execute_points_by_position(self, team_name, week, team_id):
         logger.debug("Calculating points by position for team \"{0}\".".format(team_name))
 
+        slots = [
+            slot for slot in self.roster_slot_counts.keys()
+            if slot not in self.bench_positions and slot not in self.flex_types
+        ]
+
+        # points of the starting players of every team week eligible for each position, grouped in a single reduction
+        team_week_position_points = self.player_week_table.get_team_week_position_points(slots)
+        team_week_index = self.player_week_table.team_week_index.get((int(week), team_id))
+
         player_points_by_position = []
-        starting_players = [p for p in roster if p.selected_position not in self.bench_positions]
-        for slot in list(self.roster_slot_counts.keys()):
-            if slot not in self.bench_positions and slot not in self.flex_types:
-                player_points_by_position.append([slot, self.get_points_for_position(starting_players, slot)])
+        for slot_index, slot in enumerate(slots):
+            player_points_by_position.append([
+                slot,
+                float(team_week_position_points[team_week_index, slot_index]) if team_week_index is not None else 0.0
+            ])
 
         player_points_by_position = sorted(player_points_by_position, key=lambda x: x[0])
         return player_points_by_position
@@ -72,7 +75,8 @@ class PointsByPosition(object):
                 if self.roster_slot_counts.get(slot) == 0:
                     del self.roster_slot_counts[slot]
 
-            player_points_by_position = self.execute_points_by_position(team_result.name, team_result.roster)
+            player_points_by_position = self.execute_points_by_position(
+                team_result.name, team_result.week, team_result.team_id)
             weekly_points_by_position_data.append([team_result.team_id, player_points_by_position])
 
         return weekly_points_by_position_data
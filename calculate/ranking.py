@@ -0,0 +1,105 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import numpy as np
+
+from report.logger import get_logger
+
+logger = get_logger(__name__, propagate=False)
+
+
+def get_sort_codes(values):
+    """Convert metric values to a float array that sorts (and ties) like the values themselves: numbers are used as is,
+    and any other values (such as names) are replaced by their position among the distinct values in sorted order.
+    """
+    values = list(values)
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        distinct_values = sorted(set(values))
+        codes = {value: code for code, value in enumerate(distinct_values)}
+        return np.array([codes[value] for value in values], dtype=np.float64)
+
+
+class MetricRow(list):
+    """Row of a metric table: a list of its columns (as laid out in the report tables) that also carries the id of the
+    team of the row, so rows are joined to teams and to the rows of other tables by team id instead of by team name.
+    """
+
+    def __init__(self, team_id, columns=()):
+        super().__init__(columns)
+        self.team_id = team_id
+
+    def with_columns(self, columns):
+        """Return a new row of the same team with other columns."""
+        return MetricRow(self.team_id, columns)
+
+
+def get_rows_by_team_id(rows):
+    return {row.team_id: row for row in rows}
+
+
+class Ranking(object):
+    """Ranking of the rows of a metric table by a key and any number of ordered tiebreaks, computed with a single stable
+    sort (np.lexsort) over all of them. Rows tie when their keys are equal, and the tiebreaks only order the rows within
+    each tie group, so a ranking holds both the resolved order and the ties.
+
+    Attributes (indexed by position in ranked order):
+        order: index of the ranked row in the original rows
+        groups: index of the tie group of the row
+        ordinal_ranks: 1, 2, 3, ... (every row gets its own place)
+        competition_ranks: 1, 1, 3, ... (tied rows share the place of the first of them)
+        dense_ranks: 1, 1, 2, ... (tied rows share a place, and the next group takes the next place)
+        is_tied: whether the row is in a tie group of more than one row (and the group is not excluded from ties)
+
+    Attributes (indexed by tie group):
+        group_sizes: number of rows of the tie group
+    """
+
+    def __init__(self, keys, tiebreaks=(), reverse=True, presorted=False, excluded=None):
+        """
+        :param keys: values to rank the rows by
+        :param tiebreaks: sequence of value sequences (one value per row) to order tied rows by, in order of precedence
+        :param reverse: rank larger values first (for keys and tiebreaks)
+        :param presorted: the rows are already in ranked order, so ties are only grouped (consecutive equal keys)
+        :param excluded: optional sequence of flags of rows that never count as ties (a tie group is excluded when its
+            first row is), such as disqualified teams
+        """
+        codes = get_sort_codes(keys)
+        num_rows = len(codes)
+
+        if presorted:
+            self.order = np.arange(num_rows)
+        else:
+            sign = -1.0 if reverse else 1.0
+            # np.lexsort sorts by the last array first and is stable, so equal rows keep their original order
+            self.order = np.lexsort(
+                [sign * get_sort_codes(tiebreak) for tiebreak in reversed(tiebreaks)] + [sign * codes])
+
+        ranked_codes = codes[self.order]
+        group_starts = np.ones(num_rows, dtype=bool)
+        group_starts[1:] = ranked_codes[1:] != ranked_codes[:-1]
+
+        self.groups = np.cumsum(group_starts) - 1
+        self.group_sizes = np.bincount(self.groups, minlength=int(group_starts.sum()))
+        self.ordinal_ranks = np.arange(1, num_rows + 1)
+        self.competition_ranks = np.flatnonzero(group_starts)[self.groups] + 1
+        self.dense_ranks = self.groups + 1
+
+        counted_groups = self.group_sizes > 1
+        if excluded is not None and num_rows:
+            counted_groups &= ~np.asarray(excluded, dtype=bool)[self.order][group_starts]
+        self.is_tied = counted_groups[self.groups] if num_rows else np.zeros(0, dtype=bool)
+        # number of tied pairs of rows
+        self.num_ties = int((self.group_sizes * (self.group_sizes - 1) // 2)[counted_groups].sum())
+
+    def __len__(self):
+        return len(self.order)
+
+    def get_num_first_place(self):
+        return int(self.group_sizes[0]) if len(self) else 0
+
+    def get_ranked(self, rows):
+        """Return the rows in ranked order."""
+        rows = list(rows)
+        return [rows[index] for index in self.order]
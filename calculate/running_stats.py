@@ -0,0 +1,153 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import math
+import sys
+from collections import deque
+
+from report.logger import get_logger
+
+logger = get_logger(__name__, propagate=False)
+
+
+class RunningStats(object):
+    """Running mean and population variance of all values added so far, updated in constant time per value with
+    Welford's algorithm.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.variance, 0.0))
+
+    def z_score(self, value):
+        std = self.std
+        return (float(value) - self.mean) / std if std != 0 else 0
+
+
+class RollingStats(RunningStats):
+    """Running mean and population variance of the most recent values in a fixed size window, updated in constant time
+    per value by adding the new value to and removing the oldest value from the Welford sums.
+    """
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.values = deque(maxlen=window)
+
+    def add(self, value):
+        if len(self.values) == self.window:
+            self.remove(self.values[0])
+        self.values.append(value)
+        super().add(value)
+
+    def remove(self, value):
+        self.count -= 1
+        if self.count == 0:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (value - self.mean)
+
+
+class ExponentialStats(RunningStats):
+    """Exponentially weighted running mean and variance, where each new value is weighted by the smoothing factor alpha
+    (0 < alpha <= 1) and the weights of all earlier values decay by (1 - alpha), updated in constant time per value.
+    """
+
+    def __init__(self, alpha):
+        super().__init__()
+        self.alpha = alpha
+        self._variance = 0.0
+
+    def add(self, value):
+        self.count += 1
+        if self.count == 1:
+            self.mean = float(value)
+            self._variance = 0.0
+        else:
+            delta = value - self.mean
+            self.mean += self.alpha * delta
+            self._variance = (1 - self.alpha) * (self._variance + self.alpha * delta * delta)
+
+    @property
+    def variance(self):
+        return self._variance
+
+
+class TeamScoreStats(object):
+    """Running score statistics of every team across the weeks of a season, used to calculate weekly z-scores without
+    revisiting the scores of earlier weeks. Supported types are "season" (all previous weeks), "rolling" (the previous
+    window weeks), and "ewma" (all previous weeks, exponentially weighted with smoothing factor alpha).
+    """
+
+    stats_types = ("season", "rolling", "ewma")
+
+    def __init__(self, stats_type="season", window=4, alpha=0.3):
+        if stats_type not in self.stats_types:
+            raise ValueError("Unsupported z-score type \"{0}\" (must be one of: {1}).".format(
+                stats_type, ", ".join(self.stats_types)))
+        if stats_type == "rolling" and int(window) < 2:
+            raise ValueError("Rolling z-score window must be at least 2 weeks.")
+        if stats_type == "ewma" and not 0 < float(alpha) <= 1:
+            raise ValueError("Exponentially weighted z-score alpha must be greater than 0 and at most 1.")
+
+        self.stats_type = stats_type
+        self.window = int(window)
+        self.alpha = float(alpha)
+        self.stats_by_team = {}
+
+    @classmethod
+    def from_config(cls, config):
+        try:
+            return cls(
+                config.get("Settings", "z_score_type", fallback="season"),
+                config.getint("Settings", "z_score_window", fallback=4),
+                config.getfloat("Settings", "z_score_ewma_alpha", fallback=0.3)
+            )
+        except ValueError as e:
+            logger.error(e)
+            sys.exit("...invalid z-score settings in config file, run aborted.")
+
+    def new_stats(self):
+        if self.stats_type == "rolling":
+            return RollingStats(self.window)
+        elif self.stats_type == "ewma":
+            return ExponentialStats(self.alpha)
+        return RunningStats()
+
+    def get_stats(self, team_id):
+        stats = self.stats_by_team.get(team_id)
+        if stats is None:
+            stats = self.stats_by_team[team_id] = self.new_stats()
+        return stats
+
+    def add_week(self, scores_by_team):
+        """Calculate the z-score of the score of every team for a week against its scores of the previous weeks, then
+        add the scores of the week to the running statistics. Z-scores require at least two previous weeks of scores.
+
+        :param scores_by_team: dict of team points by team id
+        :return: dict of z-scores by team id (None before the third week)
+        """
+        z_scores = {}
+        for team_id, score in scores_by_team.items():
+            stats = self.get_stats(team_id)
+            z_scores[team_id] = stats.z_score(score) if stats.count >= 2 else None
+            stats.add(float(score))
+        return z_scores
@@ -0,0 +1,93 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import numpy as np
+
+from calculate.ranking import MetricRow
+from dao.base import BaseLeague, BaseTeam
+from report.logger import get_logger
+
+logger = get_logger(__name__, propagate=False)
+
+
+class ScheduleLuck(object):
+    """Record of every team under the schedule of every other team for the season: team i playing the schedule of team j
+    faces the opponent of team j each week (and team j itself in the weeks team j played team i). All records are
+    computed at once by comparing the team x week score matrix against the opponent scores of every schedule, giving
+    team x schedule x week results that are summed over the weeks into team x schedule wins, ties, and losses.
+    """
+
+    def __init__(self, league: BaseLeague, week_for_report):
+        # schedules only cover the regular season, since playoff matchups are decided by the standings
+        last_week = min(int(week_for_report), int(league.num_regular_season_weeks))
+        logger.debug("Calculating schedule luck for weeks 1 through \"{0}\".".format(last_week))
+
+        self.teams = league.standings if league.standings else league.current_standings  # type: list
+        self.weeks = [str(week) for week in range(1, last_week + 1)]
+
+        # matchup results are keyed by team id strings
+        team_indexes = {str(team.team_id): team_index for team_index, team in enumerate(self.teams)}
+
+        shape = (len(self.teams), len(self.weeks))
+        scores = np.zeros(shape)
+        # index of the opponent of each team in each week (-1 without a game)
+        opponents = np.full(shape, -1, dtype=np.int64)
+
+        for week_index, week in enumerate(self.weeks):
+            for matchup in league.get_custom_weekly_matchups(week):
+                matchup_indexes = [
+                    (team_indexes.get(str(team_id)), matchup_result) for team_id, matchup_result in matchup.items()]
+                if len(matchup_indexes) != 2 or None in [team_index for team_index, _ in matchup_indexes]:
+                    continue
+                (team_index, team_result), (opponent_index, opponent_result) = matchup_indexes
+                scores[team_index, week_index] = float(team_result["points_for"])
+                scores[opponent_index, week_index] = float(opponent_result["points_for"])
+                opponents[team_index, week_index] = opponent_index
+                opponents[opponent_index, week_index] = team_index
+
+        played = opponents >= 0
+
+        # score of the opponent on each schedule (schedule x week), and the team x schedule x week opponent scores,
+        # where a team that would face itself on another schedule faces the team of that schedule instead
+        schedule_opponent_scores = np.where(played, scores[opponents, np.arange(len(self.weeks))[None, :]], np.nan)
+        faces_itself = opponents[None, :, :] == np.arange(len(self.teams))[:, None, None]
+        opponent_scores = np.where(faces_itself, scores[None, :, :], schedule_opponent_scores[None, :, :])
+
+        # a team has a result on a schedule in the weeks both it and the team of the schedule played
+        has_result = played[:, None, :] & played[None, :, :]
+        team_scores = scores[:, None, :]
+
+        self.wins = np.sum(has_result & (team_scores > opponent_scores), axis=2)
+        self.ties = np.sum(has_result & (team_scores == opponent_scores), axis=2)
+        self.losses = np.sum(has_result & (team_scores < opponent_scores), axis=2)
+
+        num_games = self.wins + self.ties + self.losses
+        self.win_percentages = np.divide(
+            self.wins + 0.5 * self.ties, num_games, out=np.zeros(num_games.shape), where=num_games > 0)
+
+        # wins (with ties as half wins) on the actual schedule of each team above its average over all schedules
+        win_totals = self.wins + 0.5 * self.ties
+        self.schedule_luck = np.diagonal(win_totals) - np.mean(win_totals, axis=1) if len(self.teams) else np.zeros(0)
+
+    def get_record_str(self, team_index, schedule_index):
+        # ties are only shown for records with ties to keep the records of the matrix short
+        record = "{0}-{1}".format(self.wins[team_index, schedule_index], self.losses[team_index, schedule_index])
+        if self.ties[team_index, schedule_index]:
+            record += "-{0}".format(self.ties[team_index, schedule_index])
+        return record
+
+    def get_schedule_luck_data(self):
+        """Return one row per team (in standings order) of its place, name, record under the schedule of every team (in
+        standings order), and schedule luck in wins.
+
+        :return: list of MetricRow
+        """
+        schedule_luck_data = []
+        for team_index, team in enumerate(self.teams):  # type: int, BaseTeam
+            schedule_luck_data.append(MetricRow(
+                team.team_id,
+                [team_index + 1, team.name] +
+                [self.get_record_str(team_index, schedule_index) for schedule_index in range(len(self.teams))] +
+                ["{0:+.2f}".format(self.schedule_luck[team_index])]
+            ))
+        return schedule_luck_data
@@ -4,6 +4,7 @@ __email__ = "wrenjr@yahoo.com"
 import numpy as np
 
 from calculate.metrics import CalculateMetrics
+from calculate.ranking import MetricRow, Ranking, get_rows_by_team_id
 from report.data import ReportData
 from report.logger import get_logger
 
@@ -11,9 +12,10 @@ logger = get_logger(__name__, propagate=False)
 
 
 class SeasonAverageCalculator(object):
-    def __init__(self, team_names, report_data: ReportData, break_ties):
+    def __init__(self, team_ids, team_names, report_data: ReportData, break_ties):
         logger.debug("Initializing season averages.")
 
+        self.team_ids = team_ids
         self.team_names = team_names
         self.report_data = report_data
         self.break_ties = break_ties
@@ -22,46 +24,42 @@ class SeasonAverageCalculator(object):
         logger.debug("Calculating season average from \"{0}\".".format(key))
 
         season_average_list = []
-        team_index = 0
-        for team in data:
-            team_name = self.team_names[team_index]
-
+        for team_id, team_name, team in zip(self.team_ids, self.team_names, data):
             valid_values = [value[1] for value in team if (value[1] is not None and value[1] != "DQ")]
             average = np.mean(valid_values)
             season_average_value = "{0:.2f}".format(average)
 
-            season_average_list.append([team_name, season_average_value])
-            team_index += 1
-        ordered_average_values = sorted(season_average_list, key=lambda x: float(x[1]), reverse=reverse)
-        index = 0
-        for team in ordered_average_values:
-            ordered_average_values[ordered_average_values.index(team)] = [index, team[0], team[1]]
-            index += 1
+            season_average_list.append(MetricRow(team_id, [team_name, season_average_value]))
+        ordered_average_values = [
+            team.with_columns([index, team[0], team[1]]) for index, team in enumerate(Ranking(
+                [float(team[1]) for team in season_average_list], reverse=reverse).get_ranked(season_average_list))
+        ]
 
         ordered_average_values = CalculateMetrics(None, None, None, None).resolve_season_average_ties(
             ordered_average_values, with_percent)
+        average_values_by_team_id = get_rows_by_team_id(ordered_average_values)
 
         ordered_season_average_list = []
-        for ordered_team in getattr(self.report_data, key):
-            for team in ordered_average_values:
-                if ordered_team[1] == team[1]:
-                    if with_percent:
-                        ordered_team[3] = "{0:.2f}%".format(float(str(ordered_team[3]).replace("%", ""))) if \
-                            ordered_team[3] != "DQ" else "DQ"
-                        value = str(team[2])
-                    elif key == "data_for_scores":
-                        ordered_team[3] = "{0:.2f}".format(float(str(ordered_team[3])))
-                        value = str(team[2])
-                    else:
-                        value = "{0}".format(str(team[2]))
+        for ordered_team in getattr(self.report_data, key):  # type: MetricRow
+            team = average_values_by_team_id.get(ordered_team.team_id)
+            if team:
+                if with_percent:
+                    ordered_team[3] = "{0:.2f}%".format(float(str(ordered_team[3]).replace("%", ""))) if \
+                        ordered_team[3] != "DQ" else "DQ"
+                    value = str(team[2])
+                elif key == "data_for_scores":
+                    ordered_team[3] = "{0:.2f}".format(float(str(ordered_team[3])))
+                    value = str(team[2])
+                else:
+                    value = "{0}".format(str(team[2]))
 
-                    if key == "data_for_scores":
-                        ordered_team.insert(-1, value)
-                    elif key == "data_for_coaching_efficiency" and self.break_ties and first_ties:
-                        ordered_team.insert(-2, value)
-                    else:
-                        ordered_team.append(value)
+                if key == "data_for_scores":
+                    ordered_team.insert(-1, value)
+                elif key == "data_for_coaching_efficiency" and self.break_ties and first_ties:
+                    ordered_team.insert(-2, value)
+                else:
+                    ordered_team.append(value)
 
-                    ordered_season_average_list.append(ordered_team)
+                ordered_season_average_list.append(ordered_team)
 
         return ordered_season_average_list
@@ -0,0 +1,170 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+from collections import OrderedDict
+
+import numpy as np
+
+from dao.base import BaseLeague, BaseTeam, BaseRecord
+from report.logger import get_logger
+
+logger = get_logger(__name__, propagate=False)
+
+# matchup result codes
+NO_GAME = 0
+WIN = 1
+LOSS = 2
+TIE = 3
+
+result_codes = {"W": WIN, "L": LOSS, "T": TIE}
+streak_types = {WIN: "W", LOSS: "L", TIE: "T"}
+
+
+class Standings(object):
+    """Cumulative standings of every team for every week of the season, computed in a single pass over the matchup
+    results of all weeks. Results are held in team x week arrays (result codes, points for and against, and division
+    flags), from which the cumulative records, streaks, division records, and weekly ranks of all weeks are computed
+    with array operations, and exposed as the records_by_week view of the league.
+    """
+
+    def __init__(self, league: BaseLeague, week_for_report):
+        logger.debug("Calculating league standings for weeks 1 through \"{0}\".".format(week_for_report))
+
+        self.teams = league.standings if league.standings else league.current_standings  # type: list
+        self.weeks = [str(week) for week in range(1, int(week_for_report) + 1)]
+
+        # matchup results are keyed by team id strings
+        team_indexes = {str(team.team_id): team_index for team_index, team in enumerate(self.teams)}
+
+        shape = (len(self.teams), len(self.weeks))
+        self.results = np.full(shape, NO_GAME, dtype=np.int8)
+        self.points_for = np.zeros(shape)
+        self.points_against = np.zeros(shape)
+        self.is_division = np.zeros(shape, dtype=bool)
+
+        for week_index, week in enumerate(self.weeks):
+            for matchup in league.get_custom_weekly_matchups(week):
+                for team_id, matchup_result in matchup.items():
+                    team_index = team_indexes.get(str(team_id))
+                    if team_index is None:
+                        continue
+                    self.results[team_index, week_index] = result_codes.get(matchup_result["result"], TIE)
+                    self.points_for[team_index, week_index] = float(matchup_result["points_for"])
+                    self.points_against[team_index, week_index] = float(matchup_result["points_against"])
+                    self.is_division[team_index, week_index] = bool(matchup_result["division"])
+
+        self.played = self.results != NO_GAME
+
+        # cumulative overall records (points are summed week by week, in the same order as adding them one at a time)
+        self.wins = np.cumsum(self.results == WIN, axis=1)
+        self.losses = np.cumsum(self.results == LOSS, axis=1)
+        self.ties = np.cumsum(self.results == TIE, axis=1)
+        self.cumulative_points_for = np.cumsum(self.points_for, axis=1)
+        self.cumulative_points_against = np.cumsum(self.points_against, axis=1)
+        self.streak_types, self.streak_lengths = self.get_streaks(self.results, self.played)
+
+        # cumulative division records
+        self.division_played = self.played & self.is_division
+        self.division_wins = np.cumsum((self.results == WIN) & self.is_division, axis=1)
+        self.division_losses = np.cumsum((self.results == LOSS) & self.is_division, axis=1)
+        self.division_ties = np.cumsum((self.results == TIE) & self.is_division, axis=1)
+        self.cumulative_division_points_for = np.cumsum(np.where(self.is_division, self.points_for, 0.0), axis=1)
+        self.cumulative_division_points_against = np.cumsum(
+            np.where(self.is_division, self.points_against, 0.0), axis=1)
+        self.division_streak_types, self.division_streak_lengths = self.get_streaks(self.results, self.division_played)
+
+        self.ranks = self.get_ranks()
+
+    @staticmethod
+    def get_streaks(results, played):
+        """Compute the streak of every team after every week: the result of its most recent game, and the number of
+        consecutive games (skipping weeks without a game) ending with that one with the same result.
+
+        :return: tuple of (streak result code, streak length) arrays, with NO_GAME and 0 before the first game
+        """
+        num_weeks = results.shape[1]
+
+        # week index of the most recent game through each week (-1 before the first game)
+        last_game = np.maximum.accumulate(np.where(played, np.arange(num_weeks), -1), axis=1)
+        streak_results = np.where(
+            last_game >= 0, np.take_along_axis(results, np.maximum(last_game, 0), axis=1), NO_GAME)
+
+        # a game starts a new streak when its result differs from the result of the previous game
+        previous_results = np.concatenate(
+            [np.full((results.shape[0], 1), NO_GAME, dtype=results.dtype), streak_results[:, :-1]], axis=1)
+        num_games = np.cumsum(played, axis=1)
+        streak_start = np.maximum.accumulate(np.where(played & (results != previous_results), num_games, 0), axis=1)
+
+        return streak_results, np.where(num_games > 0, num_games - streak_start + 1, 0)
+
+    def get_ranks(self):
+        """Rank the teams with a game in each week by wins, losses, ties, and points for (in that order, keeping the
+        standings order of teams with identical records).
+
+        :return: array of ranks (0 for teams without a game in the week)
+        """
+        ranks = np.zeros(self.results.shape, dtype=np.int64)
+        for week_index in range(len(self.weeks)):
+            team_indexes = np.flatnonzero(self.played[:, week_index])
+            ordered = team_indexes[np.lexsort((
+                -self.cumulative_points_for[team_indexes, week_index],
+                -self.ties[team_indexes, week_index],
+                -self.losses[team_indexes, week_index],
+                -self.wins[team_indexes, week_index]
+            ))]
+            ranks[ordered, week_index] = np.arange(1, len(ordered) + 1)
+        return ranks
+
+    @staticmethod
+    def get_points(points, has_games):
+        # points stay the integer 0 of a new record until the first game
+        return float(points) if has_games else 0
+
+    def get_record(self, team_index, week_index):
+        team = self.teams[team_index]  # type: BaseTeam
+        has_games = bool(self.wins[team_index, week_index] + self.losses[team_index, week_index] +
+                         self.ties[team_index, week_index])
+        has_division_games = bool(
+            self.division_wins[team_index, week_index] + self.division_losses[team_index, week_index] +
+            self.division_ties[team_index, week_index])
+        streak_type = streak_types.get(int(self.streak_types[team_index, week_index]))
+        division_streak_type = streak_types.get(int(self.division_streak_types[team_index, week_index]))
+
+        return BaseRecord(
+            week_index + 1,
+            wins=int(self.wins[team_index, week_index]),
+            ties=int(self.ties[team_index, week_index]),
+            losses=int(self.losses[team_index, week_index]),
+            points_for=self.get_points(self.cumulative_points_for[team_index, week_index], has_games),
+            points_against=self.get_points(self.cumulative_points_against[team_index, week_index], has_games),
+            streak_type=streak_type,
+            streak_len=int(self.streak_lengths[team_index, week_index]),
+            team_id=team.team_id,
+            team_name=team.name,
+            rank=int(self.ranks[team_index, week_index]) or None,
+            division=team.division,
+            division_wins=int(self.division_wins[team_index, week_index]),
+            division_ties=int(self.division_ties[team_index, week_index]),
+            division_losses=int(self.division_losses[team_index, week_index]),
+            division_points_for=self.get_points(
+                self.cumulative_division_points_for[team_index, week_index], has_division_games),
+            division_points_against=self.get_points(
+                self.cumulative_division_points_against[team_index, week_index], has_division_games),
+            division_streak_type=division_streak_type,
+            division_streak_len=int(self.division_streak_lengths[team_index, week_index]) if division_streak_type
+            else None
+        )
+
+    def get_records(self, week):
+        """Return the records after a week of the teams with a game in that week, ordered by rank.
+
+        :return: OrderedDict of BaseRecord by team id
+        """
+        week_index = self.weeks.index(str(week))
+        team_indexes = sorted(
+            np.flatnonzero(self.played[:, week_index]), key=lambda team_index: self.ranks[team_index, week_index])
+        return OrderedDict(
+            (self.teams[team_index].team_id, self.get_record(team_index, week_index)) for team_index in team_indexes)
+
+    def get_records_by_week(self):
+        return OrderedDict((week, self.get_records(week)) for week in self.weeks)
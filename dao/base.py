@@ -1,35 +1,30 @@
 __author__ = "Wren J. R. (uberfastman)"
 __email__ = "wrenjr@yahoo.com"
 
-import json
 import os
 from collections import defaultdict
 
 from calculate.bad_boy_stats import BadBoyStats
 from calculate.beef_stats import BeefStats
 from calculate.covid_risk import CovidRisk
+from calculate.optimal_lineup import OptimalLineups
 from calculate.playoff_probabilities import PlayoffProbabilities
-
-
-def complex_json_handler(obj):
-    """Custom handler to allow custom objects to be serialized into json.
-
-    :param obj: custom object to be serialized into json
-    :return: serializable version of the custom object
-    """
-    if hasattr(obj, "serialized"):
-        return obj.serialized()
-    else:
-        try:
-            return str(obj, "utf-8")
-        except TypeError:
-            raise TypeError("Object of type %s with value of %s is not JSON serializable" % (type(obj), repr(obj)))
+from dao.player_weeks import PlayerWeekTable
+from dao.serialization import ReportObjectSerializer, iter_attributes
 
 
 class FantasyFootballReportObject(object):
-    """Base Fantasy Football Report object.
+    """Base Fantasy Football Report object. Subclasses created in large numbers (one per player, team, record, etc. per
+    week) declare __slots__ for compact instances and list their public fields in serialization order in _fields.
     """
 
+    __slots__ = ()
+    _fields = ()
+    # run-time attributes that are not part of the serialized object
+    _transient_fields = ()
+    # identifying attributes shown by repr()
+    _repr_fields = ()
+
     def __init__(self):
         """Instantiate a Yahoo fantasy football object.
         """
@@ -38,14 +33,8 @@ class FantasyFootballReportObject(object):
         return self.to_json()
 
     def __repr__(self):
-        return self.to_json()
-
-    def subclass_dict(self):
-        """Derive snake case dict keys from custom object type camel case class names.
-
-        :return: dict with snake case strings of all subclasses of YahooFantasyObject as keys and subclasses as values
-        """
-        return {cls.__name__: cls for cls in self.__class__.__mro__[-2].__subclasses__()}
+        return "{0}({1})".format(self.__class__.__name__, ", ".join(
+            "{0}={1!r}".format(field, getattr(self, field, None)) for field in self._repr_fields))
 
     def clean_data_dict(self):
         """Recursive method to un-type custom class type objects for serialization.
@@ -53,8 +42,8 @@ class FantasyFootballReportObject(object):
         :return: dictionary that extracts serializable data from custom objects
         """
         clean_dict = {}
-        for k, v in self.__dict__.items():
-            clean_dict[k] = v.clean_data_dict() if type(v) in self.subclass_dict().values() else v
+        for k, v in iter_attributes(self):
+            clean_dict[k] = v.clean_data_dict() if isinstance(v, FantasyFootballReportObject) else v
         return clean_dict
 
     def serialized(self):
@@ -62,24 +51,30 @@ class FantasyFootballReportObject(object):
 
         :return: serializable dictionary
         """
-        serializable_dict = dict()
-        for a, v in self.clean_data_dict().items():
-            if hasattr(v, "serialized"):
-                serializable_dict[a] = v.serialized()
-            else:
-                serializable_dict[a] = v
-        return serializable_dict
+        return ReportObjectSerializer().to_serializable(self)
 
-    def to_json(self):
+    def to_json(self, compact=False):
         """Serialize the class object to json.
 
+        :param compact: leave out indentation and whitespace
         :return: json string derived from the serializable version of the class object
         """
-        return json.dumps(self.serialized(), indent=2, default=complex_json_handler, ensure_ascii=False)
+        return ReportObjectSerializer(compact=compact).dumps(self)
+
+    def dump_json(self, stream, compact=False):
+        """Serialize the class object to json written straight to a text stream (such as an open file).
+
+        :param stream: writable text stream
+        :param compact: leave out indentation and whitespace
+        """
+        ReportObjectSerializer(compact=compact).dump(self, stream)
 
 
 class BaseLeague(FantasyFootballReportObject):
 
+    _transient_fields = ("config", "player_data_by_week_function", "_player_week_table", "_optimal_lineups")
+    _repr_fields = ("league_id", "season", "week_for_report")
+
     def __init__(self, week_for_report, league_id, config, data_dir, save_data=True, dev_offline=False):
         super().__init__()
 
@@ -133,6 +128,32 @@ class BaseLeague(FantasyFootballReportObject):
         self.player_data_by_week_function = None
         self.player_data_by_week_key = None
 
+        self._player_week_table = None
+        self._optimal_lineups = None
+
+    def __getstate__(self):
+        # the config belongs to the current run and is reattached when a cached league is loaded
+        state = self.__dict__.copy()
+        state["config"] = None
+        # the player week table and optimal lineups are rebuilt on first use
+        state["_player_week_table"] = None
+        state["_optimal_lineups"] = None
+        return state
+
+    def get_player_week_table(self) -> PlayerWeekTable:
+        """Columnar table of all rostered players by team and week, built from teams_by_week on first use.
+        """
+        if self._player_week_table is None:
+            self._player_week_table = PlayerWeekTable(self)
+        return self._player_week_table
+
+    def get_optimal_lineups(self) -> OptimalLineups:
+        """Optimal lineups of all teams for all weeks, solved from the player week table on first use.
+        """
+        if self._optimal_lineups is None:
+            self._optimal_lineups = OptimalLineups(self)
+        return self._optimal_lineups
+
     def get_player_data_by_week(self, player_id, week=None):
         return getattr(self.player_data_by_week_function(player_id, week), self.player_data_by_week_key)
 
@@ -259,6 +280,10 @@ class BaseLeague(FantasyFootballReportObject):
 
 class BaseMatchup(FantasyFootballReportObject):
 
+    _fields = ("week", "complete", "tied", "division_matchup", "teams", "winner", "loser")
+    __slots__ = ("week", "_complete", "_tied", "division_matchup", "teams", "winner", "loser")
+    _repr_fields = ("week", "teams")
+
     def __init__(self):
         super().__init__()
 
@@ -270,17 +295,40 @@ class BaseMatchup(FantasyFootballReportObject):
         self.winner = BaseTeam()  # type: BaseTeam
         self.loser = BaseTeam()  # type: BaseTeam
 
-    def __setattr__(self, key, value):
-        if key == "complete" and not isinstance(value, bool):
+    @property
+    def complete(self):
+        return self._complete
+
+    @complete.setter
+    def complete(self, value):
+        if not isinstance(value, bool):
             raise ValueError("Matchup completion status can only be \"True\" or \"False\"!")
-        if key == "tied" and value:
+        self._complete = value
+
+    @property
+    def tied(self):
+        return self._tied
+
+    @tied.setter
+    def tied(self, value):
+        if value:
             self.winner = None
             self.loser = None
-        super().__setattr__(key, value)
+        self._tied = value
 
 
 class BaseTeam(FantasyFootballReportObject):
 
+    _fields = __slots__ = (
+        "week", "name", "num_moves", "num_trades", "managers", "team_id", "division", "points", "projected_points",
+        "home_field_advantage", "waiver_priority", "faab", "url", "roster",
+        "manager_str", "bench_points", "streak_str", "division_streak_str", "bad_boy_points", "worst_offense",
+        "num_offenders", "worst_offense_score", "total_weight", "tabbu", "total_covid_risk", "positions_filled_active",
+        "coaching_efficiency", "luck", "optimal_points", "weekly_overall_record", "record", "current_record",
+        "median_record", "current_median_record", "_combined_record"
+    )
+    _repr_fields = ("week", "team_id", "name")
+
     def __init__(self):
         super().__init__()
 
@@ -345,6 +393,16 @@ class BaseTeam(FantasyFootballReportObject):
 
 class BaseRecord(FantasyFootballReportObject):
 
+    _fields = (
+        "team_id", "team_name", "_record_type", "week", "_wins", "_ties", "_losses", "_points_for", "_points_against",
+        "_streak_type", "_streak_len", "rank", "_percentage", "_record_str", "_record_and_pf_str", "division",
+        "_division_wins", "_division_ties", "_division_losses", "_division_points_for", "_division_points_against",
+        "_division_streak_type", "_division_streak_len", "division_rank", "_division_percentage", "_division_record_str",
+        "_division_opponents_dict"
+    )
+    __slots__ = tuple(field if field != "week" else "_week" for field in _fields)
+    _repr_fields = ("team_id", "_record_type", "week", "_record_str")
+
     def __init__(self, week=0, wins=0, ties=0, losses=0, percentage=0, points_for=0, points_against=0,
                  streak_type=None, streak_len=0, team_id=None, team_name=None, rank=None, division=None,
                  division_wins=0, division_ties=0, division_losses=0, division_percentage=0, division_points_for=0,
@@ -393,13 +451,19 @@ class BaseRecord(FantasyFootballReportObject):
             self._division_wins, self._division_ties, self._division_losses, self._division_points_for)
         self._division_opponents_dict = division_opponents_dict
 
-    def __setattr__(self, key, value):
-        if key == "week":
-            if self._record_type == "overall":
-                raise ValueError(
-                    "BaseRecord.week attribute cannot be assigned when BaseRecord.record_type = \"overall\".")
+    @property
+    def week(self):
+        try:
+            return self._week
+        except AttributeError:
+            raise AttributeError("'BaseRecord' object has no attribute 'week'")
 
-        self.__dict__[key] = value
+    @week.setter
+    def week(self, value):
+        if self._record_type == "overall":
+            raise ValueError(
+                "BaseRecord.week attribute cannot be assigned when BaseRecord.record_type = \"overall\".")
+        self._week = value
 
     @staticmethod
     def _calculate_percentage(wins, ties, losses):
@@ -579,6 +643,10 @@ class BaseRecord(FantasyFootballReportObject):
 
 class BaseManager(FantasyFootballReportObject):
 
+    _fields = ("manager_id", "email", "name_str", "name")
+    __slots__ = ("manager_id", "email", "name_str", "_name")
+    _repr_fields = ("manager_id", "name")
+
     def __init__(self):
         super().__init__()
 
@@ -587,18 +655,31 @@ class BaseManager(FantasyFootballReportObject):
         self.name = None
         self.name_str = None
 
-    def __setattr__(self, key, value):
-        if key == "name":
-            value_tokens = str(value).split()
-            self.name_str = value_tokens[0]
-            for token in value_tokens[1:]:
-                self.name_str += " " + token[0] + "."
-            value = self.name_str
-        super().__setattr__(key, value)
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        value_tokens = str(value).split()
+        self.name_str = value_tokens[0]
+        for token in value_tokens[1:]:
+            self.name_str += " " + token[0] + "."
+        self._name = self.name_str
 
 
 class BasePlayer(FantasyFootballReportObject):
 
+    _fields = __slots__ = (
+        "week_for_report", "player_id", "bye_week", "display_position", "nfl_team_id", "nfl_team_abbr",
+        "nfl_team_name", "first_name", "last_name", "full_name", "headshot_url", "owner_team_id", "owner_team_name",
+        "percent_owned", "points", "projected_points", "season_points", "season_projected_points",
+        "season_average_points", "position_type", "primary_position", "selected_position", "selected_position_is_flex",
+        "status", "eligible_positions", "stats",
+        "bad_boy_crime", "bad_boy_points", "bad_boy_num_offenders", "weight", "tabbu", "covid_risk"
+    )
+    _repr_fields = ("week_for_report", "player_id", "full_name", "selected_position")
+
     def __init__(self):
         super().__init__()
 
@@ -640,6 +721,9 @@ class BasePlayer(FantasyFootballReportObject):
 
 class BaseStat(FantasyFootballReportObject):
 
+    _fields = __slots__ = ("stat_id", "name", "value")
+    _repr_fields = ("stat_id", "name", "value")
+
     def __init__(self):
         super().__init__()
 
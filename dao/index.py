@@ -0,0 +1,32 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+from collections import OrderedDict
+
+
+def get_key_function(key):
+    if callable(key):
+        return key
+    return lambda item: item.get(key) if isinstance(item, dict) else getattr(item, key)
+
+
+def index_by(items, key):
+    """Index items by id so platform data can be joined with dict lookups instead of nested scans.
+
+    :param items: iterable of platform data items (dicts or objects)
+    :param key: name of the dict key or attribute holding the id, or a function returning the id of an item
+    :return: ordered dict of {id: item} (when ids repeat the last item wins, matching a scan that keeps the last match)
+    """
+    key_function = get_key_function(key)
+    return OrderedDict((key_function(item), item) for item in items)
+
+
+def rank_by(items, key):
+    """Index the positions of already ranked items by id.
+
+    :param items: iterable of platform data items (dicts or objects) in rank order
+    :param key: name of the dict key or attribute holding the id, or a function returning the id of an item
+    :return: dict of {id: rank}, with ranks starting at 1
+    """
+    key_function = get_key_function(key)
+    return {key_function(item): rank for rank, item in enumerate(items, 1)}
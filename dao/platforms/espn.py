@@ -7,6 +7,7 @@ import re
 import sys
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from statistics import median
 import colorama
@@ -14,15 +15,19 @@ from colorama import Fore, Style
 
 from typing import List
 
-import requests
 from ff_espn_api import League, Settings, Team
 from ff_espn_api.box_player import BoxPlayer
 from ff_espn_api.box_score import BoxScore
 from ff_espn_api.constant import POSITION_MAP
 from ff_espn_api.league import checkRequestStatus
+from ff_espn_api.pick import Pick
 
 from dao.base import BaseLeague, BaseMatchup, BaseTeam, BaseRecord, BaseManager, BasePlayer, BaseStat
+from dao.index import index_by
 from report.logger import get_logger
+from utils.data_storage import get_data_storage
+from utils.http_client import get_http_client
+from utils.response_cache import get_week_cache_policy
 
 colorama.init()
 
@@ -131,12 +136,13 @@ class LeagueData(object):
         self.week_for_report = week_validation_function(self.config, week_for_report, self.current_week, self.season)
 
         logger.debug("Getting ESPN matchups by week data.")
-        self.matchups_by_week = {}
-        self.matchups_json_by_week = {}
+        # box scores with lineups (and their raw matchup json, needed for the rosters) are only retrieved for the weeks
+        # included in the report, while the matchups of later weeks are taken from the already retrieved schedule
+        box_scores_by_week, box_data_json_by_week = self.league.season_box_scores(
+            range(1, self.num_regular_season_weeks + 1), range(1, int(self.week_for_report) + 1))
+        self.matchups_by_week = {str(week): box_scores for week, box_scores in box_scores_by_week.items()}
+        self.matchups_json_by_week = {str(week): box_data_json for week, box_data_json in box_data_json_by_week.items()}
         for week_for_matchups in range(1, self.num_regular_season_weeks + 1):
-            self.matchups_by_week[str(week_for_matchups)] = self.league.box_scores(int(week_for_matchups))
-            self.matchups_json_by_week[str(week_for_matchups)] = self.league.box_data_json
-
             if int(week_for_matchups) <= int(self.week_for_report):
                 scores = []
                 for matchup in self.matchups_by_week[str(week_for_matchups)]:  # type: BoxScore
@@ -162,12 +168,12 @@ class LeagueData(object):
                 team_rosters[matchup.away_team.team_id] = matchup.away_lineup
             self.rosters_by_week[str(week_for_rosters)] = team_rosters
 
+            # index roster entries by player id so each roster player is joined to its json with a single lookup
             team_rosters_json = {}
-            for matchup_json in self.matchups_json_by_week[str(week_for_rosters)]:
-                team_rosters_json[matchup_json["home"]["teamId"]] = matchup_json[
-                    "home"]["rosterForCurrentScoringPeriod"]["entries"]
-                team_rosters_json[matchup_json["away"]["teamId"]] = matchup_json[
-                    "away"]["rosterForCurrentScoringPeriod"]["entries"]
+            for matchup_json in self.matchups_json_by_week.pop(str(week_for_rosters)):
+                for key in ["home", "away"]:
+                    team_rosters_json[matchup_json[key]["teamId"]] = index_by(
+                        matchup_json[key]["rosterForCurrentScoringPeriod"]["entries"], "playerId")
             self.rosters_json_by_week[str(week_for_rosters)] = team_rosters_json
 
         self.teams_json = self.league.teams_json
@@ -194,8 +200,7 @@ class LeagueData(object):
         if self.dev_offline:
             logger.debug("Loading saved ESPN league data.")
             try:
-                with open(file_path, "r", encoding="utf-8") as data_in:
-                    data = json.load(data_in)
+                data = get_data_storage().load(file_path)
             except FileNotFoundError:
                 logger.error(
                     "FILE {0} DOES NOT EXIST. CANNOT LOAD DATA LOCALLY WITHOUT HAVING PREVIOUSLY SAVED DATA!".format(
@@ -204,11 +209,7 @@ class LeagueData(object):
 
         if self.save_data:
             logger.debug("Saving ESPN league data.")
-            if not os.path.exists(file_dir):
-                os.makedirs(file_dir)
-
-            with open(file_path, "w", encoding="utf-8") as data_out:
-                json.dump(data, data_out, ensure_ascii=False, indent=2)
+            get_data_storage().save(file_path, data)
 
         return data
 
@@ -429,18 +430,21 @@ class LeagueData(object):
                 # add matchup to league matchups by week
                 league.matchups_by_week[str(week)].append(base_matchup)
 
-        for week, rosters in self.rosters_by_week.items():
+        for week in list(self.rosters_by_week.keys()):
+            # release the raw data of each week as soon as it has been mapped to base objects
+            rosters = self.rosters_by_week.pop(week)
+            rosters_json = self.rosters_json_by_week.pop(str(week))
+            self.matchups_by_week.pop(week, None)
             league.players_by_week[str(week)] = {}
             for team_id, roster in rosters.items():
-                team_json = self.rosters_json_by_week[str(week)][int(team_id)]
+                team_json = rosters_json[int(team_id)]
                 league_team = league.teams_by_week.get(str(week)).get(str(team_id))  # type: BaseTeam
 
                 for player in roster:  # type: BoxPlayer
 
                     player_json = {}
-                    for league_player_json in team_json:
-                        if player.playerId == league_player_json["playerId"]:
-                            player_json = league_player_json["playerPoolEntry"]["player"]
+                    if player.playerId in team_json:
+                        player_json = team_json[player.playerId]["playerPoolEntry"]["player"]
 
                     base_player = BasePlayer()
 
@@ -540,6 +544,8 @@ class LeagueData(object):
                     # add player to league players by week
                     league.players_by_week[str(week)][base_player.player_id] = base_player
 
+        self.matchups_by_week = {}
+
         league.current_standings = sorted(
             league.teams_by_week.get(str(self.week_for_report)).values(), key=lambda x: x.current_record.rank)
 
@@ -560,49 +566,133 @@ class LeagueData(object):
 class LeagueWrapper(League):
 
     def __init__(self, league_id: int, year: int, espn_s2=None, swid=None):
+        # raw json retrieved once and reused: NFL pro team schedules (same for every week) and the league schedule
+        self.pro_teams_json = None
+        self.schedule_json = []
         super().__init__(league_id, year, espn_s2, swid)
 
-    def _fetch_teams(self):
-        """Fetch teams in league"""
-        params = {
-            "view": "mTeam"
-        }
-        r = requests.get(self.ENDPOINT, params=params, cookies=self.cookies)
-        self.status = r.status_code
+    def _request_json(self, endpoint, params=None, headers=None, cache_policy=None):
+        """Retrieve ESPN API data through the shared HTTP client so all requests (including concurrent ones) reuse the
+        same pooled session, sending the espn_s2/SWID cookies of the league with each request. The league itself is not
+        changed, so worker threads can use this directly and leave updating the league to the calling thread.
+
+        :return: tuple of (response status code, response json)
+        """
+        r = get_http_client().get(
+            endpoint, params=params, cookies=self.cookies, headers=headers, cache_policy=cache_policy)
+        status = r.status_code
+        data = r.json()
         self.logger.debug(
-            "ESPN API Request: url: {0} params: {1} \nESPN API Response: {2}\n".format(self.ENDPOINT, params, r.json()))
-        checkRequestStatus(self.status)
+            "ESPN API Request: url: {0} params: {1} headers: {2} \nESPN API Response: {3}\n".format(
+                endpoint, params, headers, data))
+        checkRequestStatus(status)
+        return status, data
 
-        data = r.json() if self.year > 2017 else r.json()[0]
-        teams = data["teams"]
-        members = data["members"]
+    def _get_json(self, endpoint, params=None, headers=None, cache_policy=None):
+        self.status, data = self._request_json(endpoint, params=params, headers=headers, cache_policy=cache_policy)
+        return data
+
+    def _get_league_json(self, params):
+        data = self._get_json(self.ENDPOINT, params=params)
+        return data if self.year > 2017 else data[0]
+
+    def _fetch_league(self):
+        data = self._get_league_json(None)
+        if self.year < 2018:
+            self.current_week = data["scoringPeriodId"]
+        else:
+            self.current_week = data["status"]["currentMatchupPeriod"]
+        self.nfl_week = data["status"]["latestScoringPeriod"]
 
+        self._fetch_settings()
+        self._fetch_players()
+        self._fetch_teams()
+        self._fetch_draft()
+
+    def _fetch_players(self):
         params = {
-            "view": "mMatchup",
+            "scoringPeriodId": 0,
+            "view": "players_wl",
         }
-        r = requests.get(self.ENDPOINT, params=params, cookies=self.cookies)
-        self.status = r.status_code
-        self.logger.debug(
-            "ESPN API Request: url: {0} params: {1} \nESPN API Response: {2}\n".format(self.ENDPOINT, params, r.json()))
-        checkRequestStatus(self.status)
-
-        data = r.json() if self.year > 2017 else r.json()[0]
-        schedule = data["schedule"]
+        endpoint = "https://fantasy.espn.com/apis/v3/games/ffl/seasons/" + str(self.year) + "/players"
+
+        # map all player ids to player names
+        for player in self._get_json(endpoint, params=params):
+            self.player_map[player["id"]] = player["fullName"]
+
+    def _fetch_draft(self):
+        """Creates list of Pick objects from the leagues draft"""
+        data = self._get_league_json({"view": "mDraftDetail"})
+
+        # league has not drafted yet
+        if not data["draftDetail"]["drafted"]:
+            return
+
+        for pick in data["draftDetail"]["picks"]:
+            self.draft.append(Pick(
+                self.get_team_data(pick["teamId"]),
+                pick["playerId"],
+                self.player_map.get(pick["playerId"], ""),
+                pick["roundId"],
+                pick["roundPickNumber"],
+                pick["bidAmount"],
+                pick["keeper"]
+            ))
+
+    def _get_pro_teams_json(self):
+        if self.pro_teams_json is None:
+            endpoint = \
+                "https://fantasy.espn.com/apis/v3/games/ffl/seasons/" + str(self.year) + "?view=proTeamSchedules_wl"
+            self.pro_teams_json = self._get_json(endpoint)["settings"]["proTeams"]
+        return self.pro_teams_json
+
+    def _get_nfl_schedule(self, week: int):
+        pro_teams = self._get_pro_teams_json()
+
+        pro_team_schedule = {}
+        for team in pro_teams:
+            if team["id"] != 0 and team["byeWeek"] != week:
+                game_data = team["proGamesByScoringPeriod"][str(week)][0]
+                if team["id"] == game_data["awayProTeamId"]:
+                    pro_team_schedule[team["id"]] = (game_data["homeProTeamId"], game_data["date"])
+                else:
+                    pro_team_schedule[team["id"]] = (game_data["awayProTeamId"], game_data["date"])
+        return pro_team_schedule
 
+    def _request_positional_ratings(self, week: int):
         params = {
-            "view": "mRoster",
+            "view": "mPositionalRatings",
+            "scoringPeriodId": week,
         }
-        r = requests.get(self.ENDPOINT, params=params, cookies=self.cookies)
-        self.status = r.status_code
-        self.logger.debug(
-            "ESPN API Request: url: {0} params: {1} \nESPN API Response: {2}\n".format(self.ENDPOINT, params, r.json()))
-        checkRequestStatus(self.status)
+        status, data = self._request_json(self.ENDPOINT, params=params)
+        return status, self._parse_positional_ratings(data)
+
+    @staticmethod
+    def _parse_positional_ratings(data):
+        ratings = data["positionAgainstOpponent"]["positionalRatings"]
+
+        positional_ratings = {}
+        for pos, rating in ratings.items():
+            positional_ratings[pos] = {
+                team: team_data["rank"] for team, team_data in rating["ratingsByOpponent"].items()
+            }
+        return positional_ratings
+
+    def _fetch_teams(self):
+        """Fetch teams in league"""
+        # teams, members, schedule, and rosters are retrieved in a single multi-view request
+        data = self._get_league_json({"view": ["mTeam", "mMatchup", "mRoster"]})
+        teams = data["teams"]
+        members = data["members"]
+        schedule = data["schedule"]
+        self.schedule_json = schedule
 
-        data = r.json() if self.year > 2017 else r.json()[0]
         team_roster = {}
-        for team in data["teams"]:
+        for team in teams:
             team_roster[team["id"]] = team["roster"]
 
+        members_by_id = index_by(members, "id")
+
         self.teams_json = {}
         for team in teams:
             self.teams_json[str(team["id"])] = team
@@ -612,16 +702,14 @@ class LeagueWrapper(League):
             if len(owners) > 1:
                 managers = []
 
-            for member in members:
-                # For league that is not full the team will not have a owner field
-                if "owners" not in team or not team["owners"]:
-                    break
-                elif member["id"] in owners:
-                    if len(owners) > 1:
-                        managers.append(member)
-                    else:
-                        managers = [member]
-                        break
+            # for league that is not full the team will not have a owner field
+            if "owners" in team and team["owners"]:
+                owners_set = set(owners)
+                if len(owners) > 1:
+                    # keep members in league member order, matching the original scan over all members
+                    managers = [member for member_id, member in members_by_id.items() if member_id in owners_set]
+                else:
+                    managers = [members_by_id[owners[0]]] if owners[0] in members_by_id else None
             roster = team_roster[team["id"]]
 
             team = Team(team, roster, None, schedule)
@@ -630,11 +718,11 @@ class LeagueWrapper(League):
             self.teams.append(team)
 
         # replace opponentIds in schedule with team instances
+        teams_by_id = index_by(self.teams, "team_id")
         for team in self.teams:
             for week, matchup in enumerate(team.schedule):
-                for opponent in self.teams:
-                    if matchup == opponent.team_id:
-                        team.schedule[week] = opponent
+                if matchup in teams_by_id:
+                    team.schedule[week] = teams_by_id[matchup]
 
         # calculate margin of victory
         for team in self.teams:
@@ -646,19 +734,50 @@ class LeagueWrapper(League):
         self.teams = sorted(self.teams, key=lambda x: x.team_id, reverse=False)
 
     def _fetch_settings(self):
+        data = self._get_league_json({"view": "mSettings"})
+        self.settings_json = data["settings"]
+        self.settings = Settings(self.settings_json)
+
+    def _request_box_score_json(self, week: int):
+        """Retrieve the matchups of a week with the lineups and scores of its scoring period, along with the positional
+        ratings of the week (requested as an additional view, with a separate request only if it is not returned).
+
+        :return: tuple of (status code of the last response, raw matchup json, positional ratings)
+        """
         params = {
-            "view": "mSettings",
+            "view": ["mMatchupScore", "mPositionalRatings"],
+            "scoringPeriodId": week,
         }
 
-        r = requests.get(self.ENDPOINT, params=params, cookies=self.cookies)
-        self.status = r.status_code
-        self.logger.debug(
-            "ESPN API Request: url: {0} params: {1} \nESPN API Response: {2}\n".format(self.ENDPOINT, params, r.json()))
-        checkRequestStatus(self.status)
+        filters = {"schedule": {"filterMatchupPeriodIds": {"value": [week]}}}
+        headers = {"x-fantasy-filter": json.dumps(filters)}
 
-        data = r.json() if self.year > 2017 else r.json()[0]
-        self.settings_json = data["settings"]
-        self.settings = Settings(self.settings_json)
+        # box scores of finished weeks are cached (indefinitely once stat corrections for the week are done)
+        status, data = self._request_json(self.ENDPOINT + "?view=mMatchup", params=params, headers=headers,
+                                          cache_policy=get_week_cache_policy(week, self.nfl_week))
+
+        if "positionAgainstOpponent" in data:
+            positional_ratings = self._parse_positional_ratings(data)
+        else:
+            status, positional_ratings = self._request_positional_ratings(week)
+
+        return status, data["schedule"], positional_ratings
+
+    def _get_box_score_json(self, week: int):
+        self.status, box_data_json, positional_ratings = self._request_box_score_json(week)
+        return box_data_json, positional_ratings
+
+    def _get_box_scores(self, week: int, box_data_json, positional_ratings) -> List[BoxScore]:
+        pro_schedule = self._get_nfl_schedule(week)
+        box_data = [BoxScore(matchup, pro_schedule, positional_ratings, week) for matchup in box_data_json]
+
+        teams_by_id = index_by(self.teams, "team_id")
+        for matchup in box_data:
+            if matchup.home_team in teams_by_id:
+                matchup.home_team = teams_by_id[matchup.home_team]
+            if matchup.away_team in teams_by_id:
+                matchup.away_team = teams_by_id[matchup.away_team]
+        return box_data
 
     # noinspection PyAttributeOutsideInit
     def box_scores(self, week: int = None) -> List[BoxScore]:
@@ -669,33 +788,63 @@ class LeagueWrapper(League):
         if not week or week > self.current_week:
             week = self.current_week
 
-        params = {
-            "view": "mMatchupScore",
-            "scoringPeriodId": week,
-        }
-
-        filters = {"schedule": {"filterMatchupPeriodIds": {"value": [week]}}}
-        headers = {"x-fantasy-filter": json.dumps(filters)}
-
-        r = requests.get(self.ENDPOINT + "?view=mMatchup", params=params, cookies=self.cookies, headers=headers)
-        self.status = r.status_code
-        self.logger.debug(
-            "ESPN API Request: url: {0}?view=mMatchup params: {1} headers: {2} \nESPN API Response: {3}\n".format(
-                self.ENDPOINT, params, headers, r.json()))
-        checkRequestStatus(self.status)
+        box_data_json, positional_ratings = self._get_box_score_json(week)
+        self.box_data_json = box_data_json
+        return self._get_box_scores(week, box_data_json, positional_ratings)
 
-        data = r.json()
+    def season_box_scores(self, weeks, lineup_weeks):
+        """Retrieve the box scores of multiple weeks at once. The weeks in lineup_weeks are requested concurrently (one
+        request per scoring period, since lineups are only returned for the scoring period of a request), and the
+        matchups of all other weeks are built from the league schedule retrieved with the teams, without lineups.
 
-        schedule = data["schedule"]
-        pro_schedule = self._get_nfl_schedule(week)
-        positional_rankings = self._get_positional_ratings(week)
-        self.box_data_json = [matchup for matchup in schedule]
-        box_data = [BoxScore(matchup, pro_schedule, positional_rankings, week) for matchup in schedule]
+        :param weeks: weeks for which to return box scores
+        :param lineup_weeks: weeks for which to retrieve box scores with team lineups
+        :return: tuple of ({week: list of box scores}, {week: raw matchup json} for the lineup weeks)
+        """
+        if self.year < 2019:
+            raise Exception("Can't use box score before 2019")
 
-        for team in self.teams:
-            for matchup in box_data:
-                if matchup.home_team == team.team_id:
-                    matchup.home_team = team
-                elif matchup.away_team == team.team_id:
-                    matchup.away_team = team
+        weeks = [int(week) for week in weeks]
+        lineup_weeks = [week for week in weeks if week in set(int(lineup_week) for lineup_week in lineup_weeks)]
+
+        # NFL pro team schedules are shared by all weeks and only retrieved once
+        self._get_pro_teams_json()
+
+        box_score_json_by_week = {}
+        if lineup_weeks:
+            max_workers = min(len(lineup_weeks), get_http_client().max_connections_per_host)
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="espn-box-scores") as executor:
+                box_score_results = list(executor.map(self._request_box_score_json, lineup_weeks))
+
+            # workers only return their results, and the league status is set here once all are done
+            for week, (status, box_data_json, positional_ratings) in zip(lineup_weeks, box_score_results):
+                self.status = status
+                box_score_json_by_week[week] = (box_data_json, positional_ratings)
+
+        schedule_json_by_week = {}
+        for matchup in self.schedule_json:
+            schedule_json_by_week.setdefault(matchup.get("matchupPeriodId"), []).append(matchup)
+
+        box_scores_by_week = {}
+        box_data_json_by_week = {}
+        for week in weeks:
+            if week in box_score_json_by_week:
+                box_data_json, positional_ratings = box_score_json_by_week.pop(week)
+                box_data_json_by_week[week] = box_data_json
+                box_scores_by_week[week] = self._get_box_scores(week, box_data_json, positional_ratings)
+            else:
+                box_scores_by_week[week] = self._get_box_scores(
+                    week, [self._get_schedule_box_data(matchup) for matchup in schedule_json_by_week.get(week, [])], {})
+        return box_scores_by_week, box_data_json_by_week
+
+    @staticmethod
+    def _get_schedule_box_data(matchup):
+        """Shape a league schedule matchup like a box score matchup (with its total points and an empty lineup)."""
+        box_data = dict(matchup)
+        for key in ["home", "away"]:
+            if key in box_data:
+                box_data[key] = dict(box_data[key], rosterForCurrentScoringPeriod={
+                    "appliedStatTotal": box_data[key].get("totalPoints", 0),
+                    "entries": []
+                })
         return box_data
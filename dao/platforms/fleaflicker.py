@@ -2,6 +2,7 @@ __author__ = "Wren J. R. (uberfastman)"
 __email__ = "wrenjr@yahoo.com"
 
 import datetime
+import hashlib
 import json
 import logging
 import os
@@ -11,12 +12,15 @@ from collections import defaultdict
 from copy import deepcopy
 from statistics import median
 
-import requests
 from bs4 import BeautifulSoup
 from requests.exceptions import HTTPError
 
 from dao.base import BaseLeague, BaseMatchup, BaseTeam, BaseRecord, BaseManager, BasePlayer, BaseStat
+from dao.index import index_by
 from report.logger import get_logger
+from utils.data_storage import get_data_storage
+from utils.http_client import get_http_client
+from utils.response_cache import get_week_cache_policy
 
 logger = get_logger(__name__)
 
@@ -120,7 +124,6 @@ class LeagueData(object):
 
         self.league_info = self.league_standings.get("league")
 
-        self.league_teams = {}
         self.ranked_league_teams = []
         self.num_divisions = 0
         self.divisions = {}
@@ -130,8 +133,8 @@ class LeagueData(object):
             for team in division.get("teams"):
                 team["division_id"] = division.get("id")
                 team["division_name"] = division.get("name")
-                self.league_teams[team.get("id")] = team
                 self.ranked_league_teams.append(team)
+        self.league_teams = index_by(self.ranked_league_teams, "id")
 
         self.ranked_league_teams = sorted(
             self.ranked_league_teams,
@@ -149,7 +152,8 @@ class LeagueData(object):
                 "&scoringPeriod=" + str(wk) +
                 ("&season=" + str(self.season) if self.season else ""),
                 os.path.join(self.data_dir, str(self.season), str(self.league_id), "week_" + str(wk)),
-                "week_" + str(wk) + "-scoreboard.json"
+                "week_" + str(wk) + "-scoreboard.json",
+                cache_policy=self.get_cache_policy(wk)
             )
 
             if int(wk) <= int(self.week_for_report):
@@ -187,78 +191,158 @@ class LeagueData(object):
                     ("&season=" + str(self.season) if self.season else "") +
                     ("&scoringPeriod=" + str(wk)),
                     os.path.join(self.data_dir, str(self.season), str(self.league_id), "week_" + str(wk), "rosters"),
-                    str(team.get("id")) + "-" + str(team.get("name")).replace(" ", "_") + "-roster.json"
+                    str(team.get("id")) + "-" + str(team.get("name")).replace(" ", "_") + "-roster.json",
+                    cache_policy=self.get_cache_policy(wk)
                 ) for team in self.ranked_league_teams
             }
 
         self.roster_positions = self.league_rules.get("rosterPositions")
 
         # TODO: how to get transactions for LAST YEAR from Fleaflicker API...?
-        self.league_activity = self.query(
-            "https://www.fleaflicker.com/api/FetchLeagueActivity?leagueId=" + str(self.league_id),
-            os.path.join(self.data_dir, str(self.season), str(self.league_id)),
-            str(self.league_id) + "-league-transactions.json"
-        )
+        self.league_activity = []
+        self.league_transactions_by_team = self.sync_league_activity()
 
-        self.league_transactions_by_team = defaultdict(dict)
-        for activity in self.league_activity.get("items"):
+    def get_cache_policy(self, week):
+        return get_week_cache_policy(week, self.current_week)
 
-            epoch_milli = float(activity.get("timeEpochMilli"))
-            timestamp = datetime.datetime.fromtimestamp(epoch_milli / 1000)
+    def sync_league_activity(self):
+        """Sync league transactions into the locally stored ledger of transactions, moves, and trades by team. Only
+        league activity newer than the high-water mark (the time of the newest activity already in the ledger) is
+        retrieved, paging back through the activity feed until it reaches activity that was previously processed.
 
-            season_start = datetime.datetime(int(self.season), 9, 1)
-            season_end = datetime.datetime(int(self.season) + 1, 3, 1)
+        :return: dict of transactions, moves, and trades by team id
+        """
+        ledger_path = os.path.join(self.data_dir, str(self.season), str(self.league_id),
+                                   str(self.league_id) + "-league-activity-ledger.json")
 
-            if season_start < timestamp < season_end:
-                if activity.get("transaction"):
-                    if activity.get("transaction").get("type"):
-                        transaction_type = activity.get("transaction").get("type")
-                    else:
-                        transaction_type = "TRANSACTION_ADD"
-
-                    is_move = False
-                    is_trade = False
-                    if "TRADE" in transaction_type:
-                        is_trade = True
-                    elif any(transaction_str in transaction_type for transaction_str in ["CLAIM", "ADD", "DROP"]):
-                        is_move = True
-
-                    if not self.league_transactions_by_team[str(activity.get("transaction").get("team").get("id"))]:
-                        self.league_transactions_by_team[str(activity.get("transaction").get("team").get("id"))] = {
-                            "transactions": [transaction_type],
-                            "moves": 1 if is_move else 0,
-                            "trades": 1 if is_trade else 0
-                        }
-                    else:
-                        self.league_transactions_by_team[str(activity.get("transaction").get("team").get("id"))][
-                            "transactions"].append(transaction_type)
-                        self.league_transactions_by_team[str(activity.get("transaction").get("team").get("id"))][
-                            "moves"] += 1 if is_move else 0
-                        self.league_transactions_by_team[str(activity.get("transaction").get("team").get("id"))][
-                            "trades"] += 1 if is_trade else 0
+        if get_data_storage().exists(ledger_path):
+            logger.debug("Loading Fleaflicker league activity ledger: {0}".format(ledger_path))
+            ledger = get_data_storage().load(ledger_path)
+        else:
+            ledger = {
+                "high_water_mark": 0,
+                "high_water_mark_items": [],
+                "transactions_by_team": {}
+            }
+
+        if not self.dev_offline:
+            self.league_activity = self.fetch_league_activity(
+                ledger.get("high_water_mark"), set(ledger.get("high_water_mark_items")))
+        elif not ledger.get("high_water_mark"):
+            # fall back to league activity saved before the ledger existed
+            self.league_activity = self.query(
+                "https://www.fleaflicker.com/api/FetchLeagueActivity?leagueId=" + str(self.league_id),
+                os.path.join(self.data_dir, str(self.season), str(self.league_id)),
+                str(self.league_id) + "-league-transactions.json"
+            ).get("items", [])
+
+        # merge new league activity into the ledger from oldest to newest
+        for activity in reversed(self.league_activity):
+            epoch_milli = int(activity.get("timeEpochMilli"))
+            if epoch_milli > ledger["high_water_mark"]:
+                ledger["high_water_mark"] = epoch_milli
+                ledger["high_water_mark_items"] = []
+            if epoch_milli == ledger["high_water_mark"]:
+                ledger["high_water_mark_items"].append(self.get_league_activity_key(activity))
+
+            self.add_league_activity(ledger["transactions_by_team"], activity, epoch_milli)
+
+        if self.league_activity and (not self.dev_offline or self.save_data):
+            logger.debug("Saving Fleaflicker league activity ledger: {0}".format(ledger_path))
+            get_data_storage().save(ledger_path, ledger)
+
+        return defaultdict(dict, ledger["transactions_by_team"])
+
+    def fetch_league_activity(self, high_water_mark, high_water_mark_items):
+        """Retrieve league activity newer than the high-water mark one page at a time (newest first), stopping at the
+        first previously processed activity or at activity from before the season.
+
+        :param high_water_mark: time in epoch milliseconds of the newest previously processed activity
+        :param high_water_mark_items: keys of the previously processed activity at the high-water mark
+        :return: list of new league activity (newest first)
+        """
+        season_start = int(datetime.datetime(int(self.season), 9, 1).timestamp() * 1000)
+
+        league_activity = []
+        result_offset = None
+        while True:
+            response_json = self.fetch(
+                "https://www.fleaflicker.com/api/FetchLeagueActivity?leagueId=" + str(self.league_id) +
+                ("&resultOffsetHint=" + str(result_offset) if result_offset else "")
+            )
 
-    def query(self, url, file_dir, filename):
+            for activity in response_json.get("items", []):
+                epoch_milli = int(activity.get("timeEpochMilli"))
+                if epoch_milli < high_water_mark or epoch_milli < season_start:
+                    return league_activity
+                if epoch_milli == high_water_mark and \
+                        self.get_league_activity_key(activity) in high_water_mark_items:
+                    continue
+                league_activity.append(activity)
 
-        file_path = os.path.join(file_dir, filename)
+            result_offset = response_json.get("resultOffsetNext")
+            if not response_json.get("items") or not result_offset:
+                return league_activity
 
-        if not self.dev_offline:
-            logger.debug("Retrieving Fleaflicker data from endpoint: {0}".format(url))
-            response = requests.get(url)
+    @staticmethod
+    def get_league_activity_key(activity):
+        return hashlib.sha1(json.dumps(activity, sort_keys=True).encode("utf-8")).hexdigest()
 
-            try:
-                response.raise_for_status()
-            except HTTPError as e:
-                # log error and terminate query if status code is not 200
-                logger.error("REQUEST FAILED WITH STATUS CODE: {0} - {1}".format(response.status_code, e))
-                sys.exit("...run aborted.")
+    def add_league_activity(self, transactions_by_team, activity, epoch_milli):
+
+        timestamp = datetime.datetime.fromtimestamp(epoch_milli / 1000)
 
-            response_json = response.json()
-            logger.debug("Response (JSON): {0}".format(response_json))
+        season_start = datetime.datetime(int(self.season), 9, 1)
+        season_end = datetime.datetime(int(self.season) + 1, 3, 1)
+
+        if season_start < timestamp < season_end and activity.get("transaction"):
+            if activity.get("transaction").get("type"):
+                transaction_type = activity.get("transaction").get("type")
+            else:
+                transaction_type = "TRANSACTION_ADD"
+
+            is_move = False
+            is_trade = False
+            if "TRADE" in transaction_type:
+                is_trade = True
+            elif any(transaction_str in transaction_type for transaction_str in ["CLAIM", "ADD", "DROP"]):
+                is_move = True
+
+            team_transactions = transactions_by_team.setdefault(
+                str(activity.get("transaction").get("team").get("id")), {
+                    "transactions": [],
+                    "moves": 0,
+                    "trades": 0
+                })
+            team_transactions["transactions"].append(transaction_type)
+            team_transactions["moves"] += 1 if is_move else 0
+            team_transactions["trades"] += 1 if is_trade else 0
+
+    def fetch(self, url, cache_policy=None):
+        logger.debug("Retrieving Fleaflicker data from endpoint: {0}".format(url))
+        response = get_http_client().get(url, cache_policy=cache_policy)
+
+        try:
+            response.raise_for_status()
+        except HTTPError as e:
+            # log error and terminate query if status code is not 200
+            logger.error("REQUEST FAILED WITH STATUS CODE: {0} - {1}".format(response.status_code, e))
+            sys.exit("...run aborted.")
+
+        response_json = response.json()
+        logger.debug("Response (JSON): {0}".format(response_json))
+        return response_json
+
+    def query(self, url, file_dir, filename, cache_policy=None):
+
+        file_path = os.path.join(file_dir, filename)
+
+        if not self.dev_offline:
+            response_json = self.fetch(url, cache_policy=cache_policy)
         else:
             try:
                 logger.debug("Loading saved Fleaflicker data for endpoint: {0}".format(url))
-                with open(file_path, "r", encoding="utf-8") as data_in:
-                    response_json = json.load(data_in)
+                response_json = get_data_storage().load(file_path)
             except FileNotFoundError:
                 logger.error(
                     "FILE {0} DOES NOT EXIST. CANNOT LOAD DATA LOCALLY WITHOUT HAVING PREVIOUSLY SAVED DATA!".format(
@@ -267,11 +351,7 @@ class LeagueData(object):
 
         if self.save_data:
             logger.debug("Saving Fleaflicker data retrieved from endpoint: {0}".format(url))
-            if not os.path.exists(file_dir):
-                os.makedirs(file_dir)
-
-            with open(file_path, "w", encoding="utf-8") as data_out:
-                json.dump(response_json, data_out, ensure_ascii=False, indent=2)
+            get_data_storage().save(file_path, response_json)
 
         return response_json
 
@@ -285,7 +365,7 @@ class LeagueData(object):
             user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) AppleWebKit/605.1.15 " \
                          "(KHTML, like Gecko) Version/13.0 Safari/605.1.15"
             headers = {"user-agent": user_agent}
-            response = requests.get(url, headers)
+            response = get_http_client().get(url, headers=headers)
 
             html_soup = BeautifulSoup(response.text, "html.parser")
             logger.debug("Response (HTML): {0}".format(html_soup))
@@ -413,7 +493,6 @@ class LeagueData(object):
                     base_team.points = float(matchup.get(key + "Score", {}).get("score", {}).get("value", 0))
                     base_team.projected_points = None
 
-                    # TODO: currently the fleaflicker API call only returns 1st PAGE of transactions... figure this out!
                     base_team.num_moves = str(
                         self.league_transactions_by_team[str(base_team.team_id)].get("moves", 0)) + "*"
                     base_team.num_trades = str(
@@ -505,7 +584,10 @@ class LeagueData(object):
                 # add matchup to league matchups by week
                 league.matchups_by_week[str(week)].append(base_matchup)
 
-        for week, rosters in self.rosters_by_week.items():
+        for week in list(self.rosters_by_week.keys()):
+            # release the raw data of each week as soon as it has been mapped to base objects
+            rosters = self.rosters_by_week.pop(week)
+            self.matchups_by_week.pop(week, None)
             league.players_by_week[str(week)] = {}
             for team_id, roster in rosters.items():
                 league_team = league.teams_by_week.get(str(week)).get(str(team_id))  # type: BaseTeam
@@ -601,6 +683,9 @@ class LeagueData(object):
                         # add player to league players by week
                         league.players_by_week[str(week)][base_player.player_id] = base_player
 
+        self.matchups_by_week = {}
+        self.league_activity = None
+
         league.current_standings = sorted(
             league.teams_by_week.get(str(self.week_for_report)).values(), key=lambda x: x.current_record.rank)
 
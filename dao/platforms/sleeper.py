@@ -5,18 +5,23 @@ import datetime
 import json
 import logging
 import os
+import sqlite3
 import sys
+import threading
 from collections import defaultdict, Counter
 from copy import deepcopy
 from datetime import datetime, timedelta
 from itertools import groupby
 from statistics import median
 
-import requests
 from requests.exceptions import HTTPError
 
 from dao.base import BaseLeague, BaseMatchup, BaseTeam, BaseRecord, BaseManager, BasePlayer, BaseStat
+from dao.index import index_by, rank_by
 from report.logger import get_logger
+from utils.data_storage import get_data_storage
+from utils.http_client import get_http_client
+from utils.response_cache import get_week_cache_policy
 
 logger = get_logger(__name__, propagate=False)
 
@@ -80,62 +85,7 @@ class LeagueData(object):
         self.has_median_matchup = bool(self.league_settings.get("league_average_match"))
         self.median_score_by_week = {}
 
-        self.player_data = self.query(
-            self.base_url + "players/nfl",
-            os.path.join(self.data_dir, str(self.season), str(self.league_id)),
-            str(self.league_id) + "-player_data.json",
-            check_for_saved_data=True,
-            refresh_days_delay=7
-        )
-
-        self.player_stats_data_by_week = {}
-        self.player_projected_stats_data_by_week = {}
-        for week_for_player_stats in range(1, int(self.num_regular_season_weeks) + 1):
-            if int(week_for_player_stats) <= int(self.week_for_report):
-
-                self.player_stats_data_by_week[str(week_for_player_stats)] = {
-                    player["player_id"]: player["stats"] for player in self.query(
-                        self.base_stat_url + "stats/nfl/" + str(season) + "/" + str(week_for_player_stats) +
-                            "?season_type=regular",
-                        os.path.join(self.data_dir, str(self.season), str(self.league_id), "week_" + str(
-                            week_for_player_stats)),
-                        "week_" + str(week_for_player_stats) + "-player_stats_by_week.json",
-                        check_for_saved_data=True,
-                        refresh_days_delay=1
-                    )
-                }
-
-            self.player_projected_stats_data_by_week[str(week_for_player_stats)] = {
-                player["player_id"]: player["stats"] for player in self.query(
-                    self.base_stat_url + "projections/nfl/" + str(season) + "/" + str(week_for_player_stats) +
-                        "?season_type=regular",
-                    os.path.join(self.data_dir, str(self.season), str(self.league_id), "week_" + str(
-                        week_for_player_stats)),
-                    "week_" + str(week_for_player_stats) + "-player_projected_stats_by_week.json",
-                    check_for_saved_data=True,
-                    refresh_days_delay=1
-                )
-            }
-
-        self.player_season_stats = {
-            player["player_id"]: player["stats"] for player in self.query(
-                self.base_stat_url + "stats/nfl/" + str(self.season) + "?season_type=regular",
-                os.path.join(self.data_dir, str(self.season), str(self.league_id)),
-                str(self.league_id) + "-player_season_stats.json",
-                check_for_saved_data=True,
-                refresh_days_delay=1
-            )
-        }
-
-        self.player_season_projected_stats = {
-            player["player_id"]: player["stats"] for player in self.query(
-                self.base_stat_url + "projections/nfl/" + str(self.season) + "?season_type=regular",
-                os.path.join(self.data_dir, str(self.season), str(self.league_id)),
-                str(self.league_id) + "-player_season_projected_stats.json",
-                check_for_saved_data=True,
-                refresh_days_delay=1
-            )
-        }
+        self.player_data = self.get_player_store(refresh_days_delay=7)
 
         # with open(os.path.join(
         #         self.data_dir, str(self.season), str(self.league_id), "player_stats_by_week.json"), "w") as out:
@@ -165,24 +115,56 @@ class LeagueData(object):
             reverse=True
         )
 
+        self.standings_by_roster_id = index_by(self.standings, lambda x: int(x.get("roster_id")))
+        self.standings_rank_by_roster_id = rank_by(self.standings, lambda x: int(x.get("roster_id")))
+
         for team in self.standings:
             team["owner"] = self.league_managers.get(team.get("owner_id"))
             team["co_owners"] = [self.league_managers.get(co_owner) for co_owner in team.get("co_owners")] if team.get(
                 "co_owners") else []
 
+        # the weekly stats and projections cover the entire NFL player pool, so each week is loaded right before its
+        # matchups are mapped and only the stats of players rostered in the league are kept in memory
+        self.player_stats_data_by_week = {}
+        self.player_projected_stats_data_by_week = {}
+        rostered_player_ids = set()
         self.matchups_by_week = {}
         for week_for_matchups in range(1, int(self.num_regular_season_weeks) + 1):
+            matchups_json = self.query(
+                self.base_url + "league/" + league_id + "/matchups/" + str(week_for_matchups),
+                os.path.join(self.data_dir, str(self.season), str(self.league_id), "week_" + str(week_for_matchups)),
+                "week_" + str(week_for_matchups) + "-matchups_by_week.json",
+                cache_policy=self.get_cache_policy(week_for_matchups)
+            )
+
+            if int(week_for_matchups) <= int(self.week_for_report):
+                week_player_ids = {str(player_id) for team in matchups_json for player_id in team.get("players") or []}
+                if "OAK" in week_player_ids:
+                    week_player_ids.add("LV")
+                rostered_player_ids.update(week_player_ids)
+
+                self.player_stats_data_by_week[str(week_for_matchups)] = self.get_player_stats(
+                    self.base_stat_url + "stats/nfl/" + str(season) + "/" + str(week_for_matchups) +
+                        "?season_type=regular",
+                    os.path.join(self.data_dir, str(self.season), str(self.league_id), "week_" + str(
+                        week_for_matchups)),
+                    "week_" + str(week_for_matchups) + "-player_stats_by_week.json",
+                    week_player_ids,
+                    cache_policy=self.get_cache_policy(week_for_matchups)
+                )
+                self.player_projected_stats_data_by_week[str(week_for_matchups)] = self.get_player_stats(
+                    self.base_stat_url + "projections/nfl/" + str(season) + "/" + str(week_for_matchups) +
+                        "?season_type=regular",
+                    os.path.join(self.data_dir, str(self.season), str(self.league_id), "week_" + str(
+                        week_for_matchups)),
+                    "week_" + str(week_for_matchups) + "-player_projected_stats_by_week.json",
+                    week_player_ids,
+                    cache_policy=self.get_cache_policy(week_for_matchups)
+                )
+
             self.matchups_by_week[str(week_for_matchups)] = [
                 self.map_player_data_to_matchup(list(group), week_for_matchups) for key, group in groupby(
-                    sorted(
-                        self.query(
-                            self.base_url + "league/" + league_id + "/matchups/" + str(week_for_matchups),
-                            os.path.join(
-                                self.data_dir, str(self.season), str(self.league_id), "week_" + str(week_for_matchups)),
-                            "week_" + str(week_for_matchups) + "-matchups_by_week.json"
-                        ),
-                        key=lambda x: x["matchup_id"]
-                    ),
+                    sorted(matchups_json, key=lambda x: x["matchup_id"]),
                     key=lambda x: x["matchup_id"]
                 )
             ]
@@ -217,6 +199,20 @@ class LeagueData(object):
                 else:
                     self.median_score_by_week[str(week_for_matchups)] = 0
 
+        self.player_season_stats = self.get_player_stats(
+            self.base_stat_url + "stats/nfl/" + str(self.season) + "?season_type=regular",
+            os.path.join(self.data_dir, str(self.season), str(self.league_id)),
+            str(self.league_id) + "-player_season_stats.json",
+            rostered_player_ids
+        )
+
+        self.player_season_projected_stats = self.get_player_stats(
+            self.base_stat_url + "projections/nfl/" + str(self.season) + "?season_type=regular",
+            os.path.join(self.data_dir, str(self.season), str(self.league_id)),
+            str(self.league_id) + "-player_season_projected_stats.json",
+            rostered_player_ids
+        )
+
         self.rosters_by_week = {}
         for week_for_rosters in range(1, int(self.week_for_report) + 1):
             team_rosters = {}
@@ -233,7 +229,8 @@ class LeagueData(object):
                 self.base_url + "league/" + league_id + "/transactions/" + str(week_for_transactions),
                 os.path.join(self.data_dir, str(self.season), str(self.league_id), "week_" + str(
                     week_for_transactions)),
-                "week_" + str(week_for_transactions) + "-transactions_by_week.json"
+                "week_" + str(week_for_transactions) + "-transactions_by_week.json",
+                cache_policy=self.get_cache_policy(week_for_transactions)
             )
 
             for transaction in weekly_transactions:
@@ -251,16 +248,52 @@ class LeagueData(object):
                                 self.league_transactions_by_week[str(week_for_transactions)][str(team_roster_id)][
                                     "trades"].append(transaction)
 
-    def query(self, url, file_dir, filename, check_for_saved_data=False, refresh_days_delay=1):
+    def get_cache_policy(self, week):
+        return get_week_cache_policy(week, self.current_week)
+
+    def get_player_stats(self, url, file_dir, filename, player_ids=None, cache_policy=None):
+        # keep only the stats of the given players (or all players if no player ids are given) from the player pool
+        return {
+            player["player_id"]: player["stats"] for player in self.query(
+                url,
+                file_dir,
+                filename,
+                check_for_saved_data=True,
+                refresh_days_delay=1,
+                cache_policy=cache_policy
+            ) if player_ids is None or player["player_id"] in player_ids
+        }
+
+    def get_player_store(self, refresh_days_delay=7):
+        # the full Sleeper players/nfl payload covers every NFL player, so it is only retrieved when the player store
+        # shared by all Sleeper leagues is older than refresh_days_delay, and is not kept in memory after the rebuild
+        player_store = PlayerStore(os.path.join(self.data_dir, "sleeper", "players.sqlite"))
+
+        if player_store.exists() and (self.dev_offline or not player_store.is_stale(refresh_days_delay)):
+            logger.debug("Using Sleeper player store {0}.".format(player_store.file_path))
+        else:
+            player_store.build(self.query(
+                self.base_url + "players/nfl",
+                os.path.join(self.data_dir, str(self.season), str(self.league_id)),
+                str(self.league_id) + "-player_data.json",
+                save=False
+            ))
+
+        return player_store
+
+    def query(self, url, file_dir, filename, check_for_saved_data=False, refresh_days_delay=1, cache_policy=None,
+              save=True):
 
         file_path = os.path.join(file_dir, filename)
+        data_storage = get_data_storage()
 
         run_query = True
         if check_for_saved_data:
-            if not os.path.exists(file_path):
+            saved_file_path = data_storage.find(file_path)
+            if not saved_file_path:
                 logger.debug("File {0} does not exist... attempting data retrieval.".format(filename))
             else:
-                file_modified_timestamp = datetime.fromtimestamp(os.path.getmtime(file_path))
+                file_modified_timestamp = datetime.fromtimestamp(os.path.getmtime(saved_file_path))
                 if file_modified_timestamp < (datetime.today() - timedelta(days=refresh_days_delay)):
                     if not self.dev_offline:
                         logger.debug("Data in {0} over {1} day{2} old... refreshing.".format(
@@ -271,13 +304,12 @@ class LeagueData(object):
                 else:
                     logger.debug("Data in {0} still recent... skipping refresh.".format(filename))
                     run_query = False
-                    with open(file_path, "r") as saved_data:
-                        response_json = json.load(saved_data)
+                    response_json = data_storage.load(saved_file_path)
 
         if not self.dev_offline:
             if run_query:
                 logger.debug("Retrieving Sleeper data from endpoint: {0}".format(url))
-                response = requests.get(url)
+                response = get_http_client().get(url, cache_policy=cache_policy)
 
                 try:
                     response.raise_for_status()
@@ -291,22 +323,17 @@ class LeagueData(object):
         else:
             try:
                 logger.debug("Loading saved Sleeper data for endpoint: {0}".format(url))
-                with open(file_path, "r", encoding="utf-8") as data_in:
-                    response_json = json.load(data_in)
+                response_json = data_storage.load(file_path)
             except FileNotFoundError:
                 logger.error(
                     "FILE {0} DOES NOT EXIST. CANNOT LOAD DATA LOCALLY WITHOUT HAVING PREVIOUSLY SAVED DATA!".format(
                         file_path))
                 sys.exit("...run aborted.")
 
-        if self.save_data or check_for_saved_data:
+        if save and (self.save_data or check_for_saved_data):
             if run_query:
                 logger.debug("Saving Sleeper data retrieved from endpoint: {0}".format(url))
-                if not os.path.exists(file_dir):
-                    os.makedirs(file_dir)
-
-                with open(file_path, "w", encoding="utf-8") as data_out:
-                    json.dump(response_json, data_out, ensure_ascii=False, indent=2)
+                data_storage.save(file_path, response_json)
 
         return response_json
 
@@ -314,20 +341,25 @@ class LeagueData(object):
         # handle the move of the Raiders from Oakland (OAK) to Las Vegas (LV) between the 2019 and 2020 seasons
         if player_id == "OAK":
             player_id = "LV"
-        player = deepcopy(self.player_data.get(str(player_id)))
+        player_record = self.player_data.get(str(player_id))
+        if not player_record:
+            return None
+
+        # shallow copy of the shared player record, since only top level roster entry keys are added or modified
+        player = dict(player_record)
         if int(week) <= int(self.week_for_report):
-            player["stats"] = deepcopy(self.player_stats_data_by_week.get(str(week)).get(str(player_id)))
-            player["projected"] = deepcopy(self.player_projected_stats_data_by_week[str(week)].get(str(player_id)))
+            player["stats"] = self.player_stats_data_by_week.get(str(week)).get(str(player_id))
+            player["projected"] = self.player_projected_stats_data_by_week[str(week)].get(str(player_id))
             player["starter"] = starter
         return player
 
     def map_player_data_to_matchup(self, matchup, week):
         for team in matchup:
-            for ranked_team in self.standings:
-                if ranked_team.get("roster_id") == team.get("roster_id"):
-                    team["info"] = {
-                        k: v for k, v in ranked_team.items() if k not in ["taxi", "starters", "reserve", "players"]
-                    }
+            ranked_team = self.standings_by_roster_id.get(int(team.get("roster_id")))
+            if ranked_team:
+                team["info"] = {
+                    k: v for k, v in ranked_team.items() if k not in ["taxi", "starters", "reserve", "players"]
+                }
 
             if team["starters"] and team["players"]:
                 team["roster"] = [
@@ -450,15 +482,10 @@ class LeagueData(object):
                     base_team.team_id = team.get("roster_id")
 
                     opposite_key = 1 if matchup.index(team) == 0 else 0
-                    team_standings_info = None
-                    opposite_team_standings_info = None
-                    team_rank = None
-                    for roster in self.standings:
-                        if int(roster.get("roster_id")) == int(base_team.team_id):
-                            team_standings_info = roster
-                            team_rank = int(self.standings.index(roster) + 1)
-                        elif int(roster.get("roster_id")) == int(matchup[opposite_key].get("roster_id")):
-                            opposite_team_standings_info = roster
+                    team_standings_info = self.standings_by_roster_id.get(int(base_team.team_id))
+                    team_rank = self.standings_rank_by_roster_id.get(int(base_team.team_id))
+                    opposite_team_standings_info = self.standings_by_roster_id.get(
+                        int(matchup[opposite_key].get("roster_id")))
 
                     team_division = None
                     if league.has_divisions:
@@ -591,8 +618,16 @@ class LeagueData(object):
                 # add matchup to league matchups by week
                 league.matchups_by_week[str(week)].append(base_matchup)
 
-        for week, rosters in self.rosters_by_week.items():
+        # season points of each player do not depend on the week, so they are only scored once per player
+        season_points_by_player = {}
+
+        for week in list(self.rosters_by_week.keys()):
+            # release the raw data of each week as soon as it has been mapped to base objects
+            rosters = self.rosters_by_week.pop(week)
+            self.matchups_by_week.pop(week, None)
             league.players_by_week[str(week)] = {}
+            self.player_stats_data_by_week.pop(str(week), None)
+            self.player_projected_stats_data_by_week.pop(str(week), None)
             team_count = 1
             for team_id, roster in rosters.items():
                 league_team = league.teams_by_week.get(str(week)).get(str(team_id))  # type: BaseTeam
@@ -643,12 +678,14 @@ class LeagueData(object):
                             projected_stats=player.get("projected")
                         )
 
-                        base_player.season_points, base_player.season_projected_points = self.get_player_points(
-                            stats=self.player_season_stats[str(base_player.player_id)]
-                                if str(base_player.player_id) in self.player_season_stats.keys() else [],
-                            projected_stats=self.player_season_projected_stats[str(base_player.player_id)]
-                                if str(base_player.player_id) in self.player_season_projected_stats.keys() else []
-                        )
+                        player_id = str(base_player.player_id)
+                        if player_id not in season_points_by_player:
+                            season_points_by_player[player_id] = self.get_player_points(
+                                stats=self.player_season_stats.get(player_id, []),
+                                projected_stats=self.player_season_projected_stats.get(player_id, [])
+                            )
+                        base_player.season_points, base_player.season_projected_points = \
+                            season_points_by_player[player_id]
 
                         base_player.position_type = "O" if base_player.display_position in self.offensive_positions \
                             else "D"
@@ -760,6 +797,11 @@ class LeagueData(object):
 
                 team_count += 1
 
+        self.matchups_by_week = {}
+        self.player_season_stats = {}
+        self.player_season_projected_stats = {}
+        self.player_data.close()
+
         league.current_standings = sorted(
             league.teams_by_week.get(str(self.week_for_report)).values(), key=lambda x: x.current_record.rank
         )
@@ -776,3 +818,72 @@ class LeagueData(object):
         )
 
         return league
+
+
+class PlayerStore(object):
+    """Indexed on-disk store of Sleeper player data (SQLite table keyed by player_id) built from the players/nfl payload
+    and shared by all Sleeper leagues. Players are loaded lazily on lookup and memoized for the run, so only the players
+    on league rosters are ever decoded.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._players = {}
+
+    def exists(self):
+        return os.path.isfile(self.file_path)
+
+    def is_stale(self, refresh_days_delay):
+        return datetime.fromtimestamp(os.path.getmtime(self.file_path)) < (
+                datetime.today() - timedelta(days=refresh_days_delay))
+
+    def build(self, player_data):
+        logger.debug("Building Sleeper player store {0} with {1} players.".format(self.file_path, len(player_data)))
+        file_dir = os.path.dirname(self.file_path)
+        if not os.path.exists(file_dir):
+            os.makedirs(file_dir)
+
+        # build into a temporary file and swap it in so concurrent runs never see a partially built store
+        tmp_file_path = self.file_path + ".{0}.tmp".format(os.getpid())
+        connection = sqlite3.connect(tmp_file_path)
+        connection.execute("CREATE TABLE players (player_id TEXT PRIMARY KEY, data TEXT)")
+        connection.executemany(
+            "INSERT INTO players VALUES (?, ?)",
+            ((str(player_id), json.dumps(player, ensure_ascii=False, separators=(",", ":")))
+             for player_id, player in player_data.items())
+        )
+        connection.commit()
+        connection.close()
+
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+            os.replace(tmp_file_path, self.file_path)
+            self._players = {}
+
+    def get(self, player_id, default=None):
+        player_id = str(player_id)
+        with self._lock:
+            if player_id not in self._players:
+                if not self._connection:
+                    self._connection = sqlite3.connect(self.file_path, check_same_thread=False)
+                row = self._connection.execute(
+                    "SELECT data FROM players WHERE player_id = ?", (player_id,)).fetchone()
+                self._players[player_id] = json.loads(row[0]) if row else None
+
+            player = self._players[player_id]
+        return player if player is not None else default
+
+    def __contains__(self, player_id):
+        return self.get(player_id) is not None
+
+    def close(self):
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+            self._players = {}
+
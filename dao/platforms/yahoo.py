@@ -13,7 +13,9 @@ from yfpy.models import Game, League, Matchup, Team, Manager, Player, RosterPosi
 from yfpy.query import YahooFantasySportsQuery
 
 from dao.base import BaseLeague, BaseMatchup, BaseTeam, BaseRecord, BaseManager, BasePlayer, BaseStat
+from dao.index import index_by
 from report.logger import get_logger
+from utils.http_client import get_http_client
 
 logger = get_logger(__name__)
 
@@ -21,6 +23,15 @@ logger = get_logger(__name__)
 logging.getLogger("yfpy.query").setLevel(level=logging.INFO)
 
 
+class HttpClientAuth(object):
+    """Stand-in for the Yahoo OAuth2 session used by yfpy queries that sends them through the shared HTTP client
+    instead (used when the HTTP client sends all requests to a local stand-in API server).
+    """
+
+    def __init__(self):
+        self.session = get_http_client()
+
+
 class LeagueData(object):
 
     def __init__(self,
@@ -45,10 +56,17 @@ class LeagueData(object):
 
         logger.debug("Retrieving Yahoo league data.")
         self.yahoo_data = Data(self.data_dir, save_data=save_data, dev_offline=dev_offline)
-        yahoo_auth_dir = os.path.join(base_dir, config.get("Yahoo", "yahoo_auth_dir"))
+        self.yahoo_auth_dir = os.path.join(base_dir, config.get("Yahoo", "yahoo_auth_dir"))
+        replay = get_http_client().replay_url and not dev_offline
         self.yahoo_query = YahooFantasySportsQuery(
-            yahoo_auth_dir, self.league_id, self.game_id, offline=dev_offline, browser_callback=False
+            self.yahoo_auth_dir, self.league_id, self.game_id, offline=dev_offline or replay, browser_callback=False
         )
+        if replay:
+            # skip Yahoo authentication and query the stand-in API server through the shared HTTP client
+            self.yahoo_query.offline = False
+            self.yahoo_query.oauth = HttpClientAuth()
+        elif not dev_offline and get_http_client().recorder:
+            self.yahoo_query.oauth.session.hooks["response"].append(get_http_client().recorder.record_hook)
 
         if self.game_id and self.game_id != "nfl":
             yahoo_fantasy_game = self.yahoo_data.retrieve(str(self.game_id) + "-game-metadata",
@@ -215,6 +233,23 @@ class LeagueData(object):
         #             if player_id not in self.player_season_stats.keys():
         #                 self.player_season_stats[player_id] = self.get_player_data(player_key=player_key)
 
+    def __getstate__(self):
+        # the mapped league references get_player_data, so only the settings needed to recreate the Yahoo query are
+        # pickled when the league is cached
+        return {
+            key: self.__dict__[key] for key in
+            ["league_id", "game_id", "data_dir", "season", "save_data", "dev_offline", "yahoo_auth_dir"]
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # cached leagues are only loaded in offline mode, so the recreated Yahoo query never needs to authenticate
+        self.dev_offline = True
+        self.yahoo_data = Data(self.data_dir, save_data=self.save_data, dev_offline=True)
+        self.yahoo_query = YahooFantasySportsQuery(
+            self.yahoo_auth_dir, self.league_id, self.game_id, offline=True, browser_callback=False
+        )
+
     def get_player_data(self, player_key, week=None):
         # YAHOO API QUERY: run query to retrieve stats for specific player for chosen week if supplied, else for season
         params = {"player_key": player_key}
@@ -298,6 +333,9 @@ class LeagueData(object):
             league.roster_positions.append(pos_name)
             league.roster_position_counts[pos_name] = pos_count
 
+        standings_by_team_id = index_by(
+            [ranked_team.get("team") for ranked_team in self.league_info.standings.teams], lambda x: int(x.team_id))
+
         league_median_records_by_team = {}
         for week, matchups in self.matchups_by_week.items():
             league.teams_by_week[str(week)] = {}
@@ -351,11 +389,7 @@ class LeagueData(object):
                         base_team.faab = int(y_team.faab_balance) if y_team.faab_balance else 0
                     base_team.url = y_team.url
 
-                    team_standings_info = Team({})
-                    for ranked_team in self.league_info.standings.teams:
-                        ranked_team = ranked_team.get("team")
-                        if int(ranked_team.team_id) == int(base_team.team_id):
-                            team_standings_info = ranked_team  # type: Team
+                    team_standings_info = standings_by_team_id.get(int(base_team.team_id), Team({}))  # type: Team
 
                     if team_standings_info.streak_type == "win":
                         streak_type = "W"
@@ -441,7 +475,10 @@ class LeagueData(object):
                 # add matchup to league matchups by week
                 league.matchups_by_week[str(week)].append(base_matchup)
 
-        for week, rosters in self.rosters_by_week.items():
+        for week in list(self.rosters_by_week.keys()):
+            # release the raw data of each week as soon as it has been mapped to base objects
+            rosters = self.rosters_by_week.pop(week)
+            self.matchups_by_week.pop(int(week), None)
             league.players_by_week[str(week)] = {}
             for team_id, roster in rosters.items():
                 league_team = league.teams_by_week.get(str(week)).get(str(team_id))  # type: BaseTeam
@@ -527,6 +564,10 @@ class LeagueData(object):
                     # add player to league players by week
                     league.players_by_week[str(week)][base_player.player_id] = base_player
 
+        # the league keeps a reference to get_player_data (and therefore to this object), so drop the raw yfpy data
+        self.matchups_by_week = {}
+        self.league_info = None
+
         league.current_standings = sorted(
             league.teams_by_week.get(str(self.week_for_report)).values(), key=lambda x: x.current_record.rank)
 
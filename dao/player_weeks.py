@@ -0,0 +1,230 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+from collections import OrderedDict
+
+import numpy as np
+
+from report.logger import get_logger
+
+logger = get_logger(__name__, propagate=False)
+
+# eligible positions are stored as bits of an unsigned 64-bit integer
+max_positions = 64
+
+
+class PlayerWeekTable(object):
+    """Columnar fact table of the mapped league with one row per rostered player per team per week, built once from
+    league.teams_by_week. Rows of each team week are contiguous (in roster order), so per team sums are reductions over
+    a slice, and season-long analytics are masked reductions over whole columns.
+
+    Columns (NumPy arrays of equal length):
+        week: week of the row
+        team_id: id of the team rostering the player (team_index holds its index in team_ids)
+        player_id: id of the player (player_index holds its index in player_ids)
+        slot: index in slots of the roster slot (selected position) of the player
+        is_bench: whether the slot is a bench slot
+        eligible: bitmask of the eligible positions of the player (bit i set for position positions[i])
+        points, projected_points, season_points: player points (NaN where missing)
+    """
+
+    def __init__(self, league):
+        logger.debug("Building player week table.")
+
+        self.bench_positions = list(league.bench_positions)
+        self.team_ids = []
+        self.player_ids = []
+        self.slots = []
+        self.positions = []
+        self.players = []  # BasePlayer of each row
+
+        team_indexes = {}
+        player_indexes = {}
+        slot_indexes = {}
+        position_bits = {}
+
+        weeks = []
+        team_index = []
+        player_index = []
+        slot = []
+        eligible = []
+        points = []
+        projected_points = []
+        season_points = []
+
+        # (week, team_id) -> slice of the rows of the team week
+        self.team_week_rows = {}
+        # (week, team_id) -> index of the team week in the per team week sums
+        self.team_week_index = {}
+
+        for week, teams in league.teams_by_week.items():
+            for team in teams.values():
+                team_id = team.team_id
+                if team_id not in team_indexes:
+                    team_indexes[team_id] = len(self.team_ids)
+                    self.team_ids.append(team_id)
+
+                start = len(self.players)
+                for player in team.roster:
+                    if player.player_id not in player_indexes:
+                        player_indexes[player.player_id] = len(self.player_ids)
+                        self.player_ids.append(player.player_id)
+                    if player.selected_position not in slot_indexes:
+                        slot_indexes[player.selected_position] = len(self.slots)
+                        self.slots.append(player.selected_position)
+
+                    player_eligible = 0
+                    for position in player.eligible_positions:
+                        if position not in position_bits:
+                            if len(self.positions) == max_positions:
+                                raise ValueError("Player week table supports at most {0} distinct positions.".format(
+                                    max_positions))
+                            position_bits[position] = 1 << len(self.positions)
+                            self.positions.append(position)
+                        player_eligible |= position_bits[position]
+
+                    weeks.append(int(week))
+                    team_index.append(team_indexes[team_id])
+                    player_index.append(player_indexes[player.player_id])
+                    slot.append(slot_indexes[player.selected_position])
+                    eligible.append(player_eligible)
+                    points.append(self.to_float(player.points))
+                    projected_points.append(self.to_float(player.projected_points))
+                    season_points.append(self.to_float(player.season_points))
+                    self.players.append(player)
+                self.team_week_index[(int(week), team_id)] = len(self.team_week_rows)
+                self.team_week_rows[(int(week), team_id)] = slice(start, len(self.players))
+
+        self.position_bits = position_bits
+
+        self.week = np.array(weeks, dtype=np.int16)
+        self.team_index = np.array(team_index, dtype=np.int32)
+        self.player_index = np.array(player_index, dtype=np.int32)
+        self.slot = np.array(slot, dtype=np.int16)
+        self.eligible = np.array(eligible, dtype=np.uint64)
+        self.points = np.array(points, dtype=np.float64)
+        self.projected_points = np.array(projected_points, dtype=np.float64)
+        self.season_points = np.array(season_points, dtype=np.float64)
+
+        self.team_id = np.empty(len(self.team_ids), dtype=object)
+        self.team_id[:] = self.team_ids
+        self.team_id = self.team_id[self.team_index]
+        self.player_id = np.empty(len(self.player_ids), dtype=object)
+        self.player_id[:] = self.player_ids
+        self.player_id = self.player_id[self.player_index]
+        self.is_bench = np.isin(self.slot, [
+            slot_index for slot_name, slot_index in slot_indexes.items() if slot_name in self.bench_positions])
+
+        # index of the team week of each row
+        self.team_week = np.repeat(
+            np.arange(len(self.team_week_rows), dtype=np.int32),
+            [rows.stop - rows.start for rows in self.team_week_rows.values()]
+        )
+        # (column, starters, position) -> points summed per team week
+        self.team_week_points = {}
+        # (column, starters, positions) -> points summed per team week and position
+        self.team_week_position_points = {}
+        # slot types -> slot bitmasks
+        self.slot_masks = {}
+
+    def __len__(self):
+        return len(self.players)
+
+    @staticmethod
+    def to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+
+    def get_position_bit(self, position):
+        return np.uint64(self.position_bits.get(position, 0))
+
+    def get_eligible_mask(self, positions):
+        """Return the bitmask of a list of positions (positions no rostered player is eligible for are left out)."""
+        mask = 0
+        for position in positions:
+            mask |= self.position_bits.get(position, 0)
+        return np.uint64(mask)
+
+    def get_slot_masks(self, slots):
+        """Precompute the bitmask of every roster slot type, so eligibility of a player for a slot is a bitwise AND of
+        the eligible positions bitmask of the player and the slot bitmask. Flex slot types have their own position bit,
+        since every platform lists the flex positions a player is eligible for, and bench slots have no bits.
+
+        :param slots: roster slot types (such as the keys of the league roster position counts)
+        :return: OrderedDict of slot bitmasks by slot type
+        """
+        key = tuple(slots)
+        if key not in self.slot_masks:
+            self.slot_masks[key] = OrderedDict(
+                (slot, np.uint64(0) if slot in self.bench_positions else self.get_position_bit(slot)) for slot in key)
+        return self.slot_masks[key]
+
+    def get_rows(self, week, team_id):
+        """Return the slice of the rows of a team week (empty if the team week is not in the table)."""
+        return self.team_week_rows.get((int(week), team_id), slice(0, 0))
+
+    def get_mask(self, week=None, team_id=None, starters=None, position=None):
+        """Select rows by week, team, starter (True) or bench (False) slot, and/or eligible position.
+
+        :return: boolean mask over all rows
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if week is not None:
+            mask &= self.week == int(week)
+        if team_id is not None:
+            mask &= self.team_id == team_id
+        if starters is not None:
+            mask &= ~self.is_bench if starters else self.is_bench
+        if position is not None:
+            mask &= (self.eligible & self.get_position_bit(position)) != 0
+        return mask
+
+    def get_team_week_points(self, starters=True, position=None, column="points"):
+        """Sum a points column over the starters (or bench) of every team week, optionally limited to an eligible
+        position, in a single masked reduction (rows are added in roster order, like summing each roster in turn).
+
+        :return: array of points indexed by team_week_index
+        """
+        key = (column, starters, position)
+        if key not in self.team_week_points:
+            mask = self.get_mask(starters=starters, position=position)
+            self.team_week_points[key] = np.bincount(
+                self.team_week, weights=np.where(mask, getattr(self, column), 0.0), minlength=len(self.team_week_rows))
+        return self.team_week_points[key]
+
+    def get_team_week_position_points(self, positions, starters=True, column="points"):
+        """Sum a points column over the starters (or bench) of every team week for each of several eligible positions at
+        once, grouping the rows of each team week (which are contiguous) in a single reduction of the row x position
+        matrix of eligible points.
+
+        :return: 2D array of points indexed by team_week_index and position index
+        """
+        key = (column, starters, tuple(positions))
+        if key not in self.team_week_position_points:
+            position_masks = np.array([self.get_position_bit(position) for position in positions], dtype=np.uint64)
+            row_mask = self.get_mask(starters=starters)
+            eligible_points = np.where(
+                row_mask[:, None] & ((self.eligible[:, None] & position_masks[None, :]) != 0),
+                getattr(self, column)[:, None],
+                0.0
+            )
+            starts = np.array([rows.start for rows in self.team_week_rows.values()], dtype=np.int64)
+            stops = np.array([rows.stop for rows in self.team_week_rows.values()], dtype=np.int64)
+            team_week_position_points = np.zeros((len(starts), len(positions)))
+            if len(self):
+                # reduceat returns the starting row (instead of 0) for empty team weeks, which are left out
+                not_empty = stops > starts
+                team_week_position_points[not_empty] = np.add.reduceat(
+                    eligible_points, starts[not_empty], axis=0)
+            self.team_week_position_points[key] = team_week_position_points
+        return self.team_week_position_points[key]
+
+    def get_team_points(self, week, team_id, starters=True, position=None, column="points"):
+        """Sum a points column over the starters (or bench) of a team week, optionally limited to an eligible position.
+        """
+        team_week_index = self.team_week_index.get((int(week), team_id))
+        if team_week_index is None:
+            return 0.0
+        return float(self.get_team_week_points(starters, position, column)[team_week_index])
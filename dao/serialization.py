@@ -0,0 +1,312 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import io
+from operator import attrgetter
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+# per-class serialization schemas, computed once per report object class
+_schemas = {}
+
+_missing = object()
+
+
+def get_schema(cls):
+    """Return the serialization schema of a report object class: its fields in serialization order, whether instances
+    also carry an instance dict, and the transient (run-time only) attributes left out of serialization.
+
+    :param cls: FantasyFootballReportObject subclass
+    :return: tuple of (fields, has_dict, transient_fields)
+    """
+    schema = _schemas.get(cls)
+    if schema is None:
+        transient_fields = frozenset(getattr(cls, "_transient_fields", ()))
+        schema = _schemas[cls] = (
+            tuple(field for field in cls._fields if field not in transient_fields),
+            any("__dict__" in klass.__dict__ for klass in cls.__mro__),
+            transient_fields
+        )
+    return schema
+
+
+def iter_attributes(obj):
+    """Yield the serialized attributes of a report object as (name, value) pairs, in the same order as its json."""
+    fields, has_dict, transient_fields = get_schema(type(obj))
+    for field in fields:
+        value = getattr(obj, field, _missing)
+        if value is not _missing:
+            yield field, value
+    if has_dict:
+        for field, value in obj.__dict__.items():
+            if field not in transient_fields:
+                yield field, value
+
+
+def encode_float(value):
+    if value != value:
+        return "NaN"
+    elif value == float("inf"):
+        return "Infinity"
+    elif value == -float("inf"):
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+def encode_key(key):
+    if isinstance(key, str):
+        return key
+    elif isinstance(key, float):
+        return encode_float(key)
+    elif key is True:
+        return "true"
+    elif key is False:
+        return "false"
+    elif key is None:
+        return "null"
+    elif isinstance(key, int):
+        return int.__repr__(key)
+    raise TypeError("keys must be str, int, float, bool or None, not {0}".format(key.__class__.__name__))
+
+
+class ReportObjectSerializer(object):
+    """Single pass json encoder for report objects (and any nested lists, dicts and values) that writes straight to a
+    stream. Its output matches json.dumps of the serialized objects (indented by default, or compact), but report
+    objects are read through their cached class schema instead of being converted to intermediate dicts first, and the
+    encoded key prefixes of each schema are built once per nesting level.
+    """
+
+    def __init__(self, compact=False, ensure_ascii=False):
+        self.compact = compact
+        self.encode_string = encode_basestring_ascii if ensure_ascii else encode_basestring
+        self.indent = "" if compact else "  "
+        self.item_separator = ","
+        self.key_separator = ":" if compact else ": "
+
+        # (class, level) -> encoding layout of report objects of the class at the nesting level
+        self.layouts = {}
+        # type -> kind of encoding for types without an exact match
+        self.kinds = {}
+
+    def dumps(self, obj):
+        stream = io.StringIO()
+        self.dump(obj, stream)
+        return stream.getvalue()
+
+    def dump(self, obj, stream):
+        self._make_encoder(stream.write)(obj, 0)
+
+    def get_newline(self, level):
+        return "" if self.compact else "\n" + self.indent * level
+
+    def get_layout(self, cls, level):
+        """Build the encoding layout of a report object class at a nesting level: a getter of all its field values, the
+        encoded key prefix of each field (as the first item and as any other item), and its instance dict handling.
+        """
+        layout = self.layouts.get((cls, level))
+        if layout is None:
+            fields, has_dict, transient_fields = get_schema(cls)
+            newline = self.get_newline(level + 1)
+            keys = [self.encode_string(field) + self.key_separator for field in fields]
+            if len(fields) > 1:
+                getter = attrgetter(*fields)
+            elif fields:
+                getter = lambda obj, field_getter=attrgetter(fields[0]): (field_getter(obj),)
+            else:
+                getter = lambda obj: ()
+            first_prefixes = ["{" + newline + key for key in keys]
+            prefixes = [self.item_separator + newline + key for key in keys]
+            layout = self.layouts[(cls, level)] = (
+                getter,
+                fields,
+                first_prefixes,
+                prefixes,
+                tuple(first_prefixes[:1] + prefixes[1:]),
+                has_dict,
+                transient_fields,
+                self.get_newline(level) + "}"
+            )
+        return layout
+
+    def get_kind(self, obj_type):
+        """Resolve (and remember) how to encode a type without an exact match, such as report objects, subclasses of
+        builtin types, and objects providing their own serialized() method.
+        """
+        kind = self.kinds.get(obj_type)
+        if kind is None:
+            if hasattr(obj_type, "_fields") and hasattr(obj_type, "clean_data_dict"):
+                kind = "object"
+            elif issubclass(obj_type, str):
+                kind = "str"
+            elif issubclass(obj_type, bool):
+                kind = "bool"
+            elif issubclass(obj_type, int):
+                kind = "int"
+            elif issubclass(obj_type, float):
+                kind = "float"
+            elif issubclass(obj_type, (list, tuple)):
+                kind = "list"
+            elif issubclass(obj_type, dict):
+                kind = "dict"
+            else:
+                kind = "other"
+            self.kinds[obj_type] = kind
+        return kind
+
+    def _make_encoder(self, write):
+        encode_string = self.encode_string
+        get_kind = self.get_kind
+        kinds = self.kinds
+        get_layout = self.get_layout
+        layouts = self.layouts
+        get_newline = self.get_newline
+        item_separator = self.item_separator
+        key_separator = self.key_separator
+        int_repr = int.__repr__
+        float_repr = float.__repr__
+        infinity = float("inf")
+
+        def encode_value(prefix, value, level):
+            """Write a value after its prefix (opening bracket, separator and/or key), in a single write for scalars."""
+            value_type = type(value)
+            if value_type is str:
+                write(prefix + encode_string(value))
+            elif value is None:
+                write(prefix + "null")
+            elif value is True:
+                write(prefix + "true")
+            elif value is False:
+                write(prefix + "false")
+            elif value_type is int:
+                write(prefix + int_repr(value))
+            elif value_type is float:
+                if value != value or value == infinity or value == -infinity:
+                    write(prefix + encode_float(value))
+                else:
+                    write(prefix + float_repr(value))
+            else:
+                write(prefix)
+                if value_type is list:
+                    encode_list(value, level)
+                elif value_type is dict:
+                    encode_items(value.items(), level)
+                else:
+                    encode_other(value, level)
+
+        def encode_items(items, level):
+            newline = get_newline(level + 1)
+            first = True
+            for key, value in items:
+                if first:
+                    encode_value("{" + newline + encode_string(encode_key(key)) + key_separator, value, level + 1)
+                    first = False
+                else:
+                    encode_value(
+                        item_separator + newline + encode_string(encode_key(key)) + key_separator, value, level + 1)
+            write("{}" if first else get_newline(level) + "}")
+
+        def encode_object(obj, level):
+            obj_type = type(obj)
+            layout = layouts.get((obj_type, level)) or get_layout(obj_type, level)
+            getter, fields, first_prefixes, prefixes, item_prefixes, has_dict, transient_fields, closing = layout
+
+            try:
+                values = getter(obj)
+            except AttributeError:
+                # fields left unset (such as the week of an overall record) are left out
+                values = [getattr(obj, field, _missing) for field in fields]
+                item_prefixes = [
+                    prefix for prefix, value in zip(prefixes, values) if value is not _missing]
+                item_prefixes[:1] = [
+                    first_prefix for first_prefix, value in zip(first_prefixes, values) if value is not _missing][:1]
+                values = [value for value in values if value is not _missing]
+
+            first = not values
+            value_level = level + 1
+            for prefix, value in zip(item_prefixes, values):
+                value_type = type(value)
+                if value_type is str:
+                    write(prefix + encode_string(value))
+                elif value is None:
+                    write(prefix + "null")
+                elif value_type is int:
+                    write(prefix + int_repr(value))
+                elif value is True:
+                    write(prefix + "true")
+                elif value is False:
+                    write(prefix + "false")
+                else:
+                    encode_value(prefix, value, value_level)
+
+            if has_dict:
+                items = ((key, value) for key, value in obj.__dict__.items() if key not in transient_fields)
+                if first:
+                    encode_items(items, level)
+                    return
+                newline = get_newline(value_level)
+                for key, value in items:
+                    encode_value(
+                        item_separator + newline + encode_string(encode_key(key)) + key_separator, value, value_level)
+            write("{}" if first else closing)
+
+        def encode_list(obj, level):
+            if not obj:
+                write("[]")
+                return
+            newline = get_newline(level + 1)
+            prefix = "[" + newline
+            separator = item_separator + newline
+            for value in obj:
+                encode_value(prefix, value, level + 1)
+                prefix = separator
+            write(get_newline(level) + "]")
+
+        def encode_other(obj, level):
+            obj_type = type(obj)
+            kind = kinds.get(obj_type) or get_kind(obj_type)
+            if kind == "object":
+                encode_object(obj, level)
+            elif kind == "list":
+                encode_list(obj, level)
+            elif kind == "dict":
+                encode_items(obj.items(), level)
+            elif kind == "str":
+                write(encode_string(obj))
+            elif kind == "bool":
+                write("true" if obj else "false")
+            elif kind == "int":
+                write(int_repr(obj))
+            elif kind == "float":
+                write(encode_float(obj))
+            else:
+                encode_value("", self.to_serializable_other(obj), level)
+
+        return lambda obj, level: encode_value("", obj, level)
+
+    @staticmethod
+    def to_serializable_other(obj):
+        if hasattr(obj, "serialized"):
+            return obj.serialized()
+        elif isinstance(obj, (bytes, bytearray)):
+            return str(obj, "utf-8")
+        raise TypeError("Object of type %s with value of %s is not JSON serializable" % (type(obj), repr(obj)))
+
+    def to_serializable(self, obj):
+        """Convert report objects (and any nested lists, dicts and values) to plain json serializable data."""
+        obj_type = type(obj)
+        if obj_type is str or obj_type is int or obj_type is float or obj_type is bool or obj is None:
+            return obj
+        elif obj_type is list:
+            return [self.to_serializable(value) for value in obj]
+        elif obj_type is dict:
+            return {key: self.to_serializable(value) for key, value in obj.items()}
+
+        kind = self.get_kind(obj_type)
+        if kind == "object":
+            return {key: self.to_serializable(value) for key, value in iter_attributes(obj)}
+        elif kind == "list":
+            return [self.to_serializable(value) for value in obj]
+        elif kind == "dict":
+            return {key: self.to_serializable(value) for key, value in obj.items()}
+        elif kind == "other":
+            return self.to_serializable(self.to_serializable_other(obj))
+        return obj
@@ -7,10 +7,16 @@ from collections import defaultdict
 
 from calculate.coaching_efficiency import CoachingEfficiency
 from calculate.metrics import CalculateMetrics
+from calculate.player_enrichment import PlayerEnrichment
 from calculate.points_by_position import PointsByPosition
+from calculate.ranking import MetricRow
+from calculate.running_stats import TeamScoreStats
+from calculate.schedule_luck import ScheduleLuck
 from calculate.season_averages import SeasonAverageCalculator
 from dao.base import BaseLeague, BaseTeam
-from utils.report_tools import league_data_factory, patch_http_connection_pool
+from utils.data_storage import get_data_storage
+from utils.http_client import get_http_client
+from utils.report_tools import league_data_factory
 from report.data import ReportData
 from report.logger import get_logger
 from report.pdf.generator import PdfGenerator
@@ -36,12 +42,12 @@ class FantasyFootballReport(object):
 
         logger.debug("Instantiating fantasy football report.")
 
-        patch_http_connection_pool(maxsize=100)
-
         # config vars
         self.config = config
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.data_dir = os.path.join(base_dir, self.config.get("Configuration", "data_dir"))
+        get_http_client().configure(self.config, self.data_dir)
+        get_data_storage().configure(self.config)
         if platform:
             self.platform = platform
             self.platform_str = str.capitalize(platform)
@@ -161,6 +167,10 @@ class FantasyFootballReport(object):
         else:
             self.covid_risk = None
 
+        # bad boy, beef, and COVID-19 risk fields of players, computed once per player for all weeks of the report
+        self.player_enrichment = PlayerEnrichment(
+            self.config, self.season, self.bad_boy_stats, self.beef_stats, self.covid_risk)
+
         # output league info for verification
         logger.info("...setup complete for \"{0}\" ({1}) week {2} report.\n".format(self.league.name.upper(),
                                                                                     self.league_id,
@@ -171,6 +181,7 @@ class FantasyFootballReport(object):
 
         report_data = None
 
+        week_for_report_ordered_team_ids = []
         week_for_report_ordered_team_names = []
         week_for_report_ordered_managers = []
 
@@ -185,7 +196,12 @@ class FantasyFootballReport(object):
         season_avg_points_by_position = defaultdict(list)
         season_weekly_top_scorers = []
         season_weekly_highest_ce = []
-        season_weekly_teams_results = []
+
+        # luck and records of every team for every week of the report, calculated for the whole season at once
+        season_luck = CalculateMetrics.calculate_season_luck(self.league.week_for_report, self.league)
+        season_records = CalculateMetrics.calculate_season_records(self.league.week_for_report, self.league)
+        # running score statistics of every team for z-scores, updated one week at a time
+        team_score_stats = TeamScoreStats.from_config(self.config)
 
         week_counter = 1
         while week_counter <= self.league.week_for_report:
@@ -194,32 +210,23 @@ class FantasyFootballReport(object):
             metrics_calculator = CalculateMetrics(self.config, self.league_id, self.league.num_playoff_slots,
                                                   self.playoff_prob_sims)
 
-            custom_weekly_matchups = self.league.get_custom_weekly_matchups(str(week_counter))
-
             report_data = ReportData(
                 config=self.config,
                 league=self.league,
-                season_weekly_teams_results=season_weekly_teams_results,
+                team_score_stats=team_score_stats,
                 week_counter=str(week_counter),
                 week_for_report=week_for_report,
                 season=self.season,
                 metrics_calculator=metrics_calculator,
                 metrics={
                     "coaching_efficiency": CoachingEfficiency(self.config, self.league),
-                    "luck": metrics_calculator.calculate_luck(
-                        week_counter,
-                        self.league,
-                        custom_weekly_matchups
-                    ),
-                    "records": metrics_calculator.calculate_records(
-                        week_counter,
-                        self.league,
-                        custom_weekly_matchups
-                    ),
+                    "luck": season_luck[str(week_counter)],
+                    "records": season_records[str(week_counter)],
                     "playoff_probs": self.playoff_probs,
                     "bad_boy_stats": self.bad_boy_stats,
                     "beef_stats": self.beef_stats,
-                    "covid_risk": self.covid_risk
+                    "covid_risk": self.covid_risk,
+                    "player_enrichment": self.player_enrichment
                 },
                 break_ties=self.break_ties,
                 dq_ce=self.dq_ce,
@@ -247,8 +254,7 @@ class FantasyFootballReport(object):
             }
             season_weekly_highest_ce.append(highest_ce)
 
-            season_weekly_teams_results.append(report_data.teams_results)
-
+            ordered_team_ids = []
             ordered_team_names = []
             ordered_team_managers = []
             weekly_points_data = []
@@ -259,15 +265,17 @@ class FantasyFootballReport(object):
             weekly_power_rank_data = []
 
             for team in report_data.data_for_teams:  # type: list
+                ordered_team_ids.append(team[0])
                 ordered_team_names.append(team[1])
                 ordered_team_managers.append(team[2])
                 weekly_points_data.append([int(week_counter), float(team[3])])
                 weekly_coaching_efficiency_data.append([int(week_counter), team[4]])
                 weekly_luck_data.append([int(week_counter), float(team[5])])
-                weekly_optimal_points_data.append([int(week_counter), team[1], float(team[6])])
+                weekly_optimal_points_data.append([int(week_counter), team[0], float(team[6])])
                 weekly_z_score_data.append([int(week_counter), team[7]])
                 weekly_power_rank_data.append([int(week_counter), team[8]])
 
+            week_for_report_ordered_team_ids = ordered_team_ids
             week_for_report_ordered_team_names = ordered_team_names
             week_for_report_ordered_managers = ordered_team_managers
 
@@ -301,13 +309,15 @@ class FantasyFootballReport(object):
 
             week_counter += 1
 
+        self.player_enrichment.log_hit_rate()
+
         report_data.data_for_season_avg_points_by_position = season_avg_points_by_position
         report_data.data_for_season_weekly_top_scorers = season_weekly_top_scorers
         report_data.data_for_season_weekly_highest_ce = season_weekly_highest_ce
 
         # calculate season average metrics and then add columns for them to their respective metric table data
-        season_average_calculator = SeasonAverageCalculator(week_for_report_ordered_team_names, report_data,
-                                                            self.break_ties)
+        season_average_calculator = SeasonAverageCalculator(
+            week_for_report_ordered_team_ids, week_for_report_ordered_team_names, report_data, self.break_ties)
 
         report_data.data_for_scores = season_average_calculator.get_average(
             time_series_points_data,
@@ -330,16 +340,23 @@ class FantasyFootballReport(object):
         )
 
         # add weekly record to luck data
-        for team_luck_data_entry in report_data.data_for_luck:
-            for team in self.league.teams_by_week[str(self.league.week_for_report)].values():  # type: BaseTeam
-                if team_luck_data_entry[1] == team.name:
-                    team_luck_data_entry.append(team.weekly_overall_record.get_record_str())
+        teams_by_id = {
+            team.team_id: team for team in self.league.teams_by_week[str(self.league.week_for_report)].values()
+        }  # type: dict
+        for team_luck_data_entry in report_data.data_for_luck:  # type: MetricRow
+            team = teams_by_id.get(team_luck_data_entry.team_id)  # type: BaseTeam
+            if team:
+                team_luck_data_entry.append(team.weekly_overall_record.get_record_str())
 
         # add season total optimal points to optimal points data
-        for team_optimal_points_data_entry in report_data.data_for_optimal_scores:
-            for team_name, season_total_optimal_points in season_total_optimal_points_data.items():
-                if team_optimal_points_data_entry[1] == team_name:
-                    team_optimal_points_data_entry.append("{:.2f}".format(round(season_total_optimal_points, 2)))
+        for team_optimal_points_data_entry in report_data.data_for_optimal_scores:  # type: MetricRow
+            season_total_optimal_points = season_total_optimal_points_data.get(team_optimal_points_data_entry.team_id)
+            if season_total_optimal_points is not None:
+                team_optimal_points_data_entry.append("{:.2f}".format(round(season_total_optimal_points, 2)))
+
+        # records of every team under the schedule of every team
+        report_data.schedule_luck = ScheduleLuck(self.league, self.league.week_for_report)
+        report_data.data_for_schedule_luck = report_data.schedule_luck.get_schedule_luck_data()
 
         report_data.data_for_power_rankings = season_average_calculator.get_average(
             time_series_power_rank_data,
@@ -408,6 +425,7 @@ class FantasyFootballReport(object):
         file_for_upload = pdf_generator.generate_pdf(filename_with_path, line_chart_data_list)
 
         logger.info("...SUCCESS! Generated PDF: {0}\n".format(file_for_upload))
+        get_http_client().log_summary()
         logger.debug(
             "\n\n\n"
             "\n~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * ~ * "
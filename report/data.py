@@ -1,10 +1,10 @@
 __author__ = "Wren J. R. (uberfastman)"
 __email__ = "wrenjr@yahoo.com"
 
-import itertools
-
 from calculate.metrics import CalculateMetrics
 from calculate.points_by_position import PointsByPosition
+from calculate.ranking import MetricRow, Ranking
+from calculate.running_stats import TeamScoreStats
 from dao.base import BaseLeague, BaseMatchup, BaseTeam
 from utils.report_tools import add_report_team_stats, get_player_game_time_statuses
 from report.logger import get_logger
@@ -14,7 +14,7 @@ logger = get_logger(__name__, propagate=False)
 
 class ReportData(object):
 
-    def __init__(self, config, league: BaseLeague, season_weekly_teams_results, week_counter, week_for_report,
+    def __init__(self, config, league: BaseLeague, team_score_stats: TeamScoreStats, week_counter, week_for_report,
                  season, metrics_calculator: CalculateMetrics, metrics, break_ties=False, dq_ce=False, testing=False):
         logger.debug("Instantiating report data.")
 
@@ -90,8 +90,8 @@ class ReportData(object):
                         matchup_teams.append(team.team_id)
                     remaining_matchups[int(week)].append(tuple(matchup_teams))
 
-        # calculate z-scores (dependent on all previous weeks scores)
-        z_score_results = metrics_calculator.calculate_z_scores(season_weekly_teams_results + [self.teams_results])
+        # calculate z-scores (dependent on all previous weeks scores, held in running statistics)
+        z_score_results = metrics_calculator.calculate_z_scores(self.teams_results, team_score_stats)
 
         # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~
         # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ REPORT DATA ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~
@@ -102,6 +102,8 @@ class ReportData(object):
         self.data_for_season_avg_points_by_position = None
         self.data_for_season_weekly_top_scorers = None
         self.data_for_season_weekly_highest_ce = None
+        self.schedule_luck = None
+        self.data_for_schedule_luck = None
 
         # current standings data
         self.data_for_current_standings = metrics_calculator.get_standings_data(league)
@@ -142,7 +144,7 @@ class ReportData(object):
             create_z_score_data = True
 
         if create_z_score_data:
-            for k_v in sorted(z_score_results.items(), key=lambda x: x[1], reverse=True):
+            for k_v in Ranking(list(z_score_results.values())).get_ranked(z_score_results.items()):
                 z_score = k_v[1]
                 if z_score:
                     z_score = round(float(z_score), 2)
@@ -150,14 +152,15 @@ class ReportData(object):
                     z_score = "N/A"
 
                 team = self.teams_results[k_v[0]]
-                self.data_for_z_scores.append(
+                self.data_for_z_scores.append(MetricRow(
+                    k_v[0],
                     [
                         z_score_rank,
                         team.name,
                         team.manager_str,
                         z_score
                     ]
-                )
+                ))
                 z_score_rank += 1
 
         # points by position data
@@ -182,34 +185,33 @@ class ReportData(object):
 
         # scores data
         self.data_for_scores = metrics_calculator.get_score_data(
-            sorted(self.teams_results.values(), key=lambda x: float(x.points), reverse=True))
+            self.rank_teams(lambda x: float(x.points)))
 
         # coaching efficiency data
         self.data_for_coaching_efficiency = metrics_calculator.get_coaching_efficiency_data(
-            sorted(self.teams_results.values(), key=lambda x: float(
-                x.coaching_efficiency) if x.coaching_efficiency != "DQ" else 0, reverse=True))
+            self.rank_teams(lambda x: float(x.coaching_efficiency) if x.coaching_efficiency != "DQ" else 0))
         self.num_coaching_efficiency_dqs = metrics_calculator.coaching_efficiency_dq_count
         self.coaching_efficiency_dqs.update(metrics.get("coaching_efficiency").coaching_efficiency_dqs)
 
         # luck data
         self.data_for_luck = metrics_calculator.get_luck_data(
-            sorted(self.teams_results.values(), key=lambda x: float(x.luck), reverse=True))
+            self.rank_teams(lambda x: float(x.luck)))
 
         # optimal score data
         self.data_for_optimal_scores = metrics_calculator.get_optimal_score_data(
-            sorted(self.teams_results.values(), key=lambda x: float(x.optimal_points), reverse=True))
+            self.rank_teams(lambda x: float(x.optimal_points)))
 
         # bad boy data
         self.data_for_bad_boy_rankings = metrics_calculator.get_bad_boy_data(
-            sorted(self.teams_results.values(), key=lambda x: x.bad_boy_points, reverse=True))
+            self.rank_teams(lambda x: x.bad_boy_points))
 
         # beef rank data
         self.data_for_beef_rankings = metrics_calculator.get_beef_rank_data(
-            sorted(self.teams_results.values(), key=lambda x: x.tabbu, reverse=True))
+            self.rank_teams(lambda x: x.tabbu))
 
         # covid risk data
         self.data_for_covid_risk_rankings = metrics_calculator.get_covid_risk_rank_data(
-            sorted(self.teams_results.values(), key=lambda x: str(x.name).lower(), reverse=True))
+            self.rank_teams(lambda x: str(x.name).lower()))
 
         # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~
         # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ COUNT METRIC TIES ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~
@@ -218,47 +220,44 @@ class ReportData(object):
 
         # get number of scores ties and ties for first
         self.ties_for_scores = metrics_calculator.get_ties_count(self.data_for_scores, "score", self.break_ties)
-        self.num_first_place_for_score_before_resolution = len(
-            [list(group) for key, group in itertools.groupby(self.data_for_scores, lambda x: x[3])][0])
+        self.num_first_place_for_score_before_resolution = metrics_calculator.get_num_first_place(
+            self.data_for_scores, 3)
 
         # reorder score data based on bench points if there are ties and break_ties = True
         if self.ties_for_scores > 0:
             self.data_for_scores = metrics_calculator.resolve_score_ties(self.data_for_scores, self.break_ties)
             metrics_calculator.get_ties_count(self.data_for_scores, "score", self.break_ties)
-        self.num_first_place_for_score = len(
-            [list(group) for key, group in itertools.groupby(self.data_for_scores, lambda x: x[3])][0])
+        self.num_first_place_for_score = metrics_calculator.get_num_first_place(self.data_for_scores, 3)
 
         # get number of coaching efficiency ties and ties for first
         self.ties_for_coaching_efficiency = metrics_calculator.get_ties_count(self.data_for_coaching_efficiency,
                                                                               "coaching_efficiency", self.break_ties)
-        self.num_first_place_for_coaching_efficiency_before_resolution = len(
-            [list(group) for key, group in itertools.groupby(self.data_for_coaching_efficiency, lambda x: x[0])][0])
+        self.num_first_place_for_coaching_efficiency_before_resolution = metrics_calculator.get_num_first_place(
+            self.data_for_coaching_efficiency, 0)
 
         if self.ties_for_coaching_efficiency > 0:
             self.data_for_coaching_efficiency = metrics_calculator.resolve_coaching_efficiency_ties(
                 self.data_for_coaching_efficiency, self.ties_for_coaching_efficiency, league, self.teams_results,
                 week_counter, week_for_report, self.break_ties)
-        self.num_first_place_for_coaching_efficiency = len(
-            [list(group) for key, group in itertools.groupby(self.data_for_coaching_efficiency, lambda x: x[0])][0])
+        self.num_first_place_for_coaching_efficiency = metrics_calculator.get_num_first_place(
+            self.data_for_coaching_efficiency, 0)
 
         # get number of luck ties and ties for first
         self.ties_for_luck = metrics_calculator.get_ties_count(self.data_for_luck, "luck", self.break_ties)
-        self.num_first_place_for_luck = len(
-            [list(group) for key, group in itertools.groupby(self.data_for_luck, lambda x: x[3])][0])
+        self.num_first_place_for_luck = metrics_calculator.get_num_first_place(self.data_for_luck, 3)
 
         # get number of bad boy rankings ties and ties for first
         self.ties_for_bad_boy_rankings = metrics_calculator.get_ties_count(self.data_for_bad_boy_rankings, "bad_boy",
                                                                            self.break_ties)
-        self.num_first_place_for_bad_boy_rankings = len(
-            [list(group) for key, group in itertools.groupby(self.data_for_bad_boy_rankings, lambda x: x[3])][0])
+        self.num_first_place_for_bad_boy_rankings = metrics_calculator.get_num_first_place(
+            self.data_for_bad_boy_rankings, 3)
         # filter out teams that have no bad boys in their starting lineup
         self.data_for_bad_boy_rankings = [result for result in self.data_for_bad_boy_rankings if int(result[5]) != 0]
 
         # get number of beef rankings ties and ties for first
         self.ties_for_beef_rankings = metrics_calculator.get_ties_count(self.data_for_beef_rankings, "beef",
                                                                         self.break_ties)
-        self.num_first_place_for_beef_rankings = len(
-            [list(group) for key, group in itertools.groupby(self.data_for_beef_rankings, lambda x: x[3])][0])
+        self.num_first_place_for_beef_rankings = metrics_calculator.get_num_first_place(self.data_for_beef_rankings, 3)
 
         # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~
         # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ CALCULATE POWER RANKING ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~
@@ -275,23 +274,23 @@ class ReportData(object):
 
         # update data_for_teams with power rankings
         for team in self.data_for_teams:
-            for team_id in power_ranking_results.keys():
-                if team[0] == team_id:
-                    team.append(power_ranking_results[team_id]["power_ranking"])
+            if team[0] in power_ranking_results:
+                team.append(power_ranking_results[team[0]]["power_ranking"])
 
         # power rankings data
         self.data_for_power_rankings = []
-        for k_v in sorted(power_ranking_results.items(), key=lambda x: x[1]["power_ranking"]):
+        for k_v in Ranking(
+                [team_rankings["power_ranking"] for team_rankings in power_ranking_results.values()],
+                reverse=False).get_ranked(power_ranking_results.items()):
             # season avg calc does something where it _keys off the second value in the array
-            self.data_for_power_rankings.append(
-                [k_v[1]["power_ranking"], power_ranking_results[k_v[0]]["name"], k_v[1]["manager_str"]]
-            )
+            self.data_for_power_rankings.append(MetricRow(
+                k_v[0], [k_v[1]["power_ranking"], power_ranking_results[k_v[0]]["name"], k_v[1]["manager_str"]]
+            ))
 
         # get number of power rankings ties and ties for first
         self.ties_for_power_rankings = metrics_calculator.get_ties_count(self.data_for_power_rankings, "power_ranking",
                                                                          self.break_ties)
-        self.ties_for_first_for_power_rankings = len(
-            [list(group) for key, group in itertools.groupby(self.data_for_power_rankings, lambda x: x[0])][0])
+        self.ties_for_first_for_power_rankings = metrics_calculator.get_num_first_place(self.data_for_power_rankings, 0)
 
         # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~
         # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ LOGGER OUTPUT ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~
@@ -323,3 +322,8 @@ class ReportData(object):
 
         # output weekly metrics info
         logger.info(weekly_metrics_output_string)
+
+    def rank_teams(self, key):
+        """Return the team results of the week ranked by a metric (highest first, keeping the current order of ties)."""
+        teams = list(self.teams_results.values())
+        return Ranking([key(team) for team in teams]).get_ranked(teams)
@@ -5,9 +5,7 @@ import json
 import logging
 import os
 import sys
-import urllib.request
 from copy import deepcopy
-from urllib.error import URLError
 
 from PIL import Image
 from PIL import ImageFile
@@ -26,6 +24,7 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.platypus import Spacer
 from reportlab.platypus.flowables import Image as ReportLabImage
 from reportlab.platypus.flowables import KeepTogether
+from requests.exceptions import RequestException
 
 from dao.base import BaseLeague, BaseTeam, BasePlayer
 from report.data import ReportData
@@ -35,6 +34,7 @@ from report.pdf.charts.line import LineChartGenerator
 from report.pdf.charts.pie import BreakdownPieDrawing
 from resources.documentation import descriptions
 from utils.app_config_parser import AppConfigParser
+from utils.http_client import get_http_client
 
 logger = get_logger(__name__, propagate=False)
 
@@ -58,8 +58,8 @@ def get_player_image(url, data_dir, week, image_quality, width=1.0*inch, player_
                 if not dev_offline:
                     logger.debug("Retrieving player headshot for \"{0}\"".format(player_name))
                     try:
-                        urllib.request.urlretrieve(url, local_img_path)
-                    except URLError:
+                        get_http_client().download(url, local_img_path, memoize=True)
+                    except RequestException:
                         logger.error("Unable to retrieve player headshot{0} at url {1}".format(
                             (" for player " + player_name) if player_name else "", url))
                         local_img_path = os.path.join("resources", "images", "photo-not-available.jpg")
@@ -144,6 +144,7 @@ class PdfGenerator(object):
         self.break_ties = report_data.break_ties
         self.playoff_prob_sims = playoff_prob_sims
         self.num_coaching_efficiency_dqs = report_data.num_coaching_efficiency_dqs
+        self.num_schedules = len(report_data.data_for_schedule_luck or [])
 
         # table column widths
         # .........................Place/Rank..Team.......Manager....Col 4.....
@@ -185,6 +186,9 @@ class PdfGenerator(object):
         # .........................Team.......Manager....Record.....Pts For....Pts Agnst....Finish Positions..............................................
         self.widths_n_cols_no_1 = [1.55*inch, 1.00*inch, 0.95*inch, 0.65*inch, 0.65*inch] + [round(3.4 / self.playoff_slots, 2)*inch] * self.playoff_slots  # 8.20
 
+        # .........................Place.......Team.......Schedules............................................................Luck.......
+        self.widths_n_cols_no_2 = [0.45*inch, 1.80*inch] + [round(4.75 / max(self.num_schedules, 1), 2)*inch] * self.num_schedules + [0.75*inch]  # 7.75
+
         self.line_separator = Drawing(100, 1)
         self.line_separator.add(Line(0, -65, 550, -65, strokeColor=colors.black, strokeWidth=1))
         self.spacer_twentieth_inch = Spacer(1, 0.05*inch)
@@ -404,6 +408,9 @@ class PdfGenerator(object):
         self.scores_headers = [["Place", "Team", "Manager", "Points", "Season Avg. (Place)"]]
         self.efficiency_headers = [["Place", "Team", "Manager", "Coaching Efficiency (%)", "Season Avg. (Place)"]]
         self.luck_headers = [["Place", "Team", "Manager", "Luck", "Season Avg. (Place)", "Weekly Record (W-L)"]]
+        self.schedule_luck_headers = [
+            ["Place", "Team"] + [str(place) for place in range(1, self.num_schedules + 1)] + ["Luck (W)"]
+        ]
         self.optimal_scores_headers = [["Place", "Team", "Manager", "Optimal Points", "Season Total"]]
         self.bad_boy_headers = [["Place", "Team", "Manager", "Bad Boy Pts", "Worst Offense", "# Offenders"]]
         self.beef_headers = [["Place", "Team", "Manager", "TABBU(s)"]]
@@ -484,6 +491,7 @@ class PdfGenerator(object):
         self.data_for_scores = report_data.data_for_scores
         self.data_for_coaching_efficiency = report_data.data_for_coaching_efficiency
         self.data_for_luck = report_data.data_for_luck
+        self.data_for_schedule_luck = report_data.data_for_schedule_luck
         self.data_for_optimal_scores = report_data.data_for_optimal_scores
         self.data_for_power_rankings = report_data.data_for_power_rankings
         self.data_for_z_scores = report_data.data_for_z_scores
@@ -510,6 +518,7 @@ class PdfGenerator(object):
                                                              "bad_boy")
         self.style_tied_beef = self.set_tied_values_style(self.report_data.ties_for_beef_rankings,
                                                           style_left_alight_right_col_list, "beef")
+        self.style_schedule_luck = self.set_schedule_luck_style(self.report_data.schedule_luck, table_style_list)
 
         # table of contents
         self.toc = TableOfContents(self.font, self.font_size, self.config, self.break_ties)
@@ -604,6 +613,39 @@ class PdfGenerator(object):
 
         return TableStyle(tied_values_table_style_list)
 
+    def set_schedule_luck_style(self, schedule_luck, table_style_list):
+        """Create the heat map style of the schedule luck table, with the record of each team under each schedule
+        colored from red (losing record) through white to green (winning record), and the actual schedule of each team
+        outlined in bold.
+        """
+        schedule_luck_table_style_list = deepcopy(table_style_list[4:])
+        schedule_luck_table_style_list.extend([
+            ("FONT", (0, 0), (-1, -1), self.font),
+            ("FONT", (0, 0), (-1, 0), self.font_bold),
+            # shrink font to fit the records of larger leagues
+            ("FONTSIZE", (0, 0), (-1, -1), max(self.font_size - 2 - self.num_schedules // 4, 6))
+        ])
+
+        if schedule_luck is not None:
+            losing_color = colors.Color(0.95, 0.45, 0.45)
+            winning_color = colors.Color(0.45, 0.80, 0.45)
+            for team_index, win_percentages in enumerate(schedule_luck.win_percentages):
+                for schedule_index, win_percentage in enumerate(win_percentages):
+                    if win_percentage < 0.5:
+                        color = colors.linearlyInterpolatedColor(losing_color, colors.white, 0.0, 0.5, win_percentage)
+                    else:
+                        color = colors.linearlyInterpolatedColor(colors.white, winning_color, 0.5, 1.0, win_percentage)
+                    cell = (schedule_index + 2, team_index + 1)
+                    schedule_luck_table_style_list.append(("BACKGROUND", cell, cell, color))
+
+                actual_schedule_cell = (team_index + 2, team_index + 1)
+                schedule_luck_table_style_list.extend([
+                    ("FONT", actual_schedule_cell, actual_schedule_cell, self.font_bold),
+                    ("BOX", actual_schedule_cell, actual_schedule_cell, 1.5, colors.black)
+                ])
+
+        return TableStyle(schedule_luck_table_style_list)
+
     def create_section(self, title_text, headers, data, table_style, table_style_ties, col_widths,
                        subtitle_text=None, subsubtitle_text=None, header_text=None, footer_text=None, row_heights=None,
                        tied_metric=False, metric_type=None, section_title_function=None):
@@ -1421,6 +1463,20 @@ class PdfGenerator(object):
                                                                                            "league_luck_rankings"):
             elements.append(self.add_page_break())
 
+        if self.config.getboolean("Report", "league_schedule_luck", fallback=True) and self.data_for_schedule_luck:
+            # schedule luck
+            elements.append(self.create_section(
+                "Team Schedule Luck",
+                self.schedule_luck_headers,
+                self.data_for_schedule_luck,
+                self.style_schedule_luck,
+                self.style_schedule_luck,
+                self.widths_n_cols_no_2,
+                subtitle_text="Regular season record of each team (row) playing the schedule of each team (column).",
+                metric_type="schedule_luck"
+            ))
+            elements.append(self.add_page_break())
+
         if self.config.getboolean("Report", "league_optimal_score_rankings"):
             # optimal scores
             elements.append(self.create_section(
@@ -1652,6 +1708,7 @@ class TableOfContents(object):
                 "Report", "league_score_rankings") or self.config.getboolean(
                 "Report", "league_coaching_efficiency_rankings") or self.config.getboolean(
                 "Report", "league_luck_rankings") or self.config.getboolean(
+                "Report", "league_schedule_luck", fallback=True) or self.config.getboolean(
                 "Report", "league_optimal_score_rankings") or self.config.getboolean(
                 "Report", "league_bad_boy_rankings") or self.config.getboolean(
                 "Report", "league_beef_rankings"):
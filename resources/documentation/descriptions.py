@@ -60,6 +60,14 @@ team_luck_rankings = "Luck is calculated by matching up each team against every
                      "lost to all but one team this week (second lowest score) but won played the only other team " \
                      "that they could have beaten."
 
+team_schedule_luck = "Schedule luck shows the regular season record each team (row) would have had playing the " \
+                     "schedule of every team (column), where a team that would play itself on another team's " \
+                     "schedule plays that team instead. Records are decided by comparing weekly scores, and cells " \
+                     "range from red (losing records) to green (winning records), with each team's actual schedule " \
+                     "on the diagonal. The final column shows how many more wins (counting ties as half wins) each " \
+                     "team has on its actual schedule than on average across all schedules, so positive values " \
+                     "mean a team was \"lucky\" with its schedule, and negative values mean it was \"unlucky\"."
+
 team_optimal_score_rankings = "Teams ranked by highest optimal score."
 
 bad_boy_rankings = "The Bad Boy ranking is a \"just-for-fun\" metric that pulls NFL player arrest history from the " \
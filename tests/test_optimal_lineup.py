@@ -0,0 +1,107 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import os
+import sys
+
+import numpy as np
+
+module_dir = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(module_dir)
+
+from calculate.coaching_efficiency import CoachingEfficiency
+from calculate.optimal_lineup import solve_lineups
+from dao.base import BaseLeague, BasePlayer, BaseTeam
+from utils.app_config_parser import AppConfigParser
+
+
+def get_player(player_id, points, selected_position, eligible_positions):
+    player = BasePlayer()
+    player.player_id = player_id
+    player.full_name = player_id
+    player.points = points
+    player.selected_position = selected_position
+    player.eligible_positions = eligible_positions
+    return player
+
+
+def get_team(team_id, roster):
+    team = BaseTeam()
+    team.week = 1
+    team.team_id = team_id
+    team.name = team_id
+    team.roster = roster
+    return team
+
+
+def get_overlapping_flex_league():
+    """League with one FLEX_RB_WR and one FLEX_TE_WR slot, where team "1" rosters a 20 point WR and a 5 point RB (and a
+    kicker no active slot is open to), and team "2" only rosters the RB.
+    """
+    league = BaseLeague(1, "test", None, module_dir, save_data=False)
+    league.bench_positions = ["BN"]
+    league.roster_position_counts.update({"FLEX_RB_WR": 1, "FLEX_TE_WR": 1, "BN": 2})
+    league.active_positions = ["FLEX_RB_WR", "FLEX_TE_WR"]
+    league.flex_positions_rb_wr = ["RB", "WR"]
+    league.flex_positions_te_wr = ["TE", "WR"]
+
+    wide_receiver = get_player("wr", 20.0, "FLEX_RB_WR", ["WR", "FLEX_RB_WR", "FLEX_TE_WR"])
+    running_back = get_player("rb", 5.0, "BN", ["RB", "FLEX_RB_WR"])
+    kicker = get_player("k", 9.0, "BN", ["K"])
+    league.teams_by_week["1"] = {
+        "1": get_team("1", [wide_receiver, running_back, kicker]),
+        "2": get_team("2", [get_player("rb", 5.0, "FLEX_RB_WR", ["RB", "FLEX_RB_WR"])])
+    }
+    return league
+
+
+def test_solve_lineups_overlapping_flex():
+    # slots: FLEX_RB_WR, FLEX_TE_WR
+    # players: WR 20 points, RB 5 points
+    points = np.array([[20.0, 5.0]])
+    eligibility = np.array([[
+        [True, True],
+        [True, False]
+    ]])
+
+    assignments = solve_lineups(points, eligibility)
+
+    # the WR goes in FLEX_TE_WR so the RB can fill FLEX_RB_WR
+    assert assignments.tolist() == [[1, 0]]
+    assert points[0, assignments[0]].sum() == 25.0
+
+
+def test_solve_lineups_empty_slot():
+    # slots: QB, K
+    # players: QB 18 points, QB 12 points, RB 9 points (no K)
+    points = np.array([[18.0, 12.0, 9.0]])
+    eligibility = np.array([[
+        [True, True, False],
+        [False, False, False]
+    ]])
+
+    assignments = solve_lineups(points, eligibility)
+
+    assert assignments.tolist() == [[0, -1]]
+
+
+def test_optimal_lineups_overlapping_flex():
+    league = get_overlapping_flex_league()
+    config = AppConfigParser()
+    config.read_dict({"Configuration": {"prohibited_statuses": "IR"}, "Settings": {}})
+    coaching_efficiency = CoachingEfficiency(config, league)
+
+    # the greedy lineup fills FLEX_RB_WR first with the WR and leaves FLEX_TE_WR empty
+    greedy_lineup = coaching_efficiency.get_greedy_optimal_lineup(league.teams_by_week["1"]["1"].roster, 1, "1")
+    assert sum(player.points for player in greedy_lineup) == 20.0
+
+    # slot eligibility comes from the eligible position bitmasks of the player week table
+    optimal_lineups = league.get_optimal_lineups()
+    player_week_table = league.get_player_week_table()
+    assert optimal_lineups.slots == ["FLEX_RB_WR", "FLEX_TE_WR"]
+    assert optimal_lineups.get_optimal_score(1, "1") == 25.0
+    assert [player_week_table.players[row].player_id for row in optimal_lineups.lineups[(1, "1")][1]] == ["rb", "wr"]
+
+    # the RB of team "2" fills FLEX_RB_WR, and FLEX_TE_WR stays empty
+    assert optimal_lineups.get_optimal_score(1, "2") == 5.0
+    assert len(optimal_lineups.lineups[(1, "2")][1]) == 1
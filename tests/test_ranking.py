@@ -0,0 +1,43 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import os
+import sys
+
+module_dir = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(module_dir)
+
+from calculate.ranking import Ranking
+
+
+def test_ranking_ties():
+    ranking = Ranking([10, 20, 20, 5, 20])
+
+    # tied rows keep their original order
+    assert ranking.get_ranked(["a", "b", "c", "d", "e"]) == ["b", "c", "e", "a", "d"]
+    assert ranking.competition_ranks.tolist() == [1, 1, 1, 4, 5]
+    assert ranking.dense_ranks.tolist() == [1, 1, 1, 2, 3]
+    assert ranking.is_tied.tolist() == [True, True, True, False, False]
+    # three rows tied for first make three tied pairs
+    assert ranking.num_ties == 3
+    assert ranking.get_num_first_place() == 3
+
+
+def test_ranking_tiebreaks():
+    ranking = Ranking([10, 20, 20, 20], tiebreaks=[[0, 1, 3, 2]])
+
+    # tiebreaks order the tied rows, but the rows still count as tied
+    assert ranking.get_ranked(["a", "b", "c", "d"]) == ["c", "d", "b", "a"]
+    assert ranking.competition_ranks.tolist() == [1, 1, 1, 4]
+    assert ranking.num_ties == 3
+
+
+def test_ranking_excluded_ties():
+    ranking = Ranking([10, 7, 10, 7], excluded=[True, False, False, False])
+
+    # the tie for first is excluded, since its first row is excluded
+    assert ranking.get_ranked(["a", "b", "c", "d"]) == ["a", "c", "b", "d"]
+    assert ranking.competition_ranks.tolist() == [1, 1, 3, 3]
+    assert ranking.is_tied.tolist() == [False, False, True, True]
+    assert ranking.num_ties == 1
+    assert ranking.get_num_first_place() == 2
@@ -0,0 +1,292 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from report.logger import get_logger
+from utils.app_config_parser import AppConfigParser
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = get_logger(__name__, propagate=False)
+
+module_dir = Path(__file__).parent.parent
+
+# file extension used by each supported storage format ("json" is the original pretty-printed format)
+storage_format_extensions = OrderedDict([
+    ("json", ".json"),
+    ("json.gz", ".json.gz"),
+    ("msgpack.gz", ".msgpack.gz"),
+    ("msgpack.zst", ".msgpack.zst"),
+])
+
+# saved report metric data managed by DataStorage (Yahoo platform data is saved by yfpy and always stays in json)
+report_data_filenames = [
+    "bad_boy_data.json",
+    "bad_boy_raw_data.json",
+    "beef_data.json",
+    "covid_data.json",
+    "covid_raw_data.json",
+    "playoff_probs_data.json",
+]
+
+
+def get_available_storage_formats():
+    available_formats = ["json", "json.gz"]
+    if msgpack:
+        available_formats.append("msgpack.gz")
+        if zstandard:
+            available_formats.append("msgpack.zst")
+    return available_formats
+
+
+class DataStorage(object):
+    """Reads and writes saved platform and report data. Data can be written as the original pretty-printed json or
+    compressed (gzip or zstd) in either compact json or msgpack. Saved files are addressed by their original .json path,
+    and every format is read transparently, so data saved before changing formats keeps loading.
+    """
+
+    def __init__(self, storage_format="json"):
+        self.storage_format = None
+        self.set_storage_format(storage_format)
+
+    def set_storage_format(self, storage_format):
+        if storage_format not in storage_format_extensions:
+            logger.error("Unsupported data storage format \"{0}\". Supported formats: {1}".format(
+                storage_format, ", ".join(storage_format_extensions.keys())))
+            sys.exit("...run aborted.")
+        elif storage_format not in get_available_storage_formats():
+            logger.warning(
+                "Data storage format \"{0}\" requires {1} to be installed. Falling back to \"json.gz\".".format(
+                    storage_format, "msgpack and zstandard" if storage_format == "msgpack.zst" else "msgpack"))
+            storage_format = "json.gz"
+        self.storage_format = storage_format
+
+    def configure(self, config):
+        self.set_storage_format(config.get("Configuration", "data_storage_format", fallback="json"))
+
+    @staticmethod
+    def get_base_path(file_path):
+        file_path = str(file_path)
+        for extension in sorted(storage_format_extensions.values(), key=len, reverse=True):
+            if file_path.endswith(extension):
+                return file_path[:-len(extension)]
+        return file_path
+
+    def get_path(self, file_path, storage_format=None):
+        return self.get_base_path(file_path) + storage_format_extensions[storage_format or self.storage_format]
+
+    @staticmethod
+    def get_storage_format(file_path):
+        for storage_format, extension in sorted(
+                storage_format_extensions.items(), key=lambda k_v: len(k_v[1]), reverse=True):
+            if str(file_path).endswith(extension):
+                return storage_format
+        return None
+
+    def find(self, file_path):
+        """Return the path of the most recently saved copy of file_path in any storage format, or None."""
+        base_path = self.get_base_path(file_path)
+        saved_paths = [
+            base_path + extension for extension in storage_format_extensions.values()
+            if os.path.isfile(base_path + extension)
+        ]
+        return max(saved_paths, key=os.path.getmtime) if saved_paths else None
+
+    def exists(self, file_path):
+        return self.find(file_path) is not None
+
+    @staticmethod
+    def encode(data, storage_format):
+        if storage_format == "json":
+            return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        elif storage_format == "json.gz":
+            return gzip.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+        elif storage_format == "msgpack.gz":
+            return gzip.compress(msgpack.packb(data, use_bin_type=True), 6)
+        elif storage_format == "msgpack.zst":
+            return zstandard.ZstdCompressor(level=3).compress(msgpack.packb(data, use_bin_type=True))
+
+    @staticmethod
+    def decode(raw_data, storage_format):
+        if storage_format == "json":
+            return json.loads(raw_data.decode("utf-8"))
+        elif storage_format == "json.gz":
+            return json.loads(gzip.decompress(raw_data).decode("utf-8"))
+        elif storage_format == "msgpack.gz":
+            return msgpack.unpackb(gzip.decompress(raw_data), raw=False, strict_map_key=False)
+        elif storage_format == "msgpack.zst":
+            return msgpack.unpackb(
+                zstandard.ZstdDecompressor().decompress(raw_data), raw=False, strict_map_key=False)
+
+    def load(self, file_path):
+        saved_path = self.find(file_path)
+        if not saved_path:
+            raise FileNotFoundError(file_path)
+
+        with open(saved_path, "rb") as data_in:
+            return self.decode(data_in.read(), self.get_storage_format(saved_path))
+
+    def save(self, file_path, data, storage_format=None):
+        """Save data in the given (or configured) storage format and remove copies saved in any other format."""
+        storage_format = storage_format or self.storage_format
+        saved_path = self.get_path(file_path, storage_format)
+
+        file_dir = os.path.dirname(saved_path)
+        if file_dir and not os.path.exists(file_dir):
+            os.makedirs(file_dir)
+
+        with open(saved_path, "wb") as data_out:
+            data_out.write(self.encode(data, storage_format))
+
+        for other_format in storage_format_extensions.keys():
+            other_path = self.get_path(file_path, other_format)
+            if other_format != storage_format and os.path.isfile(other_path):
+                os.remove(other_path)
+
+        return saved_path
+
+    def migrate(self, file_path, storage_format=None, keep_original=False):
+        """Convert a saved file to the given (or configured) storage format. Returns (old size, new size) in bytes."""
+        storage_format = storage_format or self.storage_format
+        current_format = self.get_storage_format(file_path)
+        old_size = os.path.getsize(file_path)
+        if current_format == storage_format:
+            return old_size, old_size
+
+        with open(file_path, "rb") as data_in:
+            data = self.decode(data_in.read(), current_format)
+
+        new_path = self.get_path(file_path, storage_format)
+        with open(new_path, "wb") as data_out:
+            data_out.write(self.encode(data, storage_format))
+
+        if not keep_original:
+            os.remove(file_path)
+
+        return old_size, os.path.getsize(new_path)
+
+
+def get_saved_data_files(paths, platform=None):
+    """Collect saved data files under the given paths. For Yahoo only the report metric data is included, since the
+    platform data is saved by yfpy.
+    """
+    saved_data_files = []
+    for path in paths:
+        file_paths = [path] if os.path.isfile(path) else sorted(
+            os.path.join(root, filename) for root, _, filenames in os.walk(path) for filename in filenames)
+        for file_path in file_paths:
+            storage_format = DataStorage.get_storage_format(file_path)
+            if storage_format and not file_path.endswith(".tmp"):
+                if platform == "yahoo" and \
+                        os.path.basename(DataStorage.get_base_path(file_path)) + ".json" not in report_data_filenames:
+                    continue
+                saved_data_files.append(file_path)
+    return saved_data_files
+
+
+def compare_storage_formats(file_paths, repetitions=3):
+    """Measure total size on disk and load time (best of repetitions) of the given saved data in every available
+    storage format.
+    """
+    results = OrderedDict(
+        (storage_format, {"size": 0, "load_time": 0.0}) for storage_format in get_available_storage_formats())
+    for file_path in file_paths:
+        with open(file_path, "rb") as data_in:
+            data = DataStorage.decode(data_in.read(), DataStorage.get_storage_format(file_path))
+
+        for storage_format, result in results.items():
+            raw_data = DataStorage.encode(data, storage_format)
+            result["size"] += len(raw_data)
+
+            load_times = []
+            for _ in range(repetitions):
+                begin = time.perf_counter()
+                DataStorage.decode(raw_data, storage_format)
+                load_times.append(time.perf_counter() - begin)
+            result["load_time"] += min(load_times)
+    return results
+
+
+_data_storage = DataStorage()
+
+
+def get_data_storage():
+    """Return the DataStorage instance shared by all saved data readers and writers for the current run.
+    """
+    return _data_storage
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.data_storage",
+        description="Migrate saved data between storage formats or compare their size on disk and load times.")
+    parser.add_argument("-c", "--config-file", default="config.ini", help="config file (default: config.ini)")
+    parser.add_argument("-f", "--fantasy-platform",
+                        help="platform of the saved data (default: platform from config, Yahoo only migrates report "
+                             "metric data)")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    migrate_parser = subparsers.add_parser("migrate", help="convert saved data to another storage format")
+    migrate_parser.add_argument("paths", nargs="*",
+                                help="saved data files or directories (default: <data_dir>/<season>/<league_id>)")
+    migrate_parser.add_argument("-t", "--to-format", choices=list(storage_format_extensions.keys()),
+                                help="target storage format (default: data_storage_format from config)")
+    migrate_parser.add_argument("-k", "--keep-original", action="store_true", help="keep the original files")
+    compare_parser = subparsers.add_parser("compare", help="compare disk size and load time of each storage format")
+    compare_parser.add_argument("paths", nargs="*",
+                                help="saved data files or directories (default: <data_dir>/<season>/<league_id>)")
+    args = parser.parse_args(argv)
+
+    config = AppConfigParser()
+    config.read(module_dir / args.config_file)
+
+    platform = args.fantasy_platform or config.get("Settings", "platform", fallback=None)
+    paths = args.paths or [os.path.join(
+        module_dir,
+        config.get("Configuration", "data_dir", fallback="output/data"),
+        config.get("Settings", "season", fallback=""),
+        config.get("Settings", "league_id", fallback="")
+    )]
+    saved_data_files = get_saved_data_files(paths, platform)
+
+    if args.command == "migrate":
+        data_storage = get_data_storage()
+        data_storage.configure(config)
+        if args.to_format:
+            data_storage.set_storage_format(args.to_format)
+
+        total_old_size = total_new_size = 0
+        for file_path in saved_data_files:
+            old_size, new_size = data_storage.migrate(file_path, keep_original=args.keep_original)
+            total_old_size += old_size
+            total_new_size += new_size
+        print("Migrated {0} saved data file{1} to \"{2}\": {3:.2f} MB -> {4:.2f} MB".format(
+            len(saved_data_files), "s" if len(saved_data_files) != 1 else "", data_storage.storage_format,
+            total_old_size / (1024 * 1024), total_new_size / (1024 * 1024)))
+
+    elif args.command == "compare":
+        print("Comparing {0} saved data file{1}:".format(
+            len(saved_data_files), "s" if len(saved_data_files) != 1 else ""))
+        for storage_format, result in compare_storage_formats(saved_data_files).items():
+            print("  {0:<12} {1:>10.2f} MB {2:>10.3f}s load".format(
+                storage_format, result["size"] / (1024 * 1024), result["load_time"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
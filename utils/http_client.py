@@ -0,0 +1,361 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+
+from report.logger import get_logger
+from utils.replay import FixtureRecorder, get_record_dir, get_replay_url
+from utils.response_cache import ResponseCache, get_cache_dir, get_cache_max_size
+
+logger = get_logger(__name__, propagate=False)
+
+
+class HostMetrics(object):
+    """Request metrics of one host. Counters are updated under a lock of their own, since requests to the same host can
+    be sent from several threads at once.
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.requests = 0
+        self.bytes = 0
+        self.latency = 0.0
+        self.retries = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add_response(self, num_bytes, latency):
+        with self._lock:
+            self.requests += 1
+            self.bytes += num_bytes
+            self.latency += latency
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def get_average_latency(self):
+        return self.latency / self.requests if self.requests else 0.0
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes": self.bytes,
+                "latency": round(self.latency, 3),
+                "average_latency": round(self.get_average_latency(), 3),
+                "retries": self.retries,
+                "errors": self.errors
+            }
+
+
+class HttpClient(object):
+    """Shared HTTP client used by every data fetcher in the app. Keeps one pooled keep-alive session per host, requests
+    compressed responses, retries connection errors and retryable status codes with jittered exponential backoff,
+    limits the number of concurrent requests per host, and tracks per-host request counts, bytes, and latency. Identical
+    GET requests are coalesced, so concurrent duplicates share the one request in flight, and repeats of small memoized
+    requests reuse its successful response for the rest of the run.
+    """
+
+    retry_status_codes = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, backoff_max=30.0, timeout=30.0,
+                 max_connections_per_host=10, coalesce=True):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.max_connections_per_host = max_connections_per_host
+        self.coalesce = coalesce
+
+        self.cache = None  # type: ResponseCache
+        # fixture bundle recording real responses, and url of the local stand-in server replaying them
+        self.recorder = None  # type: FixtureRecorder
+        self.replay_url = None
+
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._semaphores = {}
+        self._metrics = OrderedDict()
+        self._revalidations = {}
+        # normalized request -> future of its response, shared by duplicate requests while in flight (and for the rest
+        # of the run for memoized requests)
+        self._coalesced = {}
+        self.coalesced_in_flight = 0
+        self.coalesced_completed = 0
+
+    def configure(self, config, data_dir=None):
+        """Apply the optional http_* settings from the [Configuration] section of the config file. Existing sessions are
+        closed so new pool sizes take effect. The shared response cache is enabled when a data directory is provided,
+        unless responses are being recorded into a fixture bundle (http_record) or requests are sent to a local
+        stand-in server replaying one (http_replay_url).
+        """
+        self.max_retries = config.getint("Configuration", "http_max_retries", fallback=self.max_retries)
+        self.backoff_factor = config.getfloat("Configuration", "http_backoff_factor", fallback=self.backoff_factor)
+        self.timeout = config.getfloat("Configuration", "http_timeout", fallback=self.timeout)
+        self.max_connections_per_host = config.getint(
+            "Configuration", "http_max_connections_per_host", fallback=self.max_connections_per_host)
+        self.coalesce = config.getboolean("Configuration", "http_coalesce", fallback=self.coalesce)
+        self.close()
+
+        if data_dir and config.getboolean("Configuration", "http_record", fallback=False):
+            self.recorder = FixtureRecorder(get_record_dir(config, data_dir))
+        else:
+            self.recorder = None
+        self.replay_url = config.get("Configuration", "http_replay_url", fallback=None) or None
+        if self.replay_url:
+            logger.info("Sending HTTP requests to the stand-in server at {0}.".format(self.replay_url))
+
+        if data_dir and config.getboolean("Configuration", "http_cache", fallback=True) and not (
+                self.recorder or self.replay_url):
+            self.cache = ResponseCache(get_cache_dir(config, data_dir), get_cache_max_size(config))
+
+    @staticmethod
+    def get_host(url):
+        return urlparse(url).netloc.lower()
+
+    def _get_session(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if not session:
+                session = requests.Session()
+                session.headers.update({"Accept-Encoding": "gzip, deflate"})
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections_per_host, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_connections_per_host)
+                self._metrics.setdefault(host, HostMetrics(host))
+            return session, self._semaphores[host], self._metrics[host]
+
+    def _get_backoff(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        # "full jitter" exponential backoff so concurrent retries against the same host do not synchronize
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * (2 ** attempt)))
+
+    def request(self, method, url, **kwargs):
+        host = self.get_host(url)
+        if self.replay_url:
+            # sessions, concurrency limits, and metrics stay per platform host when replaying from one stand-in server
+            url = get_replay_url(self.replay_url, url)
+        session, semaphore, metrics = self._get_session(host)
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            begin = time.perf_counter()
+            with semaphore:
+                try:
+                    response = session.request(method, url, **kwargs)
+                except (ConnectionError, Timeout) as e:
+                    metrics.add_error()
+                    if attempt >= self.max_retries:
+                        logger.error("HTTP {0} {1} failed after {2} retries: {3}".format(method, url, attempt, e))
+                        raise
+                    response = None
+                else:
+                    metrics.add_response(len(response.content), time.perf_counter() - begin)
+
+            if response is not None and (response.status_code not in self.retry_status_codes
+                                         or attempt >= self.max_retries):
+                if self.recorder:
+                    self.recorder.record(response, self.replay_url)
+                return response
+
+            backoff = self._get_backoff(attempt, response)
+            logger.debug("Retrying HTTP {0} {1} in {2:.2f}s ({3} of {4}){5}.".format(
+                method, url, backoff, attempt + 1, self.max_retries,
+                " after status code {0}".format(response.status_code) if response is not None else ""))
+            metrics.add_retry()
+            attempt += 1
+            time.sleep(backoff)
+
+    def get(self, url, params=None, cache_policy=None, memoize=False, **kwargs):
+        """Send a GET request. When the response cache is enabled, requests for endpoints with a cache policy (either
+        the given cache_policy name or one recognized from the url) are served from the cache while fresh, served stale
+        and revalidated in the background inside their stale-while-revalidate window, and retrieved otherwise.
+
+        Requests identical to one already in flight wait for its response instead of being sent again. Completed
+        responses are only kept when memoize is set, in which case successful (200) responses are reused by identical
+        requests for the rest of the run. Memoizing is meant for small responses requested repeatedly within a run
+        (the current NFL week, the footballdb injury page of a week, and player headshots), since memoized responses
+        stay in memory until the client is closed, while large responses (such as weekly stats and box scores) are
+        released once their callers are done with them.
+        """
+        normalized_request = ResponseCache.normalize_request(
+            "GET", url, params, kwargs.get("headers"), kwargs.get("cookies"))
+
+        if not self.coalesce:
+            return self._get(normalized_request, url, params, cache_policy, **kwargs)
+
+        with self._lock:
+            future = self._coalesced.get(normalized_request)
+            if future is None:
+                future = self._coalesced[normalized_request] = Future()
+                is_owner = True
+            else:
+                is_owner = False
+                if future.done():
+                    self.coalesced_completed += 1
+                else:
+                    self.coalesced_in_flight += 1
+
+        if not is_owner:
+            logger.debug("Reusing response of identical request for {0}.".format(url))
+            return future.result()
+
+        try:
+            response = self._get(normalized_request, url, params, cache_policy, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._coalesced.pop(normalized_request, None)
+            future.set_exception(e)
+            raise
+
+        if not memoize or response.status_code != 200:
+            # only successful memoized responses are reused, so later identical requests retry
+            with self._lock:
+                self._coalesced.pop(normalized_request, None)
+        future.set_result(response)
+        return response
+
+    def _get(self, normalized_request, url, params, cache_policy, **kwargs):
+        if self.cache:
+            policy = self.cache.get_policy(normalized_request, cache_policy)
+            if policy:
+                return self._get_cached(self.cache.get_key(normalized_request), policy, url, params, **kwargs)
+
+        return self.request("GET", url, params=params, **kwargs)
+
+    def _get_cached(self, key, policy, url, params, **kwargs):
+        cached = self.cache.get(key)
+        # responses stored under another policy (such as a recently finished week that is now final) are retrieved again
+        if cached and cached[2] == policy.name:
+            response, age, cached_policy_name = cached
+            if policy.is_fresh(age):
+                self.cache.hits += 1
+                return response
+            elif policy.is_usable_stale(age):
+                self.cache.stale_hits += 1
+                self._revalidate(key, policy, url, params, **kwargs)
+                return response
+
+        return self._fetch_and_cache(key, policy, url, params, **kwargs)
+
+    def _fetch_and_cache(self, key, policy, url, params, **kwargs):
+        response = self.request("GET", url, params=params, **kwargs)
+        if response.status_code == 200:
+            self.cache.put(key, policy, response)
+        return response
+
+    def _revalidate(self, key, policy, url, params, **kwargs):
+        def revalidate():
+            try:
+                self._fetch_and_cache(key, policy, url, params, **kwargs)
+            except Exception as e:
+                logger.debug("Unable to revalidate cached response for {0}: {1}".format(url, e))
+            finally:
+                with self._lock:
+                    self._revalidations.pop(key, None)
+
+        with self._lock:
+            if key in self._revalidations:
+                return
+            thread = threading.Thread(target=revalidate, name="revalidate-" + key[:8])
+            self._revalidations[key] = thread
+        thread.start()
+
+    def wait_for_revalidations(self):
+        for thread in list(self._revalidations.values()):
+            thread.join()
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request("POST", url, data=data, json=json, **kwargs)
+
+    def download(self, url, file_path, **kwargs):
+        """Retrieve the content at url and write it to file_path (replacement for urllib.request.urlretrieve).
+        """
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+
+        file_dir = os.path.dirname(file_path)
+        if file_dir and not os.path.exists(file_dir):
+            os.makedirs(file_dir)
+
+        with open(file_path, "wb") as data_out:
+            data_out.write(response.content)
+
+        return file_path
+
+    def get_metrics(self):
+        with self._lock:
+            host_metrics = list(self._metrics.items())
+        return OrderedDict((host, metrics.to_dict()) for host, metrics in host_metrics)
+
+    def log_summary(self):
+        metrics_by_host = self.get_metrics()
+        if not metrics_by_host:
+            return
+
+        summary = "HTTP requests by host:"
+        for host, metrics in metrics_by_host.items():
+            summary += "\n    {0}: {1} request{2}, {3:.1f} KB, {4:.3f}s avg latency, {5} retr{6}, {7} error{8}".format(
+                host,
+                metrics["requests"], "s" if metrics["requests"] != 1 else "",
+                metrics["bytes"] / 1024,
+                metrics["average_latency"],
+                metrics["retries"], "ies" if metrics["retries"] != 1 else "y",
+                metrics["errors"], "s" if metrics["errors"] != 1 else "")
+        logger.info(summary + "\n")
+
+        if self.coalesced_in_flight or self.coalesced_completed:
+            logger.info("HTTP requests deduplicated: {0} ({1} shared in flight, {2} reused after completion)\n".format(
+                self.coalesced_in_flight + self.coalesced_completed, self.coalesced_in_flight,
+                self.coalesced_completed))
+
+        if self.cache:
+            self.cache.log_summary()
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics = OrderedDict((host, HostMetrics(host)) for host in self._sessions)
+            self.coalesced_in_flight = 0
+            self.coalesced_completed = 0
+
+    def close(self):
+        self.wait_for_revalidations()
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+            self._semaphores = {}
+            self._coalesced = {}
+            if self.cache:
+                self.cache.close()
+                self.cache = None
+
+
+_http_client = HttpClient()
+
+
+def get_http_client():
+    """Return the HttpClient instance shared by all fetchers for the current run.
+    """
+    return _http_client
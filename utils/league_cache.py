@@ -0,0 +1,137 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+from report.logger import get_logger
+from utils.app_config_parser import AppConfigParser
+from utils.data_storage import DataStorage, report_data_filenames
+from utils.response_cache import get_cache_dir
+
+logger = get_logger(__name__, propagate=False)
+
+# increment when the structure of the cached league data changes in a way not covered by the schema hash
+league_cache_version = 1
+
+# modules defining the mapped league objects and the mapping itself, hashed into the cache schema
+league_schema_modules = ["dao.base", "dao.index"]
+
+
+class LeagueCache(object):
+    """Caches the fully mapped BaseLeague of a run so reruns against the same saved data can skip loading and mapping
+    all platform data. Each cache file holds a small header (version, schema hash, saved source file paths and their
+    content hash) followed by the pickled league, so a stale cache is detected without unpickling the league.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def get_key(platform, league_id, game_id, season, week_for_report, current_week):
+        return {
+            "platform": str(platform),
+            "league_id": str(league_id),
+            "game_id": str(game_id) if game_id else None,
+            "season": str(season) if season else None,
+            "week_for_report": str(week_for_report),
+            "current_week": str(current_week),
+        }
+
+    def get_path(self, key):
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "{0}-{1}-{2}.pkl".format(key["platform"], key["league_id"], digest[:16]))
+
+    @staticmethod
+    def get_schema_hash(platform):
+        hasher = hashlib.sha256(str(league_cache_version).encode("utf-8"))
+        for module_name in league_schema_modules + ["dao.platforms." + str(platform)]:
+            module = sys.modules.get(module_name)
+            if module and getattr(module, "__file__", None):
+                with open(module.__file__, "rb") as module_in:
+                    hasher.update(module_in.read())
+        return hasher.hexdigest()
+
+    @staticmethod
+    def get_source_files(source_paths):
+        """Collect the saved platform data files under the given paths (report metric data is excluded, since it is
+        saved after the league has been mapped).
+        """
+        source_files = []
+        for path in source_paths:
+            if os.path.isfile(path):
+                source_files.append(path)
+            elif os.path.isdir(path):
+                for root, dirs, filenames in os.walk(path):
+                    dirs.sort()
+                    for filename in sorted(filenames):
+                        if filename.endswith(".tmp") or \
+                                os.path.basename(DataStorage.get_base_path(filename)) + ".json" in report_data_filenames:
+                            continue
+                        source_files.append(os.path.join(root, filename))
+        return source_files
+
+    def get_source_hash(self, source_paths):
+        hasher = hashlib.blake2b(digest_size=32)
+        for file_path in self.get_source_files(source_paths):
+            hasher.update(file_path.encode("utf-8"))
+            with open(file_path, "rb") as source_in:
+                for chunk in iter(lambda: source_in.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def load(self, key):
+        """Return the cached league for the key if its schema and saved source data are unchanged, otherwise None."""
+        file_path = self.get_path(key)
+        if not os.path.isfile(file_path):
+            return None
+
+        try:
+            with open(file_path, "rb") as cache_in:
+                header = pickle.load(cache_in)
+                if header.get("key") != key or header.get("schema_hash") != self.get_schema_hash(key["platform"]):
+                    logger.debug("Cached league {0} was created by a different version... ignoring.".format(file_path))
+                    return None
+                if header.get("source_hash") != self.get_source_hash(header.get("source_paths", [])):
+                    logger.debug("Saved data changed since league {0} was cached... ignoring.".format(file_path))
+                    return None
+                return pickle.load(cache_in)
+        except Exception as e:
+            logger.debug("Unable to load cached league {0}: {1}".format(file_path, e))
+            return None
+
+    def save(self, key, league, source_paths):
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        header = {
+            "key": key,
+            "schema_hash": self.get_schema_hash(key["platform"]),
+            "source_paths": source_paths,
+            "source_hash": self.get_source_hash(source_paths),
+        }
+
+        file_path = self.get_path(key)
+        tmp_file_path = file_path + ".{0}.tmp".format(os.getpid())
+        try:
+            with open(tmp_file_path, "wb") as cache_out:
+                pickle.dump(header, cache_out, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(league, cache_out, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file_path, file_path)
+        except Exception as e:
+            logger.warning("Unable to cache league data: {0}".format(e))
+            if os.path.isfile(tmp_file_path):
+                os.remove(tmp_file_path)
+            return None
+
+        return file_path
+
+
+def get_league_cache(config: AppConfigParser, data_dir):
+    """Return the league cache for the data directory, or None if disabled by the league_cache setting."""
+    if not config.getboolean("Configuration", "league_cache", fallback=True):
+        return None
+    return LeagueCache(os.path.join(get_cache_dir(config, data_dir), "leagues"))
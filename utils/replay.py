@@ -0,0 +1,265 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from report.logger import get_logger
+from utils.app_config_parser import AppConfigParser
+from utils.response_cache import ResponseCache
+
+logger = get_logger(__name__, propagate=False)
+
+module_dir = Path(__file__).parent.parent
+
+# query parameters and request headers carrying credentials, which are neither recorded nor used to match fixtures
+ignored_params = {"access_token", "apikey"}
+ignored_headers = {"authorization", "content-length", "cookie", "host"}
+
+
+def get_fixture_key(method, url, headers=None, body=None):
+    """Build the key matching a request to its recorded fixture: the normalized request (method, url with sorted query
+    parameters, and content-affecting headers) without credentials, plus a hash of the request body if it has one.
+    """
+    scheme, netloc, path, query, _ = urlsplit(url)
+    query_items = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k.lower() not in ignored_params]
+    normalized_request = ResponseCache.normalize_request(
+        method,
+        urlunsplit((scheme, netloc, path, urlencode(query_items), "")),
+        headers={k: v for k, v in (headers or {}).items() if k.lower() not in ignored_headers}
+    )
+    if body:
+        normalized_request += " body=" + hashlib.sha256(body if isinstance(body, bytes) else body.encode(
+            "utf-8")).hexdigest()
+    return ResponseCache.get_key(normalized_request)
+
+
+def get_replay_url(replay_url, url):
+    """Rewrite a platform url to the same request against the stand-in server (http://<server>/<scheme>/<host>/...)."""
+    scheme, netloc, path, query, _ = urlsplit(url)
+    return replay_url.rstrip("/") + "/" + scheme + "/" + netloc + path + ("?" + query if query else "")
+
+
+def get_original_url(replay_path):
+    """Reverse get_replay_url for the path (and query) of a request received by the stand-in server."""
+    scheme, _, netloc_path = replay_path.lstrip("/").partition("/")
+    return scheme + "://" + netloc_path
+
+
+class FixtureRecorder(object):
+    """Records real HTTP responses into a fixture bundle: a directory with one json file per distinct request, holding
+    the original url, status code, content type, and body of the most recent response to it.
+    """
+
+    def __init__(self, bundle_dir):
+        self.bundle_dir = bundle_dir
+        self.recorded = 0
+
+        if not os.path.exists(self.bundle_dir):
+            os.makedirs(self.bundle_dir)
+
+        self._lock = threading.Lock()
+
+    def record(self, response, replay_url=None):
+        """Record a requests response (using the prepared request it was sent with). Responses of a stand-in server at
+        replay_url are recorded under the original platform url of the request.
+        """
+        request = response.request
+        url = request.url
+        if replay_url and url.startswith(replay_url.rstrip("/") + "/"):
+            url = get_original_url(url[len(replay_url.rstrip("/")):])
+        key = get_fixture_key(request.method, url, request.headers, request.body)
+
+        scheme, netloc, path, query, _ = urlsplit(url)
+        query_items = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k.lower() not in ignored_params]
+
+        content = response.content or b""
+        try:
+            body = content.decode("utf-8")
+            body_encoding = "utf-8"
+        except UnicodeDecodeError:
+            body = base64.b64encode(content).decode("ascii")
+            body_encoding = "base64"
+
+        fixture = OrderedDict([
+            ("method", request.method),
+            ("url", urlunsplit((scheme, netloc, path, urlencode(query_items), ""))),
+            ("status_code", response.status_code),
+            ("content_type", response.headers.get("Content-Type")),
+            ("body_encoding", body_encoding),
+            ("body", body),
+        ])
+
+        file_path = os.path.join(self.bundle_dir, key + ".json")
+        with self._lock:
+            tmp_file_path = file_path + ".tmp"
+            with open(tmp_file_path, "w", encoding="utf-8") as fixture_out:
+                json.dump(fixture, fixture_out, ensure_ascii=False)
+            os.replace(tmp_file_path, file_path)
+            self.recorded += 1
+
+    def record_hook(self, response, *args, **kwargs):
+        """Response hook for requests sessions not created by the shared HTTP client (such as the Yahoo OAuth session).
+        """
+        try:
+            self.record(response)
+        except Exception as e:
+            logger.warning("Unable to record response for {0}: {1}".format(response.url, e))
+        return response
+
+
+def load_fixtures(bundle_dir):
+    """Load a fixture bundle into a dict of fixtures by fixture key."""
+    fixtures = {}
+    for filename in sorted(os.listdir(bundle_dir)):
+        if filename.endswith(".json"):
+            with open(os.path.join(bundle_dir, filename), "r", encoding="utf-8") as fixture_in:
+                fixtures[filename[:-len(".json")]] = json.load(fixture_in)
+    return fixtures
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Local stand-in for the platform APIs that replays the responses of a fixture bundle. Each response is delayed by
+    the configured latency plus a uniformly random jitter, requests above the per-host rate limit (requests per second)
+    are rejected with 429 Too Many Requests, and the given fraction of requests fails with 503 Service Unavailable.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, fixtures, host="127.0.0.1", port=8765, latency=0.0, jitter=0.0, rate_limit=None, error_rate=0.0,
+                 seed=None):
+        super().__init__((host, port), ReplayRequestHandler)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_times = {}
+        self.stats = OrderedDict([("requests", 0), ("replayed", 0), ("missing", 0), ("rate_limited", 0), ("errors", 0)])
+
+    def get_url(self):
+        return "http://{0}:{1}".format(*self.server_address[:2])
+
+    def get_response(self, method, url, headers, body):
+        """Return (status code, content type, body, extra headers) for a request and count it in the server stats."""
+        host = urlsplit(url).netloc
+        now = time.monotonic()
+        with self.lock:
+            self.stats["requests"] += 1
+
+            if self.rate_limit:
+                request_times = self.request_times.setdefault(host, deque())
+                while request_times and now - request_times[0] >= 1.0:
+                    request_times.popleft()
+                if len(request_times) >= self.rate_limit:
+                    self.stats["rate_limited"] += 1
+                    return 429, "application/json", b'{"error": "rate limited"}', {"Retry-After": "1"}
+                request_times.append(now)
+
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 503, "application/json", b'{"error": "service unavailable"}', {}
+
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+        time.sleep(delay)
+
+        fixture = self.fixtures.get(get_fixture_key(method, url, headers, body))
+        with self.lock:
+            if not fixture:
+                self.stats["missing"] += 1
+                logger.warning("No recorded fixture for {0} {1}".format(method, url))
+                return 404, "application/json", b'{"error": "no recorded fixture"}', {}
+            self.stats["replayed"] += 1
+
+        if fixture.get("body_encoding") == "base64":
+            content = base64.b64decode(fixture.get("body"))
+        else:
+            content = fixture.get("body").encode("utf-8")
+        return fixture.get("status_code"), fixture.get("content_type"), content, {}
+
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def handle_request(self):
+        content_length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(content_length) if content_length else None
+
+        status_code, content_type, content, headers = self.server.get_response(
+            self.command, get_original_url(self.path), dict(self.headers.items()), body)
+
+        self.send_response(status_code)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = handle_request
+    do_POST = handle_request
+
+    def log_message(self, format, *args):
+        logger.debug("Replay server: " + format % args)
+
+
+def get_record_dir(config: AppConfigParser, data_dir):
+    return os.path.join(data_dir, config.get("Configuration", "http_record_dir", fallback="fixtures"))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.replay",
+        description="Replay a fixture bundle recorded with http_record from a local stand-in API server (used by "
+                    "setting http_replay_url in the config file).")
+    parser.add_argument("-c", "--config-file", default="config.ini", help="config file (default: config.ini)")
+    parser.add_argument("-b", "--bundle-dir",
+                        help="fixture bundle directory (default: <data_dir>/<http_record_dir> from config)")
+    parser.add_argument("--host", default="127.0.0.1", help="host to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument("--latency", type=float, default=0.0, help="response delay in seconds (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random extra delay in seconds (default: 0)")
+    parser.add_argument("--rate-limit", type=int, help="maximum requests per second per host before returning 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 503")
+    parser.add_argument("--seed", type=int, help="random seed for jitter and errors")
+    args = parser.parse_args(argv)
+
+    config = AppConfigParser()
+    config.read(module_dir / args.config_file)
+
+    bundle_dir = args.bundle_dir or get_record_dir(
+        config, os.path.join(module_dir, config.get("Configuration", "data_dir", fallback="output/data")))
+    fixtures = load_fixtures(bundle_dir)
+
+    server = ReplayServer(fixtures, args.host, args.port, args.latency, args.jitter, args.rate_limit, args.error_rate,
+                          args.seed)
+    print("Replaying {0} fixture{1} from {2} at {3} (press Ctrl+C to stop)".format(
+        len(fixtures), "s" if len(fixtures) != 1 else "", bundle_dir, server.get_url()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(", ".join("{0} {1}".format(value, stat.replace("_", " ")) for stat, value in server.stats.items()))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -13,15 +13,11 @@ from datetime import datetime
 from pathlib import Path
 
 import colorama
-import requests
 from bs4 import BeautifulSoup
 from colorama import Fore, Style
 from git import Repo, TagReference, cmd
-from urllib3 import connectionpool, poolmanager
 
-from calculate.bad_boy_stats import BadBoyStats
-from calculate.beef_stats import BeefStats
-from calculate.covid_risk import CovidRisk
+from calculate.player_enrichment import PlayerEnrichment
 from dao import platforms
 from dao.base import BaseLeague, BaseTeam, BasePlayer
 from dao.platforms.espn import LeagueData as EspnLeagueData
@@ -30,6 +26,8 @@ from dao.platforms.sleeper import LeagueData as SleeperLeagueData
 from dao.platforms.yahoo import LeagueData as YahooLeagueData
 from report.logger import get_logger
 from utils.app_config_parser import AppConfigParser
+from utils.http_client import get_http_client
+from utils.league_cache import LeagueCache, get_league_cache
 
 logger = get_logger(__name__, propagate=False)
 
@@ -427,7 +425,7 @@ def get_current_nfl_week(config: AppConfigParser, dev_offline):
         logger.debug("Retrieving current NFL week from the Fox Sports API.")
 
         try:
-            nfl_weekly_info = requests.get(api_url).json()
+            nfl_weekly_info = get_http_client().get(api_url, memoize=True).json()
             current_nfl_week = nfl_weekly_info.get("period")
         except (KeyError, ValueError) as e:
             logger.warning("Unable to retrieve current NFL week. Defaulting to value set in \"config.ini\".")
@@ -444,6 +442,22 @@ def league_data_factory(week_for_report, platform, league_id, game_id, season, c
                         dev_offline):
 
     if platform in supported_platforms:
+        # a previously mapped league is reused when running offline against unchanged saved data
+        league_cache = get_league_cache(config, data_dir)
+        league_cache_key = LeagueCache.get_key(
+            platform, league_id, game_id, season, week_for_report or config.get("Settings", "week_for_report"),
+            config.get("Settings", "current_week")
+        )
+        if league_cache and dev_offline:
+            league = league_cache.load(league_cache_key)  # type: BaseLeague
+            if league:
+                logger.info("Using cached {0} league data for league {1}.".format(platform, league_id))
+                league.config = config
+                league.data_dir = data_dir
+                league.save_data = save_data
+                league.dev_offline = dev_offline
+                return league
+
         if platform == "yahoo":
             yahoo_league = YahooLeagueData(
                 week_for_report,
@@ -456,7 +470,7 @@ def league_data_factory(week_for_report, platform, league_id, game_id, season, c
                 save_data,
                 dev_offline
             )
-            return yahoo_league.map_data_to_base(BaseLeague)
+            league = yahoo_league.map_data_to_base(BaseLeague)
 
         elif platform == "fleaflicker":
             fleaflicker_league = FleaflickerLeagueData(
@@ -470,7 +484,7 @@ def league_data_factory(week_for_report, platform, league_id, game_id, season, c
                 save_data,
                 dev_offline
             )
-            return fleaflicker_league.map_data_to_base(BaseLeague)
+            league = fleaflicker_league.map_data_to_base(BaseLeague)
 
         elif platform == "sleeper":
             sleeper_league = SleeperLeagueData(
@@ -484,7 +498,7 @@ def league_data_factory(week_for_report, platform, league_id, game_id, season, c
                 save_data,
                 dev_offline
             )
-            return sleeper_league.map_data_to_base(BaseLeague)
+            league = sleeper_league.map_data_to_base(BaseLeague)
 
         elif platform == "espn":
             espn_league = EspnLeagueData(
@@ -498,7 +512,16 @@ def league_data_factory(week_for_report, platform, league_id, game_id, season, c
                 save_data,
                 dev_offline
             )
-            return espn_league.map_data_to_base(BaseLeague)
+            league = espn_league.map_data_to_base(BaseLeague)
+
+        # only leagues mapped from saved data can be matched against that data on later offline runs
+        if league_cache and (save_data or dev_offline):
+            source_paths = [os.path.join(data_dir, str(league.season), str(league.league_id))]
+            if platform == "sleeper":
+                source_paths.append(os.path.join(data_dir, "sleeper", "players.sqlite"))
+            league_cache.save(league_cache_key, league, source_paths)
+
+        return league
 
     else:
         logger.error(
@@ -507,40 +530,12 @@ def league_data_factory(week_for_report, platform, league_id, game_id, season, c
         sys.exit("...run aborted.")
 
 
-def add_report_player_stats(config,
-                            season,
-                            metrics,
+def add_report_player_stats(metrics,
                             player,  # type: BasePlayer
                             bench_positions):
-    player.bad_boy_crime = str()
-    player.bad_boy_points = int()
-    player.bad_boy_num_offenders = int()
-    player.weight = float()
-    player.tabbu = float()
-    player.covid_risk = int()
-
-    if player.selected_position not in bench_positions:
-
-        if config.getboolean("Report", "league_bad_boy_rankings"):
-            bad_boy_stats = metrics.get("bad_boy_stats")  # type: BadBoyStats
-            player.bad_boy_crime = bad_boy_stats.get_player_bad_boy_crime(
-                player.first_name, player.last_name, player.nfl_team_abbr, player.primary_position)
-            player.bad_boy_points = bad_boy_stats.get_player_bad_boy_points(
-                player.first_name, player.last_name, player.nfl_team_abbr, player.primary_position)
-            player.bad_boy_num_offenders = bad_boy_stats.get_player_bad_boy_num_offenders(
-                player.first_name, player.last_name, player.nfl_team_abbr, player.primary_position)
-
-        if config.getboolean("Report", "league_beef_rankings"):
-            beef_stats = metrics.get("beef_stats")  # type: BeefStats
-            player.weight = beef_stats.get_player_weight(player.first_name, player.last_name, player.nfl_team_abbr)
-            player.tabbu = beef_stats.get_player_tabbu(player.first_name, player.last_name, player.nfl_team_abbr)
-
-        if config.getboolean("Report", "league_covid_risk_rankings") and int(season) >= 2020:
-            covid_risk = metrics.get("covid_risk")  # type: CovidRisk
-            player.covid_risk = covid_risk.get_player_covid_risk(
-                player.full_name, player.nfl_team_abbr, player.primary_position)
-
-    return player
+    # enrichment is computed once per player for the whole run and reused for every week
+    player_enrichment = metrics.get("player_enrichment")  # type: PlayerEnrichment
+    return player_enrichment.add_player_enrichment(player, bench_positions)
 
 
 def add_report_team_stats(config, team: BaseTeam, league: BaseLeague, week_counter, season, metrics_calculator, metrics,
@@ -548,19 +543,19 @@ def add_report_team_stats(config, team: BaseTeam, league: BaseLeague, week_count
                           inactive_players) -> BaseTeam:
     team.name = metrics_calculator.decode_byte_string(team.name)
     bench_positions = league.bench_positions
+    player_week_table = league.get_player_week_table()
 
     for player in team.roster:
-        add_report_player_stats(config, season, metrics, player, bench_positions)
+        add_report_player_stats(metrics, player, bench_positions)
 
-    starting_lineup_points = round(
-        sum([p.points for p in team.roster if p.selected_position not in bench_positions]), 2)
+    starting_lineup_points = round(player_week_table.get_team_points(week_counter, team.team_id), 2)
     # confirm total starting lineup points is the same as team points
     if round(team.points, 2) != (starting_lineup_points + team.home_field_advantage):
         logger.warning(
             "Team {0} retrieved points ({1}) are not equal to calculated sum of team starting lineup points ({2}). "
             "Check data!".format(team.name, round(team.points, 2), starting_lineup_points))
 
-    team.bench_points = round(sum([p.points for p in team.roster if p.selected_position in bench_positions]), 2)
+    team.bench_points = round(player_week_table.get_team_points(week_counter, team.team_id, starters=False), 2)
 
     if config.getboolean("Report", "league_bad_boy_rankings"):
         team.bad_boy_points = 0
@@ -597,7 +592,8 @@ def add_report_team_stats(config, team: BaseTeam, league: BaseLeague, week_count
         team.positions_filled_active,
         int(week_counter),
         inactive_players,
-        dq_eligible=dq_ce
+        dq_eligible=dq_ce,
+        team_id=team.team_id
     )
 
     # # retrieve luck and record
@@ -625,7 +621,8 @@ def get_player_game_time_statuses(week, league: BaseLeague):
             "type": "reg"
         }
 
-        response = requests.get("https://www.footballdb.com/transactions/injuries.html", headers=headers, params=params)
+        response = get_http_client().get(
+            "https://www.footballdb.com/transactions/injuries.html", headers=headers, params=params, memoize=True)
 
         html_soup = BeautifulSoup(response.text, "html.parser")
         logger.debug("Response URL: {0}".format(response.url))
@@ -650,20 +647,6 @@ def get_player_game_time_statuses(week, league: BaseLeague):
     return html_soup
 
 
-def patch_http_connection_pool(**constructor_kwargs):
-    """This allows you to override the default parameters of the HTTPConnectionPool constructor. For example, to
-    increase the pool size to fix problems with "HttpConnectionPool is full, discarding connection" call this function
-    with maxsize=16 (or whatever size you want to give to the connection pool).
-    """
-
-    class MyHTTPSConnectionPool(connectionpool.HTTPSConnectionPool):
-        def __init__(self, *args, **kwargs):
-            kwargs.update(constructor_kwargs)
-            super(MyHTTPSConnectionPool, self).__init__(*args, **kwargs)
-
-    poolmanager.pool_classes_by_scheme['https'] = MyHTTPSConnectionPool
-
-
 if __name__ == "__main__":
 
     local_config = AppConfigParser()
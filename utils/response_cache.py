@@ -0,0 +1,401 @@
+__author__ = "Wren J. R. (uberfastman)"
+__email__ = "wrenjr@yahoo.com"
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from report.logger import get_logger
+from utils.app_config_parser import AppConfigParser
+
+logger = get_logger(__name__, propagate=False)
+
+module_dir = Path(__file__).parent.parent
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class CachePolicy(object):
+    """Freshness policy for a type of endpoint. A ttl of None means the cached response never expires. Responses older
+    than their ttl but still within the stale_while_revalidate window are served immediately while a fresh copy is
+    retrieved in the background.
+    """
+
+    def __init__(self, name, ttl=None, stale_while_revalidate=0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+
+    def is_fresh(self, age):
+        return self.ttl is None or age < self.ttl
+
+    def is_usable_stale(self, age):
+        return self.ttl is not None and age < self.ttl + self.stale_while_revalidate
+
+    def is_expired(self, age):
+        return not self.is_fresh(age) and not self.is_usable_stale(age)
+
+    def __repr__(self):
+        return "CachePolicy({0}, ttl={1}, stale_while_revalidate={2})".format(
+            self.name, self.ttl, self.stale_while_revalidate)
+
+
+cache_policies = {
+    "league_settings": CachePolicy("league_settings", ttl=SECONDS_PER_DAY, stale_while_revalidate=SECONDS_PER_DAY),
+    "players": CachePolicy("players", ttl=7 * SECONDS_PER_DAY, stale_while_revalidate=SECONDS_PER_DAY),
+    # the most recently finished week still gets NFL stat corrections during the following week, so it is only cached
+    # for a day, and a week is only cached indefinitely once it is older than that
+    "recent_week": CachePolicy("recent_week", ttl=SECONDS_PER_DAY),
+    "final_week": CachePolicy("final_week", ttl=None),
+    "headshot": CachePolicy("headshot", ttl=30 * SECONDS_PER_DAY, stale_while_revalidate=7 * SECONDS_PER_DAY),
+}
+
+
+def get_week_cache_policy(week, current_week):
+    """Return the name of the cache policy for the data of a week: final_week for weeks finished before the most recent
+    one, recent_week for the most recently finished week, and None (not cached) for the current and future weeks.
+    """
+    if int(week) < int(current_week) - 1:
+        return "final_week"
+    elif int(week) == int(current_week) - 1:
+        return "recent_week"
+    return None
+
+
+# endpoint types recognized from the normalized request url when the caller does not supply a policy (requests that
+# match none of these, such as current week scores, are never cached)
+cache_policy_patterns = [
+    (re.compile(r"api\.sleeper\.app/v1/players/nfl"), "players"),
+    (re.compile(r"api\.sleeper\.app/v1/league/\d+(/users)?(\?|\s|$)"), "league_settings"),
+    (re.compile(r"fantasy\.espn\.com/apis/v3/games/ffl/seasons/\d+/segments/0/leagues/\d+\?view=msettings"),
+     "league_settings"),
+    (re.compile(r"fleaflicker\.com/api/fetchleaguerules"), "league_settings"),
+    (re.compile(r"\.(png|jpe?g)(\?|\s|$)"), "headshot"),
+]
+
+# request headers that do not change the content of the response and are therefore left out of the cache key
+ignored_request_headers = {"accept", "accept-encoding", "connection", "content-type", "user-agent"}
+
+
+class ResponseCache(object):
+    """Content-addressed cache of HTTP responses shared by all platforms and leagues. Response bodies are stored once
+    per distinct content hash under objects/, while a SQLite index maps each normalized request (url + params + auth
+    scope) to its body, endpoint policy, and store/access times. The total size of the stored bodies is capped, with
+    the least recently used entries evicted first.
+    """
+
+    def __init__(self, cache_dir, max_size=500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.max_size = max_size
+
+        if not os.path.exists(self.objects_dir):
+            os.makedirs(self.objects_dir)
+
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, url TEXT, policy TEXT, digest TEXT, size INTEGER, status INTEGER, headers TEXT, "
+            "encoding TEXT, stored_at REAL, accessed_at REAL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)")
+        self._connection.commit()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_request(method, url, params=None, headers=None, cookies=None):
+        """Build a canonical string for a request: lowercase scheme and host, query string merged with params and
+        sorted, content-affecting headers sorted, and credentials reduced to a hash identifying the auth scope.
+        """
+        scheme, netloc, path, query, _ = urlsplit(url)
+
+        query_items = parse_qsl(query, keep_blank_values=True)
+        if isinstance(params, dict):
+            for k, v in params.items():
+                if isinstance(v, (list, tuple)):
+                    # repeated query parameters (such as multiple ESPN views)
+                    query_items.extend((str(k), str(item)) for item in v)
+                elif v is not None:
+                    query_items.append((str(k), str(v)))
+        elif params:
+            query_items.extend(parse_qsl(params, keep_blank_values=True) if isinstance(params, str) else params)
+
+        normalized = "{0} {1}".format(
+            method.upper(), urlunsplit((scheme.lower(), netloc.lower(), path, urlencode(sorted(query_items)), "")))
+
+        if headers:
+            vary = sorted(
+                (k.lower(), str(v)) for k, v in headers.items() if k.lower() not in ignored_request_headers)
+            if vary:
+                normalized += " " + json.dumps(vary)
+
+        if cookies:
+            auth_scope = hashlib.sha256(json.dumps(sorted(dict(cookies).items())).encode("utf-8")).hexdigest()
+            normalized += " auth=" + auth_scope[:16]
+
+        return normalized
+
+    @staticmethod
+    def get_key(normalized_request):
+        return hashlib.sha256(normalized_request.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_policy(normalized_request, policy_name=None):
+        if policy_name:
+            return cache_policies[policy_name]
+
+        normalized_request = normalized_request.lower()
+        for pattern, name in cache_policy_patterns:
+            if pattern.search(normalized_request):
+                return cache_policies[name]
+        return None
+
+    def _get_object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def get(self, key):
+        """Return (response, age in seconds, policy name) for a cached request, or None if it is not cached."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, policy, digest, status, headers, encoding, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if not row:
+                self.misses += 1
+                return None
+
+            url, policy, digest, status, headers, encoding, stored_at = row
+            try:
+                with open(self._get_object_path(digest), "rb") as data_in:
+                    content = data_in.read()
+            except FileNotFoundError:
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._connection.commit()
+                self.misses += 1
+                return None
+
+            self._connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+
+        response = Response()
+        response._content = content
+        response.status_code = status
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response.url = url
+
+        return response, time.time() - stored_at, policy
+
+    def put(self, key, policy, response):
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = self._get_object_path(digest)
+
+        with self._lock:
+            if not os.path.exists(object_path):
+                object_dir = os.path.dirname(object_path)
+                if not os.path.exists(object_dir):
+                    os.makedirs(object_dir)
+                tmp_path = object_path + ".tmp"
+                with open(tmp_path, "wb") as data_out:
+                    data_out.write(content)
+                os.replace(tmp_path, object_path)
+
+            previous = self._connection.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+
+            now = time.time()
+            headers = {k: v for k, v in response.headers.items() if k.lower() == "content-type"}
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.url, policy.name, digest, len(content), response.status_code, json.dumps(headers),
+                 response.encoding, now, now)
+            )
+            self._connection.commit()
+
+            if previous and previous[0] != digest:
+                self._remove_unreferenced_object(previous[0])
+
+            if self.get_size() > self.max_size:
+                self.evict(self.max_size)
+
+    def _remove_unreferenced_object(self, digest):
+        if not self._connection.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            try:
+                os.remove(self._get_object_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def _delete_entries(self, rows):
+        for key, digest in rows:
+            self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._remove_unreferenced_object(digest)
+        self._connection.commit()
+        return len(rows)
+
+    def get_size(self):
+        """Total bytes of stored response bodies (each distinct body counted once)."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)").fetchone()[0]
+
+    def evict(self, max_size):
+        """Evict least recently used entries until the stored bodies fit within max_size bytes."""
+        with self._lock:
+            size = self.get_size()
+            evicted = 0
+            for key, digest, entry_size in self._connection.execute(
+                    "SELECT key, digest, size FROM entries ORDER BY accessed_at ASC").fetchall():
+                if size <= max_size:
+                    break
+                self._delete_entries([(key, digest)])
+                if not self._connection.execute(
+                        "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                    size -= entry_size
+                evicted += 1
+
+            self.evictions += evicted
+            return evicted
+
+    def prune(self, expired=True, max_size=None, clear=False):
+        """Remove all entries (clear), entries past their ttl and stale window (expired), and/or least recently used
+        entries beyond max_size bytes. Returns the number of removed entries.
+        """
+        with self._lock:
+            if clear:
+                removed = self._delete_entries(
+                    self._connection.execute("SELECT key, digest FROM entries").fetchall())
+            else:
+                removed = 0
+                if expired:
+                    now = time.time()
+                    removed += self._delete_entries([
+                        (key, digest) for key, digest, policy, stored_at in self._connection.execute(
+                            "SELECT key, digest, policy, stored_at FROM entries").fetchall()
+                        if policy not in cache_policies or cache_policies[policy].is_expired(now - stored_at)
+                    ])
+                if max_size is not None:
+                    removed += self.evict(max_size)
+
+            # clean up bodies left behind by interrupted runs
+            referenced = {row[0] for row in self._connection.execute("SELECT DISTINCT digest FROM entries")}
+            for object_dir in os.listdir(self.objects_dir):
+                for digest in os.listdir(os.path.join(self.objects_dir, object_dir)):
+                    if digest not in referenced:
+                        os.remove(os.path.join(self.objects_dir, object_dir, digest))
+
+            return removed
+
+    def get_stats(self):
+        with self._lock:
+            now = time.time()
+            stats = OrderedDict([
+                ("cache_dir", self.cache_dir),
+                ("entries", 0),
+                ("size", self.get_size()),
+                ("max_size", self.max_size),
+                ("policies", OrderedDict()),
+            ])
+            for policy, digest, size, stored_at in self._connection.execute(
+                    "SELECT policy, digest, size, stored_at FROM entries ORDER BY policy"):
+                stats["entries"] += 1
+                policy_stats = stats["policies"].setdefault(
+                    policy, OrderedDict([("entries", 0), ("size", 0), ("fresh", 0), ("stale", 0), ("expired", 0)]))
+                policy_stats["entries"] += 1
+                policy_stats["size"] += size
+                cache_policy = cache_policies.get(policy)
+                if cache_policy and cache_policy.is_fresh(now - stored_at):
+                    policy_stats["fresh"] += 1
+                elif cache_policy and cache_policy.is_usable_stale(now - stored_at):
+                    policy_stats["stale"] += 1
+                else:
+                    policy_stats["expired"] += 1
+            return stats
+
+    def log_summary(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        if lookups:
+            logger.info("Response cache: {0} hit{1} ({2} stale), {3} miss{4}, {5} eviction{6}, {7:.1f} MB stored.\n".format(
+                self.hits + self.stale_hits, "s" if self.hits + self.stale_hits != 1 else "", self.stale_hits,
+                self.misses, "es" if self.misses != 1 else "",
+                self.evictions, "s" if self.evictions != 1 else "",
+                self.get_size() / (1024 * 1024)))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def get_cache_dir(config: AppConfigParser, data_dir):
+    return os.path.join(data_dir, config.get("Configuration", "http_cache_dir", fallback="cache"))
+
+
+def get_cache_max_size(config: AppConfigParser):
+    return int(config.getfloat("Configuration", "http_cache_max_size_mb", fallback=500) * 1024 * 1024)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.response_cache",
+        description="Show statistics for or prune the shared HTTP response cache.")
+    parser.add_argument("-c", "--config-file", default="config.ini", help="config file (default: config.ini)")
+    parser.add_argument("-d", "--cache-dir", help="cache directory (default: <data_dir>/<http_cache_dir> from config)")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    subparsers.add_parser("stats", help="show cache size and entry counts by endpoint policy")
+    prune_parser = subparsers.add_parser("prune", help="remove expired and/or least recently used entries")
+    prune_parser.add_argument("--max-size-mb", type=float, help="evict least recently used entries down to this size")
+    prune_parser.add_argument("--keep-expired", action="store_true", help="do not remove expired entries")
+    prune_parser.add_argument("--all", action="store_true", help="remove every entry")
+    args = parser.parse_args(argv)
+
+    config = AppConfigParser()
+    config.read(module_dir / args.config_file)
+
+    cache = ResponseCache(
+        args.cache_dir or get_cache_dir(
+            config, os.path.join(module_dir, config.get("Configuration", "data_dir", fallback="output/data"))),
+        get_cache_max_size(config)
+    )
+
+    if args.command == "prune":
+        removed = cache.prune(
+            expired=not args.keep_expired,
+            max_size=int(args.max_size_mb * 1024 * 1024) if args.max_size_mb is not None else None,
+            clear=args.all
+        )
+        print("Removed {0} cache entr{1}.".format(removed, "ies" if removed != 1 else "y"))
+
+    stats = cache.get_stats()
+    print("Response cache: {0}".format(stats["cache_dir"]))
+    print("  {0} entr{1}, {2:.2f} MB of {3:.2f} MB".format(
+        stats["entries"], "ies" if stats["entries"] != 1 else "y", stats["size"] / (1024 * 1024),
+        stats["max_size"] / (1024 * 1024)))
+    for policy, policy_stats in stats["policies"].items():
+        print("  {0}: {1} entr{2} ({3} fresh, {4} stale, {5} expired), {6:.2f} MB".format(
+            policy, policy_stats["entries"], "ies" if policy_stats["entries"] != 1 else "y", policy_stats["fresh"],
+            policy_stats["stale"], policy_stats["expired"], policy_stats["size"] / (1024 * 1024)))
+
+    cache.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])